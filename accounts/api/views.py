@@ -5,9 +5,12 @@ from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.authtoken.models import Token
+from rest_framework.authtoken.views import ObtainAuthToken
 
+from accounts.authentication import CachedTokenAuthentication, get_valid_token, rotate_token, token_expires
 from accounts.forms import ApplicationForm, UserEditForm, ProfileEditForm
 from accounts.models import *
 from accounts.api.serializers import *
@@ -33,7 +36,7 @@ class ApplicationView(APIView):
 
 
 class ProfileView(APIView):
-	authentication_classes = [SessionAuthentication, TokenAuthentication]
+	authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
 	permission_classes = [IsAuthenticated]
 
 	def post(self, request, format=None):
@@ -65,5 +68,27 @@ class ProfileView(APIView):
 class LogoutView(APIView):
 
 	def get(self, request, format=None):
-		request.user.auth_token.delete()
+		# Удаление токена сбрасывает его кэш через сигнал post_delete
+		Token.objects.filter(user=request.user).delete()
 		return Response(status=status.HTTP_200_OK)
+
+
+class ObtainTokenView(ObtainAuthToken):
+	"""
+	Как obtain_auth_token, но истекший токен заменяется новым.
+	"""
+
+	def post(self, request, *args, **kwargs):
+		serializer = self.get_serializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+		token = get_valid_token(serializer.validated_data["user"])
+		return Response({"token": token.key, "expires": token_expires(token.created)})
+
+
+class RotateTokenView(APIView):
+	authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+	permission_classes = [IsAuthenticated]
+
+	def post(self, request, format=None):
+		token = rotate_token(request.user)
+		return Response({"token": token.key, "expires": token_expires(token.created)})
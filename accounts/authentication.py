@@ -0,0 +1,110 @@
+"""
+Аутентификация по токену с кэшем. Пользователь, его профиль и группа по ключу токена хранятся
+в общем кэше, поэтому при попадании в кэш запрос к API не обращается к базе. Токены истекают
+через TOKEN_TTL; кэш сбрасывается при выходе, ротации токена и изменении пользователя.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from study.cache import CacheNamespace, invalidate_tags
+from .models import Profile
+
+TOKEN_TTL = getattr(settings, "TOKEN_TTL", timedelta(days=30))
+PRINCIPAL_TIMEOUT = 60 * 5
+
+USER_FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname != "password"]
+PROFILE_FIELDS = [field.attname for field in Profile._meta.concrete_fields]
+
+principal_cache = CacheNamespace("auth", timeout=PRINCIPAL_TIMEOUT)
+
+
+def principal_tag(user_pk):
+    return f"auth:user:{user_pk}"
+
+
+def forget_user(user_pk):
+    invalidate_tags(principal_tag(user_pk))
+
+
+def token_expires(created):
+    return created + TOKEN_TTL if TOKEN_TTL else None
+
+
+def is_expired(created):
+    expires = token_expires(created)
+    return expires is not None and expires <= timezone.now()
+
+
+def rotate_token(user):
+    """
+    Выдает пользователю новый токен, старый перестает действовать.
+    """
+    with transaction.atomic():
+        Token.objects.filter(user=user).delete()
+        token = Token.objects.create(user=user)
+    forget_user(user.pk)
+    return token
+
+
+def get_valid_token(user):
+    token = Token.objects.filter(user=user).first()
+    if token is None or is_expired(token.created):
+        token = rotate_token(user)
+    return token
+
+
+def _cache_key(key):
+    # Ключ токена не попадает в кэш в открытом виде
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _load_principal(key):
+    token = Token.objects.select_related("user", "user__profile").defer("user__password").filter(key=key).first()
+    if token is None:
+        return None
+    user = token.user
+    profile = getattr(user, "profile", None)
+    return {
+        "created": token.created,
+        "user": [getattr(user, name) for name in USER_FIELDS],
+        "profile": [getattr(profile, name) for name in PROFILE_FIELDS] if profile else None,
+        "group": user.group_set.values_list("pk", flat=True).first(),
+    }
+
+
+def _build_user(principal):
+    # Пароль отложен: при обращении к нему будет запрос к базе
+    user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, principal["user"])
+    if principal["profile"] is not None:
+        user.profile = Profile.from_db(DEFAULT_DB_ALIAS, PROFILE_FIELDS, principal["profile"])
+    user.study_group_id = principal["group"]
+    return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        principal = principal_cache.get(cache_key)
+        if principal is None:
+            principal = _load_principal(key)
+            if principal is None:
+                raise exceptions.AuthenticationFailed("Неверный токен.")
+            user_pk = principal["user"][USER_FIELDS.index("id")]
+            principal_cache.set(cache_key, value=principal, tags=[principal_tag(user_pk)])
+
+        user = _build_user(principal)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed("Пользователь неактивен или удален.")
+        if is_expired(principal["created"]):
+            Token.objects.filter(key=key).delete()
+            raise exceptions.AuthenticationFailed("Срок действия токена истек.")
+        return user, Token(key=key, user=user, created=principal["created"])
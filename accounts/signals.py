@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_user
+from .models import Profile
+
+
+def user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+def user_related_changed(sender, instance, **kwargs):
+    forget_user(instance.user_id)
+
+
+post_save.connect(user_changed, sender=User)
+post_delete.connect(user_changed, sender=User)
+
+for model in (Profile, Token):
+    post_save.connect(user_related_changed, sender=model)
+    post_delete.connect(user_related_changed, sender=model)
@@ -1,7 +1,17 @@
+from datetime import timedelta
+
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.urls import reverse
+from django.utils import timezone
+
+from study.models import Group
+from .authentication import CachedTokenAuthentication
+from .models import Profile
 
 
 class ApplicationViewTests(APITestCase):
@@ -43,3 +53,63 @@ class ProfileViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('user_form', response.data)
         self.assertIn('profile_form', response.data)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='teacher', email='teacher@example.com', password='password')
+        Profile.objects.filter(user=self.user).update(type=2)
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_cache_hit_without_queries(self):
+        self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(user.email, 'teacher@example.com')
+            self.assertEqual(user.profile.type, 2)
+
+        response = self.client.get(reverse('api-my-lessons'), HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_profile_change_and_logout_invalidate(self):
+        self.auth.authenticate_credentials(self.token.key)
+        profile = Profile.objects.get(user=self.user)
+        profile.type = 3
+        profile.save()
+        self.assertEqual(self.auth.authenticate_credentials(self.token.key)[0].profile.type, 3)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.client.get(reverse('api-logout-view'))
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_group_change_invalidates(self):
+        group, other = Group.objects.create(number='101'), Group.objects.create(number='102')
+        group.students.add(self.user)
+        self.assertEqual(self.auth.authenticate_credentials(self.token.key)[0].study_group_id, group.pk)
+        group.students.remove(self.user)
+        self.assertIsNone(self.auth.authenticate_credentials(self.token.key)[0].study_group_id)
+        self.user.group_set.add(other)
+        self.assertEqual(self.auth.authenticate_credentials(self.token.key)[0].study_group_id, other.pk)
+        other.students.clear()
+        self.assertIsNone(self.auth.authenticate_credentials(self.token.key)[0].study_group_id)
+
+    def test_expired_token_is_replaced(self):
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - timedelta(days=365))
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+
+        response = self.client.post(reverse('api-token-auth'), {'username': 'teacher', 'password': 'password'})
+        self.assertNotEqual(response.data["token"], self.token.key)
+        user, _ = self.auth.authenticate_credentials(response.data["token"])
+        self.assertEqual(user, self.user)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {response.data["token"]}')
+        rotated = self.client.post(reverse('api-token-rotate')).data["token"]
+        self.assertNotEqual(rotated, response.data["token"])
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(response.data["token"])
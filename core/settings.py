@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 
@@ -150,7 +151,51 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-    ]
-}
\ No newline at end of file
+    ],
+    # JSON через orjson (requirements.txt), без него - стандартный JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'study.api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Срок действия API токена, после него нужно получить новый через v1/api-token-auth/
+TOKEN_TTL = timedelta(days=int(os.environ.get("TOKEN_TTL_DAYS", "30")))
+
+# Фоновые задачи (study.jobs) выполняются в потоке веб-процесса. false - только командой run_jobs,
+# например, если веб-процесс перезапускается во время долгих задач
+JOBS_RUN_IN_THREAD = os.environ.get("JOBS_RUN_IN_THREAD", "true") != "false"
+# Задача без отметок прогресса дольше JOBS_STALE_AFTER считается прерванной (процесс перезапустили)
+# и возвращается в очередь; после JOBS_MAX_ATTEMPTS запусков она завершается ошибкой
+JOBS_STALE_AFTER = timedelta(minutes=int(os.environ.get("JOBS_STALE_MINUTES", "10")))
+JOBS_MAX_ATTEMPTS = 3
+
+# Cache
+# locmem - для разработки, file/db - общий кэш для нескольких процессов без внешних сервисов,
+# memcached/redis - если они доступны
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+
+CACHE_BACKENDS = {
+    "locmem": ("study.cache_backends.LocMemCache", "ladutsko"),
+    "file": ("study.cache_backends.FileBasedCache", os.path.join(BASE_DIR, "cache")),
+    "db": ("study.cache_backends.DatabaseCache", "study_cache"),
+    "memcached": ("django.core.cache.backends.memcached.PyMemcacheCache", "127.0.0.1:11211"),
+    "redis": ("django.core.cache.backends.redis.RedisCache", "redis://127.0.0.1:6379"),
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get("CACHE_LOCATION", CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'TIMEOUT': int(os.environ.get("CACHE_TIMEOUT", "900")),
+        'KEY_PREFIX': 'ladutsko',
+    }
+}
+
+if CACHE_BACKEND in ("locmem", "file", "db"):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get("CACHE_MAX_ENTRIES", "10000"))}
+
+STUDY_CACHE_ALIAS = 'default'
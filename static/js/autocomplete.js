@@ -0,0 +1,46 @@
+// Выпадающие списки с поиском: варианты загружаются с сервера при открытии и по мере ввода
+$(function() {
+    $(".autocomplete").each(function() {
+        let widget = $(this)
+        let search = widget.find(".autocomplete__search")
+        let results = widget.find(".autocomplete__results")
+        let select = widget.children("select")
+        let timer = null
+
+        function load() {
+            $.getJSON(widget.attr("data-url"), {q: search.val()}, function(data) {
+                results.empty()
+                if (!select.prop("required")) {
+                    $("<div class='select__option autocomplete__option' data-value=''>---</div>").appendTo(results)
+                }
+                data.results.forEach(function(item) {
+                    $("<div class='select__option autocomplete__option'></div>")
+                        .attr("data-value", item.id)
+                        .text(item.text)
+                        .appendTo(results)
+                })
+                if (!data.results.length) {
+                    $("<div class='select__option'>Ничего не найдено</div>").appendTo(results)
+                }
+            })
+        }
+
+        widget.one("click", load)
+        search.on("click", function(event) {
+            event.stopPropagation()
+        })
+        search.on("input", function() {
+            clearTimeout(timer)
+            timer = setTimeout(load, 250)
+        })
+
+        results.on("click", ".autocomplete__option", function() {
+            let value = $(this).attr("data-value")
+            if (!select.children(`option[value='${value}']`).length) {
+                $("<option></option>").attr("value", value).text($(this).text()).appendTo(select)
+            }
+            select.val(value)
+            widget.children(".select__selected").text($(this).text())
+        })
+    })
+})
@@ -1,66 +1,183 @@
 from django.contrib import admin
+from django.db.models import Q
+from django.utils.text import smart_split, unescape_string_literal
 
 from .models import (
     Group, Subject, TeacherGroupSubject, Lesson, LessonPhoto,
-    LessonVideo, Test, Question, Answer, Try, StudentAnswer, StudentIndividualWork
+    LessonVideo, Test, Question, Answer, Try, StudentAnswer, StudentIndividualWork, Topic, TestTopicRule, Job,
+    ArchiveBatch, GradeRollup
 )
+from .autocomplete import prefix_condition
+from .paginators import EstimatedCountPaginator
+
+
+def prefix_search(model, path, term):
+    """
+    prefix_condition по полю связанной модели. Вместо JOIN связь "a__b" проверяется подзапросом
+    a IN (SELECT id FROM b WHERE ...): с условием по присоединенной таблице в OR база просматривает
+    всю основную таблицу, а подзапрос ищет по индексу Upper(поле) и по индексу внешнего ключа.
+    """
+    relation, _, rest = path.partition("__")
+    if not rest:
+        return prefix_condition(path, term)
+    related = model._meta.get_field(relation).related_model
+    return Q(**{f"{relation}__in": related._base_manager.filter(prefix_search(related, rest, term)).values("pk")})
+
+
+class PrefixSearchAdmin(admin.ModelAdmin):
+    """
+    Поиск по полям "^поле" через prefix_search: istartswith, которым их ищет админка, не использует
+    индексы, а диапазон по Upper(поле) использует функциональные индексы.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        if not search_term or not all(field.startswith("^") for field in search_fields):
+            return super().get_search_results(request, queryset, search_term)
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            condition = Q()
+            for field in search_fields:
+                condition |= prefix_search(queryset.model, field[1:], bit)
+            queryset = queryset.filter(condition)
+        # Поиск идет только по прямым внешним ключам подзапросами, строки не дублируются
+        return queryset, False
+
+
+class LargeTableAdmin(PrefixSearchAdmin):
+    """
+    Для таблиц с миллионами строк: без полного COUNT(*) на каждой странице.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Group)
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(PrefixSearchAdmin):
     list_display = ["id", "number"]
+    search_fields = ["^number"]
 
 
 @admin.register(Subject)
-class SubjectAdmin(admin.ModelAdmin):
+class SubjectAdmin(PrefixSearchAdmin):
     list_display = ["name"]
+    search_fields = ["^name"]
 
 
 @admin.register(TeacherGroupSubject)
-class TeacherGroupSubjectAdmin(admin.ModelAdmin):
+class TeacherGroupSubjectAdmin(PrefixSearchAdmin):
     list_display = ["teacher", "subject", "group"]
+    list_select_related = ["teacher", "subject", "group"]
+    search_fields = ["^subject__name", "^group__number", "^teacher__username"]
+    autocomplete_fields = ["subject", "group"]
+    raw_id_fields = ["teacher"]
 
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(PrefixSearchAdmin):
     list_display = ["name", "subject", "type"]
+    list_select_related = ["subject__subject", "subject__group", "subject__teacher"]
+    list_filter = ["type"]
+    search_fields = ["^name"]
+    raw_id_fields = ["subject", "test"]
 
 
 @admin.register(LessonPhoto)
 class LessonPhotoAdmin(admin.ModelAdmin):
     list_display = ["lesson"]
+    list_select_related = ["lesson"]
+    raw_id_fields = ["lesson"]
 
 
 @admin.register(LessonVideo)
 class LessonVideoAdmin(admin.ModelAdmin):
     list_display = ["lesson"]
+    list_select_related = ["lesson"]
+    raw_id_fields = ["lesson"]
+
+
+class TestTopicRuleInline(admin.TabularInline):
+    model = TestTopicRule
+    extra = 0
+    autocomplete_fields = ["topic"]
 
 
 @admin.register(Test)
-class TestAdmin(admin.ModelAdmin):
+class TestAdmin(PrefixSearchAdmin):
+    list_display = ["name"]
+    search_fields = ["^name"]
+    inlines = [TestTopicRuleInline]
+
+
+@admin.register(Topic)
+class TopicAdmin(PrefixSearchAdmin):
     list_display = ["name"]
+    search_fields = ["^name"]
 
 
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
-    list_display = ["type", "text", "test"]
+class QuestionAdmin(LargeTableAdmin):
+    list_display = ["type", "text", "test", "topic"]
+    list_select_related = ["test", "topic"]
+    list_filter = ["type"]
+    search_fields = ["^text", "^test__name"]
+    autocomplete_fields = ["test", "topic"]
 
 
 @admin.register(Answer)
-class AnswerAdmin(admin.ModelAdmin):
+class AnswerAdmin(LargeTableAdmin):
     list_display = ["text", "correct", "question"]
+    list_select_related = ["question__test"]
+    list_filter = ["correct"]
+    search_fields = ["^question__test__name"]
+    raw_id_fields = ["question"]
 
 
 @admin.register(Try)
-class TryAdmin(admin.ModelAdmin):
+class TryAdmin(LargeTableAdmin):
     list_display = ["score", "user", "test"]
+    list_select_related = ["user", "test"]
+    list_filter = ["need_check"]
+    search_fields = ["^user__username", "^test__name"]
+    raw_id_fields = ["user", "test"]
 
 
 @admin.register(StudentAnswer)
-class StudentAnswerAdmin(admin.ModelAdmin):
+class StudentAnswerAdmin(LargeTableAdmin):
     list_display = ["user", "question", "answer", "student_try"]
+    list_select_related = ["user", "question__test", "student_try__user", "student_try__test"]
+    search_fields = ["^user__username", "^question__test__name"]
+    raw_id_fields = ["user", "question", "student_try"]
 
 
 @admin.register(StudentIndividualWork)
-class StudentIndividualWorkAdmin(admin.ModelAdmin):
+class StudentIndividualWorkAdmin(LargeTableAdmin):
     list_display = ["user", "lesson", "score"]
+    list_select_related = ["user", "lesson"]
+    search_fields = ["^user__username", "^lesson__name"]
+    raw_id_fields = ["user", "lesson"]
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["kind", "status", "done", "total", "attempts", "created_by", "created_at"]
+    list_select_related = ["created_by"]
+    list_filter = ["kind", "status"]
+    raw_id_fields = ["created_by"]
+
+
+@admin.register(ArchiveBatch)
+class ArchiveBatchAdmin(admin.ModelAdmin):
+    list_display = ["course", "try_count", "answer_count", "created_at"]
+    list_select_related = ["course__subject", "course__group"]
+    exclude = ["data"]
+    raw_id_fields = ["course"]
+
+
+@admin.register(GradeRollup)
+class GradeRollupAdmin(LargeTableAdmin):
+    list_display = ["user", "test_name", "attempts", "best_score", "course"]
+    list_select_related = ["user", "course__subject", "course__group"]
+    search_fields = ["^user__username", "^test_name"]
+    raw_id_fields = ["batch", "course", "user"]
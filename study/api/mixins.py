@@ -0,0 +1,29 @@
+from rest_framework.response import Response
+
+from study.deletion import delete_later
+
+
+class ValuesListMixin:
+    """
+    Список для generics.ListAPIView через ValuesSerializer: queryset проецируется в values(),
+    пагинатор режет словари, объекты моделей не создаются. serializer_class остается для
+    документации и browsable API.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.values_serializer_class.project(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.values_serializer_class(page).data)
+        return Response(self.values_serializer_class(queryset).data)
+
+
+class BackgroundDestroyMixin:
+    """
+    Для generics.DestroyAPIView: объект помечается удаленным, связанные записи удаляются
+    фоновой задачей (study.deletion), ответ 204 возвращается сразу.
+    """
+
+    def perform_destroy(self, instance):
+        delete_later(instance, self.request.user)
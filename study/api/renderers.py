@@ -0,0 +1,50 @@
+import math
+import sys
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # orjson есть в requirements.txt, без него работает стандартный JSONRenderer
+    orjson = None
+
+
+def _check_finite(value):
+    """
+    orjson записывает NaN и бесконечность как null, а JSONRenderer (STRICT_JSON) отказывается
+    их кодировать - та же ошибка, что у json.dumps(allow_nan=False).
+    Типы numpy проверяются, только если numpy уже загружен: иначе в данных их быть не может.
+    """
+    np = sys.modules.get("numpy")
+    if isinstance(value, float) or np is not None and isinstance(value, np.floating):
+        if not math.isfinite(value):
+            raise ValueError("Out of range float values are not JSON compliant")
+    elif isinstance(value, dict):
+        for item in value.values():
+            _check_finite(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _check_finite(item)
+    elif np is not None and isinstance(value, np.ndarray) and value.dtype.kind == "f" and not np.isfinite(value).all():
+        raise ValueError("Out of range float values are not JSON compliant")
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON через orjson, если он установлен. Даты и прочие типы, которые orjson не знает,
+    кодируются тем же энкодером DRF, поэтому ответ совпадает с JSONRenderer.
+    Ответы с отступами (например, ?indent в Accept) отдаются стандартным рендерером.
+    """
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+        if orjson else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        content = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        # NaN мог появиться только на месте null, поэтому данные проверяются лишь в этом случае
+        if self.strict and b"null" in content:
+            _check_finite(data)
+        return content
@@ -1,3 +1,5 @@
+from django.db import models
+from django.utils import timezone
 from rest_framework import serializers
 
 from accounts.models import Profile, Application
@@ -50,7 +52,7 @@ class StudentSerializer(ProfileEditSerializer):
 class GroupSerializer(serializers.ModelSerializer):
     class Meta:
         model = Group
-        fields = "__all__"
+        exclude = ["deleted_at"]
         read_only_fields = ["id", "students"]
 
 
@@ -76,7 +78,7 @@ class SubjectSerializer(serializers.ModelSerializer):
 class LessonSerializer(serializers.ModelSerializer):
     class Meta:
         model = Lesson
-        fields = '__all__'
+        exclude = ["deleted_at"]
         read_only_fields = ["id"]
 
 
@@ -118,7 +120,7 @@ class StudentWorkSerializer(serializers.ModelSerializer):
 class TestSerializer(serializers.ModelSerializer):
     class Meta:
         model = Test
-        fields = "__all__"
+        exclude = ["deleted_at"]
         read_only_fields = ["id"]
 
 
@@ -141,6 +143,105 @@ class TrySerializer(serializers.ModelSerializer):
         model = Try
         fields = "__all__"
         read_only_fields = ["id"]
+
+
+class ExamSessionSerializer(serializers.ModelSerializer):
+
+    remaining = serializers.IntegerField(source="remaining_seconds", read_only=True)
+
+    class Meta:
+        model = ExamSession
+        fields = ("id", "test", "started_at", "expires_at", "remaining", "draft")
+        read_only_fields = fields
+
+
+def _datetime_representation(value):
+    # Как DateTimeField DRF: в текущем часовом поясе, UTC записывается как Z
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+REPRESENTATIONS = {
+    models.DateTimeField: _datetime_representation,
+    models.DateField: lambda value: value.isoformat(),
+    models.TimeField: lambda value: value.isoformat(),
+    models.DecimalField: str,
+    models.UUIDField: str,
+}
+
+
+class ValuesSerializer:
+    """
+    Сериализатор списков только для чтения: строки берутся из queryset.values() по явному списку
+    колонок, без создания объектов моделей и полей DRF. Результат совпадает с ModelSerializer
+    с теми же полями (внешние ключи - первичные ключи, даты - строки ISO 8601).
+    """
+    model = None
+    fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # values() отдает внешний ключ по имени поля сразу первичным ключом, преобразуются только даты и т.п.
+        cls.converters = []
+        for name in cls.fields:
+            field = cls.model._meta.get_field(name)
+            convert = next((func for field_class, func in REPRESENTATIONS.items() if isinstance(field, field_class)), None)
+            if convert:
+                cls.converters.append((name, convert))
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def project(cls, queryset):
+        return queryset.values(*cls.fields)
+
+    @classmethod
+    def to_representation(cls, row):
+        for name, convert in cls.converters:
+            if row[name] is not None:
+                row[name] = convert(row[name])
+        return row
+
+    @property
+    def data(self):
+        return [self.to_representation(row) for row in self.rows]
+
+
+class LessonValuesSerializer(ValuesSerializer):
+    model = Lesson
+    fields = ("id", "type", "name", "text", "deadline", "subject", "test")
+
+
+class TestValuesSerializer(ValuesSerializer):
+    model = Test
+    fields = ("id", "name", "time_limit", "max_attempts", "shuffle")
+
+
+class QuestionValuesSerializer(ValuesSerializer):
+    model = Question
+    fields = ("id", "type", "text", "test", "topic")
+
+
+class AnswerValuesSerializer(ValuesSerializer):
+    model = Answer
+    fields = ("id", "correct", "text", "question")
+
+
+class TryValuesSerializer(ValuesSerializer):
+    model = Try
+    fields = ("id", "score", "need_check", "question_ids", "selections", "choice_score", "user", "test")
+
+
+class SubjectValuesSerializer(ValuesSerializer):
+    model = Subject
+    fields = ("id", "name")
+
+
 #
 # {
 #  "name": "" ,
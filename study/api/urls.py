@@ -25,6 +25,12 @@ urlpatterns = [
     path("v1/group/add/", api_views.GroupCreateView.as_view(), name="api-group-add"),
     path("v1/group/delete/<int:pk>/", api_views.DeleteGroupView.as_view(), name="api-group-delete"),
     path("v1/group/<int:pk>/students/", api_views.GroupStudentsListView.as_view(), name="api-group-students"),
+    path("v1/group/<int:pk>/students/add/", api_views.GroupStudentsAddView.as_view(), name="api-group-students-add"),
+    path("v1/group/<int:pk>/students/remove/", api_views.GroupStudentsRemoveView.as_view(),
+         name="api-group-students-remove"),
+    path("v1/group/<int:pk>/students/move/", api_views.GroupStudentsMoveView.as_view(), name="api-group-students-move"),
+    path("v1/group/<int:pk>/students/import/", api_views.GroupStudentsImportView.as_view(),
+         name="api-group-students-import"),
     path("v1/group/<int:pk>/add-subject/", api_views.TeacherGroupSubjectCreateView.as_view(), name="api-group-add-subject"),
     path("v1/group/<int:pk>/remove-subject/", api_views.DeleteTeacherGroupSubjectView.as_view(), name="api-group-remove-subject"),
     path("v1/group/exclude-student/<int:pk>/", api_views.ExcludeStudentView.as_view(), name="api-group-exclude-student"),
@@ -58,6 +64,24 @@ urlpatterns = [
     path("v1/test/question/<int:pk>/delete", api_views.DeleteQuestionView.as_view(), name="api-test-question-delete"),
     path("v1/test/try/<int:pk>/check/", api_views.CheckTestView.as_view(), name="api-test-try-check"),
     path("v1/test/<int:pk>/tries/", api_views.TryListView.as_view(), name="api-test-try-list"),
+    path("v1/test/<int:pk>/regrade/", api_views.RegradeTestView.as_view(), name="api-test-regrade"),
+    path("v1/test/<int:pk>/clone/", api_views.TestCloneView.as_view(), name="api-test-clone"),
+    path("v1/test/<int:pk>/questions/bulk/", api_views.TestQuestionsBulkCreateView.as_view(),
+         name="api-test-questions-bulk"),
+    path("v1/test/<int:pk>/export/", api_views.TestExportView.as_view(), name="api-test-export"),
+    path("v1/tests/import/", api_views.TestImportView.as_view(), name="api-tests-import"),
+    path("v1/course/<int:pk>/clone/", api_views.CourseCloneView.as_view(), name="api-course-clone"),
+    path("v1/course/<int:pk>/works/download/", api_views.CourseWorksDownloadView.as_view(),
+         name="api-course-works-download"),
+    path("v1/lesson/<int:pk>/works/download/", api_views.LessonWorksDownloadView.as_view(),
+         name="api-lesson-works-download"),
+    path("v1/course/<int:pk>/close/", api_views.CourseCloseView.as_view(), name="api-course-close"),
+    path("v1/course/<int:pk>/archive/", api_views.CourseArchiveView.as_view(), name="api-course-archive"),
+    path("v1/course/<int:pk>/restore/", api_views.CourseRestoreView.as_view(), name="api-course-restore"),
+    path("v1/transcript/", api_views.TranscriptView.as_view(), name="api-transcript"),
+    path("v1/student/<int:pk>/transcript/", api_views.StudentTranscriptView.as_view(), name="api-student-transcript"),
+    path("v1/job/<int:pk>/", api_views.JobView.as_view(), name="api-job"),
+    path("v1/test/<int:pk>/item-analysis/", api_views.ItemAnalysisView.as_view(), name="api-test-item-analysis"),
 
     path("v1/question/<int:pk>/add-answer-variant/", api_views.AddAnswerVariantView.as_view(), name="api-add-answer-variant"),
     path("v1/question/<int:pk>/add-correct-text-answer/", api_views.AddCorrectTextAnswerView.as_view(), name="api-add-correct-text-answer"),
@@ -82,5 +106,12 @@ urlpatterns = [
     path("v1/student/lesson/<int:pk>/individual-work/", api_views.StudentIndividualWorkView.as_view(),
          name="api/student-individual-work"),
     path("v1/student/test/<int:pk>/", api_views.StudentTestView.as_view(), name="api-student-test"),
+    path("v1/student/test/<int:pk>/heartbeat/", api_views.StudentTestHeartbeatView.as_view(),
+         name="api-student-test-heartbeat"),
+    path("v1/student/deadlines/", api_views.StudentDeadlinesView.as_view(), name="api-student-deadlines"),
+
+    path("v1/cache/stats/", api_views.CacheStatsView.as_view(), name="api-cache-stats"),
+    path("v1/autocomplete/<slug:lookup>/", api_views.AutocompleteView.as_view(), name="api-autocomplete"),
+    path("v1/search/", api_views.SearchView.as_view(), name="api-search"),
 
 ]
\ No newline at end of file
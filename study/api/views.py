@@ -1,17 +1,38 @@
 from sqlite3 import IntegrityError
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
 
-from rest_framework import generics, viewsets, mixins, status
+from rest_framework import generics, viewsets, mixins, serializers, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import IsAuthenticated
 
+from accounts.authentication import CachedTokenAuthentication
 from accounts.forms import UserEditForm, ProfileEditForm, UserCreateForm
 from accounts.models import Application
 from study.api.custom_permissions import NotStudent, AdminOnly, TeacherOnly
+from study.api.mixins import BackgroundDestroyMixin, ValuesListMixin
+from study.api.pagination import LessonPagination
+from study.autocomplete import LIMIT, LOOKUPS, MAX_LIMIT
+from study.cache import get_cache, stats as cache_stats
+from study.archival import archived_tries, transcript
+from study.archives import course_works, lesson_works, zip_response
+from study.authoring import EXPORTERS, AuthoringError, export_test, import_test, read_document, to_gift
+from study.cloning import CloneError, clone_test, get_target_courses, get_target_lessons
+from study.deadlines import get_deadline_rows, split_deadlines
+from study.delivery import get_student_payload
+from study.exams import ExamError, is_expired, save_draft, start_session, submit
+from study.items import get_item_analysis
+from study.jobs import enqueue
+from study.regrade import has_regradable_tries, regrade_test
+from study.roster import RosterError, add_students, import_roster, move_students, remove_students, \
+    set_student_group
+from study.search import LIMIT as SEARCH_LIMIT, MAX_LIMIT as SEARCH_MAX_LIMIT, search
 
 from study.models import *
 from study.forms import SubjectForm, TestForm, QuestionForm, StudentForm, GroupForm, TeacherGroupSubjectForm, \
@@ -20,7 +41,7 @@ from study.api.serializers import *
 
 
 class IndexView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
 
     menu = {
         "admin": {
@@ -53,8 +74,11 @@ class IndexView(APIView):
             response = {"menu": self.menu["teacher"]}
         if user.profile.type == 3:
             response = {
-                "menu": {subject.name_for_student: reverse_lazy("student-subject", kwargs={"pk": subject.pk}) for
-                         subject in user.group_set.first().subjects.all()}
+                "menu": {
+                    **{subject.name_for_student: reverse_lazy("student-subject", kwargs={"pk": subject.pk}) for
+                       subject in user.group_set.first().subjects.all()},
+                    "Сроки сдачи": reverse_lazy("student-deadlines"),
+                }
             }
 
         return Response(response)
@@ -64,12 +88,12 @@ class TeachersListView(generics.ListAPIView):
     queryset = User.objects.filter(profile__type=2)
     serializer_class = UserSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
 
 class TeacherEditView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     # {
@@ -112,7 +136,7 @@ class TeacherEditView(APIView):
 
 
 class TeacherCreateView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     # {
@@ -163,9 +187,9 @@ class TeacherCreateView(APIView):
         }, status=status.HTTP_200_OK)
 
 
-class DeleteTeacherView(generics.DestroyAPIView):
+class DeleteTeacherView(BackgroundDestroyMixin, generics.DestroyAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get_queryset(self):
@@ -176,12 +200,12 @@ class StudentsListView(generics.ListAPIView):
     queryset = User.objects.filter(profile__type=3)
     serializer_class = UserSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
 
 class StudentEditView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     # {
@@ -202,18 +226,8 @@ class StudentEditView(APIView):
             user.username = user.email
             user.save()
 
-            group = profile_serializer.validated_data.get("group")
-            user_group = user.group_set.first()
             profile_serializer.save()
-
-            if group:
-                if not (user in group.students.all()):
-                    if user_group:
-                        user_group.students.remove(user)
-                    group.students.add(user)
-            else:
-                if user_group:
-                    user_group.students.remove(user)
+            set_student_group(user, profile_serializer.validated_data.get("group"))
 
             return Response({"detail": "Пользователь успешно изменен!"}, status=status.HTTP_200_OK)
 
@@ -237,7 +251,7 @@ class StudentEditView(APIView):
 
 
 class StudentCreateView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     # {
@@ -266,7 +280,7 @@ class StudentCreateView(APIView):
 
             group = profile_serializer.validated_data.get("group")
             if group:
-                group.students.add(new_user)
+                set_student_group(new_user, group)
 
             try:
                 send_mail(
@@ -297,9 +311,9 @@ class StudentCreateView(APIView):
         }, status=status.HTTP_200_OK)
 
 
-class DeleteStudentView(generics.DestroyAPIView):
+class DeleteStudentView(BackgroundDestroyMixin, generics.DestroyAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get_queryset(self):
@@ -310,12 +324,12 @@ class ApplicationsListView(generics.ListAPIView):
     queryset = Application.objects.all()
     serializer_class = ApplicationSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
 
 class ApplicationView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get(self, request, pk, *args, **kwargs):
@@ -347,7 +361,7 @@ class ApplicationView(APIView):
 
 class DeleteApplicationView(generics.DestroyAPIView):
     serializer_class = ApplicationSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get_queryset(self):
@@ -358,12 +372,12 @@ class GroupsListView(generics.ListAPIView):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
 
 class GroupEditView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     # {
@@ -399,7 +413,7 @@ class GroupEditView(APIView):
 
 
 class GroupCreateView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     # {
@@ -418,9 +432,9 @@ class GroupCreateView(APIView):
         return Response({"form": form.as_div()})
 
 
-class DeleteGroupView(generics.DestroyAPIView):
+class DeleteGroupView(BackgroundDestroyMixin, generics.DestroyAPIView):
     serializer_class = GroupSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get_queryset(self):
@@ -428,19 +442,18 @@ class DeleteGroupView(generics.DestroyAPIView):
 
 
 class ExcludeStudentView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def post(self, request, pk, *args, **kwargs):
         student = get_object_or_404(User, pk=pk)
-        group = student.group_set.first()
-        group.students.remove(student)
+        set_student_group(student, None)
         return Response({"detail": "Студент был исключен"},
                         status=status.HTTP_200_OK)
 
 
 class TeacherGroupSubjectCreateView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     # {
@@ -464,7 +477,7 @@ class TeacherGroupSubjectCreateView(APIView):
 
 class DeleteTeacherGroupSubjectView(generics.DestroyAPIView):
     serializer_class = TeacherGroupSubjectSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get_queryset(self):
@@ -472,7 +485,7 @@ class DeleteTeacherGroupSubjectView(generics.DestroyAPIView):
 
 
 class GroupStudentsListView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get(self, request, pk, *args, **kwargs):
@@ -485,16 +498,91 @@ class GroupStudentsListView(APIView):
         })
 
 
-class SubjectsListView(generics.ListAPIView):
+def _roster_students(request):
+    students = request.data.get("students")
+    if not isinstance(students, list):
+        return None
+    return students
+
+
+class GroupStudentsAddView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [AdminOnly]
+
+    # {
+    #     "students": [3, 4, 5]
+    # }
+    def post(self, request, pk, *args, **kwargs):
+        group = get_object_or_404(Group, pk=pk)
+        students = _roster_students(request)
+        if students is None:
+            return Response({"detail": "Укажите список студентов."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(add_students(group, students).as_dict(), status=status.HTTP_200_OK)
+
+
+class GroupStudentsRemoveView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [AdminOnly]
+
+    # {
+    #     "students": [3, 4, 5]
+    # }
+    def post(self, request, pk, *args, **kwargs):
+        group = get_object_or_404(Group, pk=pk)
+        students = _roster_students(request)
+        if students is None:
+            return Response({"detail": "Укажите список студентов."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(remove_students(group, students).as_dict(), status=status.HTTP_200_OK)
+
+
+class GroupStudentsMoveView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [AdminOnly]
+
+    # {
+    #     "target": 2,
+    #     "students": [3, 4, 5]  - без списка переводится вся группа
+    # }
+    def post(self, request, pk, *args, **kwargs):
+        group = get_object_or_404(Group, pk=pk)
+        target = Group.objects.filter(pk=request.data.get("target")).first() \
+            if str(request.data.get("target", "")).isdigit() else None
+        if target is None:
+            return Response({"detail": "Группа не найдена."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = move_students(group, target, _roster_students(request))
+        except RosterError as err:
+            return Response({"detail": str(err)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
+
+
+class GroupStudentsImportView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [AdminOnly]
+
+    def post(self, request, pk, *args, **kwargs):
+        group = get_object_or_404(Group, pk=pk)
+        file = request.FILES.get("file")
+        if file is None:
+            return Response({"detail": "Загрузите CSV файл."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = import_roster(group, file)
+        except RosterError as err:
+            return Response({"detail": str(err)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
+
+
+class SubjectsListView(ValuesListMixin, generics.ListAPIView):
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
+    values_serializer_class = SubjectValuesSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
 
 class SubjectEditView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def post(self, request, pk, *args, **kwargs):
@@ -521,7 +609,7 @@ class SubjectEditView(APIView):
 
 
 class SubjectCreateView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     # {
@@ -546,26 +634,31 @@ class SubjectCreateView(APIView):
 
 class DeleteSubjectView(generics.DestroyAPIView):
     serializer_class = SubjectSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get_queryset(self):
         return Subject.objects.filter(id=self.kwargs['pk'])
 
 
-class LessonsListView(generics.ListAPIView):
-    queryset = Lesson.objects.all()
+class LessonsListView(ValuesListMixin, generics.ListAPIView):
     serializer_class = LessonSerializer
+    values_serializer_class = LessonValuesSerializer
+    pagination_class = LessonPagination
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
+    def get_queryset(self):
+        return Lesson.objects.filter_by_params(self.request.query_params).ordered_by_param(
+            self.request.query_params.get("ordering"))
+
 
 from rest_framework.parsers import FileUploadParser
 
 
 class LessonPhotoAddingView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     parser_classes = (FileUploadParser,)
@@ -587,7 +680,7 @@ class LessonPhotoAddingView(APIView):
 
 
 class LessonVideoAddingView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     parser_classes = (FileUploadParser,)
@@ -609,7 +702,7 @@ class LessonVideoAddingView(APIView):
 
 
 class LessonFileAddingView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     parser_classes = (FileUploadParser,)
@@ -631,7 +724,7 @@ class LessonFileAddingView(APIView):
 
 
 class LessonEditView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     # {
@@ -675,7 +768,7 @@ class LessonEditView(APIView):
 
 
 class LessonCreateView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     # {
@@ -710,9 +803,9 @@ class LessonCreateView(APIView):
         })
 
 
-class DeleteLessonView(generics.DestroyAPIView):
+class DeleteLessonView(BackgroundDestroyMixin, generics.DestroyAPIView):
     serializer_class = LessonSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get_queryset(self):
@@ -721,7 +814,7 @@ class DeleteLessonView(generics.DestroyAPIView):
 
 class DeleteLessonPhotoView(generics.DestroyAPIView):
     serializer_class = LessonPhotoSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get_queryset(self):
@@ -730,7 +823,7 @@ class DeleteLessonPhotoView(generics.DestroyAPIView):
 
 class DeleteLessonVideoView(generics.DestroyAPIView):
     serializer_class = LessonVideoSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get_queryset(self):
@@ -739,7 +832,7 @@ class DeleteLessonVideoView(generics.DestroyAPIView):
 
 class DeleteLessonFileView(generics.DestroyAPIView):
     serializer_class = LessonFileSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [AdminOnly]
 
     def get_queryset(self):
@@ -747,7 +840,7 @@ class DeleteLessonFileView(generics.DestroyAPIView):
 
 
 class CheckStudentWork(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     # {
@@ -773,28 +866,31 @@ class CheckStudentWork(APIView):
         })
 
 
-class TestsListView(generics.ListAPIView):
+class TestsListView(ValuesListMixin, generics.ListAPIView):
     queryset = Test.objects.all()
     serializer_class = TestSerializer
+    values_serializer_class = TestValuesSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
 
-class TestQuestionsListView(generics.ListAPIView):
+class TestQuestionsListView(ValuesListMixin, generics.ListAPIView):
     serializer_class = QuestionSerializer
+    values_serializer_class = QuestionValuesSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def get_queryset(self):
         return Question.objects.filter(test__id=self.kwargs['pk'])
 
 
-class QuestionAnswersListView(generics.ListAPIView):
+class QuestionAnswersListView(ValuesListMixin, generics.ListAPIView):
     serializer_class = AnswerSerializer
+    values_serializer_class = AnswerValuesSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def get_queryset(self):
@@ -802,7 +898,7 @@ class QuestionAnswersListView(generics.ListAPIView):
 
 
 class TestCreateView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def post(self, request, format=None):
@@ -823,7 +919,7 @@ class TestCreateView(APIView):
 
 
 class TestEditView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def post(self, request, pk, format=None):
@@ -845,9 +941,9 @@ class TestEditView(APIView):
         return Response(response)
 
 
-class DeleteTestView(generics.DestroyAPIView):
+class DeleteTestView(BackgroundDestroyMixin, generics.DestroyAPIView):
     serializer_class = Test
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def get_queryset(self):
@@ -855,7 +951,7 @@ class DeleteTestView(generics.DestroyAPIView):
 
 
 class CheckTestView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def post(self, request, *args, **kwargs):
@@ -873,10 +969,230 @@ class CheckTestView(APIView):
         })
 
 
-class TryListView(generics.ListAPIView):
+class RegradeTestView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [NotStudent]
+
+    # {
+    #     "dry_run": true
+    # }
+    def post(self, request, pk, *args, **kwargs):
+        test = get_object_or_404(Test, pk=pk)
+        report = regrade_test(test, dry_run=bool(request.data.get("dry_run")))
+        return Response({"detail": "Баллы попыток пересчитаны", "report": report.as_dict()},
+                        status=status.HTTP_200_OK)
+
+
+class LessonWorksDownloadView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [NotStudent]
+
+    def get(self, request, pk, *args, **kwargs):
+        lesson = get_object_or_404(Lesson, pk=pk)
+        return zip_response(lesson_works(lesson), f"Работы - {lesson.name}")
+
+
+class CourseWorksDownloadView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [NotStudent]
+
+    def get(self, request, pk, *args, **kwargs):
+        course = get_object_or_404(TeacherGroupSubject.objects.select_related("subject", "group"), pk=pk)
+        return zip_response(course_works(course), f"Работы - {course.subject.name}, группа {course.group.number}")
+
+
+class TestImportView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [NotStudent]
+
+    # Документ JSON (study.authoring) в теле запроса или файл .json/.gift в поле file,
+    # name - название теста для GIFT
+    def post(self, request, *args, **kwargs):
+        try:
+            file = request.FILES.get("file")
+            data = read_document(file, name=request.data.get("name")) if file is not None else request.data
+            test, count = import_test(data)
+        except AuthoringError as err:
+            return Response({"detail": "Тест не загружен.", "errors": err.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"id": test.pk, "name": test.name, "questions": count}, status=status.HTTP_201_CREATED)
+
+
+class TestQuestionsBulkCreateView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [NotStudent]
+
+    # {
+    #     "questions": [{"type": "CH", "text": "...", "topic": "...", "answers": [{"text": "...", "correct": true}]}],
+    #     "rules": [{"topic": "...", "count": 5}]
+    # }
+    def post(self, request, pk, *args, **kwargs):
+        test = get_object_or_404(Test, pk=pk)
+        try:
+            test, count = import_test(request.data, test=test)
+        except AuthoringError as err:
+            return Response({"detail": "Вопросы не добавлены.", "errors": err.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"id": test.pk, "created": count}, status=status.HTTP_201_CREATED)
+
+
+class TestExportView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [NotStudent]
+
+    # ?type=gift - в формате GIFT, иначе документ JSON
+    def get(self, request, pk, *args, **kwargs):
+        test = get_object_or_404(Test, pk=pk)
+        data = export_test(test)
+        if request.query_params.get("type") != "gift":
+            return Response(data)
+        content_type, extension, _ = EXPORTERS["gift"]
+        response = HttpResponse(to_gift(data), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{test.name}.{extension}"'
+        return response
+
+
+class TestCloneView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [NotStudent]
+
+    # {
+    #     "lessons": [3, 4, 5],  - копия привязывается к каждому занятию
+    #     "copies": 2  - без занятий создается столько непривязанных копий
+    # }
+    def post(self, request, pk, *args, **kwargs):
+        test = get_object_or_404(Test, pk=pk)
+        lessons = request.data.get("lessons") or []
+        copies = request.data.get("copies", 1)
+        if not isinstance(lessons, list) or not all(str(lesson).isdigit() for lesson in lessons) \
+                or not str(copies).isdigit():
+            return Response({"detail": "Неверные данные для копирования теста."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            clones = clone_test(test, copies=int(copies), lessons=get_target_lessons(request.user, lessons))
+        except CloneError as err:
+            return Response({"detail": str(err)}, status=status.HTTP_400_BAD_REQUEST)
+        lesson_ids = dict(Lesson.objects.filter(test__in=clones).values_list("test_id", "pk"))
+        return Response({
+            "tests": [{"id": clone.pk, "name": clone.name, "lesson": lesson_ids.get(clone.pk)} for clone in clones]
+        }, status=status.HTTP_201_CREATED)
+
+
+class CourseCloneView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [NotStudent]
+
+    # {
+    #     "targets": [3, 4],  - дисциплины групп, в которые копируются занятия
+    #     "offset_days": 7  - сдвиг сроков сдачи
+    # }
+    def post(self, request, pk, *args, **kwargs):
+        source = get_object_or_404(TeacherGroupSubject, pk=pk)
+        targets = request.data.get("targets") or []
+        offset_days = str(request.data.get("offset_days", 0))
+        if not isinstance(targets, list) or not all(str(target).isdigit() for target in targets) \
+                or not offset_days.lstrip("-").isdigit() or abs(int(offset_days)) > 365:
+            return Response({"detail": "Неверные данные для копирования занятий."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            targets = get_target_courses(request.user, source, targets)
+        except CloneError as err:
+            return Response({"detail": str(err)}, status=status.HTTP_400_BAD_REQUEST)
+        job = enqueue(Job.Kind.COURSE_CLONE, request.user, source=source.pk,
+                      targets=[target.pk for target in targets], offset_days=int(offset_days))
+        return Response(job.as_dict(), status=status.HTTP_202_ACCEPTED)
+
+
+class JobView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        jobs = Job.objects.all() if request.user.profile.type == 1 else Job.objects.filter(created_by=request.user)
+        return Response(get_object_or_404(jobs, pk=pk).as_dict())
+
+
+class CourseCloseView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [AdminOnly]
+
+    # {
+    #     "closed": true  - семестр закончен (false - открыть дисциплину снова)
+    # }
+    def post(self, request, pk, *args, **kwargs):
+        course = get_object_or_404(TeacherGroupSubject, pk=pk)
+        # В form-data значение приходит строкой: "false" и "0" открывают дисциплину
+        try:
+            closed = serializers.BooleanField().to_internal_value(request.data.get("closed", True))
+        except serializers.ValidationError:
+            return Response({"detail": "Неверно введены данные!"}, status=status.HTTP_400_BAD_REQUEST)
+        closed_at = timezone.now() if closed else None
+        # update, а не save: закрытие не меняет поисковый индекс дисциплины
+        TeacherGroupSubject.objects.filter(pk=course.pk).update(closed_at=closed_at)
+        return Response({"id": course.pk, "closed_at": closed_at})
+
+
+class CourseArchiveView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+
+    def get_permissions(self):
+        return [NotStudent()] if self.request.method == "GET" else [AdminOnly()]
+
+    # ?user=5 - попытки одного студента
+    def get(self, request, pk, *args, **kwargs):
+        course = get_object_or_404(TeacherGroupSubject, pk=pk)
+        user = request.query_params.get("user")
+        if user is not None and not user.isdigit():
+            return Response({"detail": "Неверный студент."}, status=status.HTTP_400_BAD_REQUEST)
+        user = get_object_or_404(User, pk=user) if user else None
+        return Response({"course": course.pk, "tries": archived_tries(course, user)})
+
+    def post(self, request, pk, *args, **kwargs):
+        course = get_object_or_404(TeacherGroupSubject, pk=pk)
+        if not course.closed_at:
+            return Response({"detail": "Архивировать можно только закрытую дисциплину."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        job = enqueue(Job.Kind.ARCHIVE, request.user, course=course.pk)
+        return Response(job.as_dict(), status=status.HTTP_202_ACCEPTED)
+
+
+class CourseRestoreView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [AdminOnly]
+
+    def post(self, request, pk, *args, **kwargs):
+        course = get_object_or_404(TeacherGroupSubject, pk=pk)
+        job = enqueue(Job.Kind.RESTORE, request.user, course=course.pk)
+        return Response(job.as_dict(), status=status.HTTP_202_ACCEPTED)
+
+
+class TranscriptView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response({"student": request.user.pk, "transcript": transcript(request.user)})
+
+
+class StudentTranscriptView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [NotStudent]
+
+    def get(self, request, pk, *args, **kwargs):
+        student = get_object_or_404(User, pk=pk, profile__type=3)
+        return Response({"student": student.pk, "transcript": transcript(student)})
+
+
+class ItemAnalysisView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [NotStudent]
+
+    def get(self, request, pk, *args, **kwargs):
+        test = get_object_or_404(Test, pk=pk)
+        return Response({"test": test.pk, "questions": get_item_analysis(test)})
+
+
+class TryListView(ValuesListMixin, generics.ListAPIView):
     serializer_class = TrySerializer
+    values_serializer_class = TryValuesSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def get_queryset(self):
@@ -884,7 +1200,7 @@ class TryListView(generics.ListAPIView):
 
 
 class TestQuestionCreateView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def post(self, request, pk, format=None):
@@ -919,7 +1235,7 @@ class TestQuestionCreateView(APIView):
 
 class DeleteQuestionView(generics.DestroyAPIView):
     serializer_class = QuestionSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def get_queryset(self):
@@ -927,7 +1243,7 @@ class DeleteQuestionView(generics.DestroyAPIView):
 
 
 class TestQuestionEditView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     # {
@@ -956,7 +1272,7 @@ class TestQuestionEditView(APIView):
 
 
 class AddAnswerVariantView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def post(self, request, pk, *args, **kwargs):
@@ -965,14 +1281,15 @@ class AddAnswerVariantView(APIView):
         if serializer.is_valid():
             serializer.save(question=question)
 
-            return Response({"detail": "Вариант ответа успешно добавлен!", "answer": serializer.data},
+            return Response({"detail": "Вариант ответа успешно добавлен!", "answer": serializer.data,
+                             "regrade_needed": has_regradable_tries(question.test_id)},
                             status=status.HTTP_200_OK)
 
         return Response({"detail": "Ошибка при добавлении варианта ответа."}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class AddCorrectTextAnswerView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def post(self, request, pk, *args, **kwargs):
@@ -997,7 +1314,7 @@ class AddCorrectTextAnswerView(APIView):
 
 class DeleteAnswerView(generics.DestroyAPIView):
     serializer_class = QuestionSerializer
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def get_queryset(self):
@@ -1007,7 +1324,7 @@ class DeleteAnswerView(generics.DestroyAPIView):
 class MyGroupListView(generics.ListAPIView):
     serializer_class = GroupSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [TeacherOnly]
 
     def get_queryset(self):
@@ -1015,7 +1332,7 @@ class MyGroupListView(generics.ListAPIView):
 
 
 class AddSubjectToGroup(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [TeacherOnly]
 
     def post(self, request, pk, *args, **kwargs):
@@ -1030,7 +1347,7 @@ class AddSubjectToGroup(APIView):
 
 
 class RemoveSubjectFromGroup(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [TeacherOnly]
 
     def post(self, request, pk, *args, **kwargs):
@@ -1045,7 +1362,7 @@ class RemoveSubjectFromGroup(APIView):
 
 
 class StudentGradeView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [NotStudent]
 
     def get(self, request, *args, **kwargs):
@@ -1065,12 +1382,12 @@ class MySubjectsListView(generics.ListAPIView):
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [TeacherOnly]
 
 
 class MySubjectEditView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [TeacherOnly]
 
     def post(self, request, pk, *args, **kwargs):
@@ -1101,7 +1418,7 @@ class MySubjectEditView(APIView):
 
 
 class MySubjectCreateView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [TeacherOnly]
 
     # {
@@ -1126,19 +1443,18 @@ class MySubjectCreateView(APIView):
 
 class MyLessonsListView(generics.ListAPIView):
     serializer_class = LessonSerializer
+    pagination_class = LessonPagination
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [TeacherOnly]
 
     def get_queryset(self):
-        lessons = []
-        for subject in TeacherGroupSubject.objects.filter(teacher=self.request.user):
-            lessons += list(subject.lessons.all())
-        return lessons
+        return Lesson.objects.for_teacher(self.request.user).filter_by_params(self.request.query_params).ordered_by_param(
+            self.request.query_params.get("ordering"))
 
 
 class MyLessonEditView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [TeacherOnly]
 
     # {
@@ -1182,7 +1498,7 @@ class MyLessonEditView(APIView):
 
 
 class MyLessonCreateView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [TeacherOnly]
 
     # {
@@ -1221,12 +1537,12 @@ class MyTestsListView(generics.ListAPIView):
     queryset = Test.objects.all()
     serializer_class = TestSerializer
 
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [TeacherOnly]
 
 
 class StudentSubjectView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
 
     def get(self, request, pk, *args, **kwargs):
         user = self.request.user
@@ -1249,7 +1565,7 @@ class StudentSubjectView(APIView):
 
 
 class StudentLessonView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
 
     def get(self, request, pk, *args, **kwargs):
         user = self.request.user
@@ -1282,8 +1598,26 @@ class StudentLessonView(APIView):
         })
 
 
+class StudentDeadlinesView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+
+    def get(self, request, *args, **kwargs):
+        user = self.request.user
+        group = user.group_set.first()
+
+        if not group:
+            return Response({"detail": "Нет разрешения"}, status=status.HTTP_400_BAD_REQUEST)
+
+        upcoming, overdue = split_deadlines(get_deadline_rows(user, group))
+
+        return Response({
+            "upcoming": upcoming,
+            "overdue": overdue,
+        })
+
+
 class StudentIndividualWorkView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
 
     parser_classes = (FileUploadParser,)
 
@@ -1313,7 +1647,7 @@ class StudentIndividualWorkView(APIView):
 
 
 class StudentTestView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
 
     def post(self, request, pk, *args, **kwargs):
         user = self.request.user
@@ -1322,17 +1656,19 @@ class StudentTestView(APIView):
         if not user.group_set.first():
             return Response({"detail": "Нет разрешения"}, status=status.HTTP_400_BAD_REQUEST)
 
-        score, need_check = test.calculate_score(request.POST, user)
-        student_try = Try.objects.create(user=user, test=test, score=score, need_check=need_check)
-        for student_answer in StudentAnswer.objects.filter(user=user, question__test=test, student_try__isnull=True):
-            student_answer.student_try = student_try
-            student_answer.save()
+        try:
+            session = submit(user, test, request.data, session_pk=request.data.get("session"))
+        except ExamError as err:
+            return Response({"detail": str(err)}, status=status.HTTP_400_BAD_REQUEST)
 
-        if need_check:
-            return Response({"detail": "Ваш тест отправлен на проверку"}, status=status.HTTP_200_OK)
+        student_try = session.student_try
+        response = {"autosubmitted": session.autosubmitted, "try": TrySerializer(student_try).data}
 
+        if student_try.need_check:
+            response["detail"] = "Ваш тест отправлен на проверку"
         else:
-            return Response({"detail": f"Ваш балл составил {score}"}, status=status.HTTP_200_OK)
+            response["detail"] = f"Ваш балл составил {student_try.score}"
+        return Response(response, status=status.HTTP_200_OK)
 
     def get(self, request, pk, *args, **kwargs):
         user = self.request.user
@@ -1344,6 +1680,78 @@ class StudentTestView(APIView):
         if test.lesson.is_late():
             return Response({"detail": "Возможности сдать тест больше нет!"}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            session = start_session(user, test)
+        except ExamError as err:
+            return Response({"detail": str(err)}, status=status.HTTP_400_BAD_REQUEST)
+
         return Response({
             "test": TestSerializer(test).data,
+            "questions": get_student_payload(test, user, session.question_ids)["questions"],
+            "session": ExamSessionSerializer(session).data,
         })
+
+
+class StudentTestHeartbeatView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+
+    # {
+    #     "session": 12,
+    #     "answers": {"31": true, "32": false, "35": "текст ответа"}
+    # }
+    def post(self, request, pk, *args, **kwargs):
+        session_pk = request.data.get("session")
+        answers = request.data.get("answers") or {}
+        if not str(session_pk).isdigit() or not isinstance(answers, dict):
+            return Response({"detail": "Неверно введены данные!"}, status=status.HTTP_400_BAD_REQUEST)
+        session = get_object_or_404(ExamSession, pk=session_pk, test__pk=pk, user=request.user)
+
+        saved = save_draft(session, answers)
+        return Response({
+            "saved": saved,
+            "finished": session.is_finished or is_expired(session),
+            "remaining": session.remaining_seconds(),
+        })
+
+
+class CacheStatsView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [AdminOnly]
+
+    def get(self, request, *args, **kwargs):
+        backend = get_cache()
+        return Response({
+            "backend": f"{backend.__class__.__module__}.{backend.__class__.__name__}",
+            "stats": cache_stats.snapshot(),
+        })
+
+    def delete(self, request, *args, **kwargs):
+        cache_stats.reset()
+        return Response({"detail": "Статистика кэша сброшена"}, status=status.HTTP_200_OK)
+
+
+class AutocompleteView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [NotStudent]
+
+    # ?q=<начало названия>&limit=20
+    def get(self, request, lookup, *args, **kwargs):
+        if lookup not in LOOKUPS:
+            return Response({"detail": "Неизвестный список"}, status=status.HTTP_404_NOT_FOUND)
+
+        limit = request.query_params.get("limit", "")
+        limit = min(int(limit), MAX_LIMIT) if limit.isdigit() and int(limit) > 0 else LIMIT
+        results = LOOKUPS[lookup].search(request.user, request.query_params.get("q", ""), limit)
+        return Response({"results": results})
+
+
+class SearchView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    # ?q=<слова>&limit=20
+    def get(self, request, *args, **kwargs):
+        limit = request.query_params.get("limit", "")
+        limit = min(int(limit), SEARCH_MAX_LIMIT) if limit.isdigit() and int(limit) > 0 else SEARCH_LIMIT
+        results = search(request.user, request.query_params.get("q", ""), limit)
+        return Response({"results": [result.as_dict() for result in results]})
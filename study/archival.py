@@ -0,0 +1,208 @@
+"""
+Архивация попыток закрытых дисциплин групп. Проверенные попытки переносятся порциями из Try,
+StudentAnswer и QuestionResult в ArchiveBatch (gzip JSON Lines), итоги по студенту и тесту остаются
+в GradeRollup: рабочие таблицы не растут из семестра в семестр, ведомость строится по итогам.
+restore_course возвращает попытки из архива в рабочие таблицы с прежними первичными ключами.
+"""
+import gzip
+import json
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+
+from .cache import invalidate_tags
+from .deadlines import user_tag
+from .models import ArchiveBatch, ExamSession, GradeRollup, Question, QuestionResult, StudentAnswer, \
+    TeacherGroupSubject, Test, Try
+
+BATCH_SIZE = 1000
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _fields(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _encode(records):
+    lines = "\n".join(json.dumps(record, ensure_ascii=False, separators=(",", ":")) for record in records)
+    return gzip.compress(lines.encode(), compresslevel=6)
+
+
+def _decode(data):
+    text = gzip.decompress(bytes(data)).decode()
+    return [json.loads(line) for line in text.split("\n") if line]
+
+
+def archivable_tries(course):
+    # Непроверенные попытки остаются в рабочих таблицах, пока преподаватель их не проверит
+    return Try.objects.filter(test__lesson__subject=course, need_check=False)
+
+
+def _archive_chunk(course, pks):
+    tries = list(Try.objects.filter(pk__in=pks).order_by("pk").values(*_fields(Try)))
+    answers, results, sessions = {}, {}, {}
+    for row in StudentAnswer.objects.filter(student_try__in=pks).order_by("pk").values(*_fields(StudentAnswer)):
+        answers.setdefault(row["student_try_id"], []).append(row)
+    for row in QuestionResult.objects.filter(student_try__in=pks).order_by("pk").values(*_fields(QuestionResult)):
+        results.setdefault(row["student_try_id"], []).append(row)
+    for session_id, try_id in ExamSession.objects.filter(student_try__in=pks).values_list("pk", "student_try_id"):
+        sessions[try_id] = session_id
+    names = {
+        pk: (name, lesson_name or "")
+        for pk, name, lesson_name in Test.all_objects.filter(pk__in={row["test_id"] for row in tries}).values_list(
+            "pk", "name", "lesson__name")
+    }
+
+    rollups = {}
+    for row in tries:
+        row["answers"] = answers.get(row["id"], [])
+        row["results"] = results.get(row["id"], [])
+        row["exam_session_id"] = sessions.get(row["id"])
+        rollup = rollups.setdefault((row["user_id"], row["test_id"]), {"attempts": 0, "best_score": row["score"]})
+        rollup["attempts"] += 1
+        rollup["best_score"] = max(rollup["best_score"], row["score"])
+        rollup["last_score"] = row["score"]  # попытки идут по возрастанию pk
+
+    with transaction.atomic():
+        batch = ArchiveBatch.objects.create(
+            course=course, try_count=len(tries), answer_count=sum(len(row["answers"]) for row in tries),
+            data=_encode(tries),
+        )
+        GradeRollup.objects.bulk_create([
+            GradeRollup(batch=batch, course=course, user_id=user_id, test_id=test_id, test_name=names[test_id][0],
+                        lesson_name=names[test_id][1], **values)
+            for (user_id, test_id), values in rollups.items()
+        ])
+        # Ответы и результаты по вопросам удаляются каскадом, post_delete Try сбрасывает кеш студентов
+        Try.objects.filter(pk__in=pks).delete()
+    return len(tries)
+
+
+def archive_course(course, batch_size=BATCH_SIZE, progress=None):
+    """
+    Переносит проверенные попытки закрытой дисциплины группы в архив. Возвращает число попыток.
+    """
+    if not course.closed_at:
+        raise ArchiveError("Дисциплина группы не закрыта")
+    total = archivable_tries(course).count()
+    done = 0
+    if progress:
+        progress(done, total)
+    while True:
+        pks = list(archivable_tries(course).order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+        done += _archive_chunk(course, pks)
+        if progress:
+            progress(done, max(total, done))
+    return done
+
+
+def _restore_batch(batch):
+    records = _decode(batch.data)
+    tests = set(Test.all_objects.filter(pk__in={row["test_id"] for row in records}).values_list("pk", flat=True))
+    users = set(batch.rollups.values_list("user_id", flat=True))
+    # Попытки удаленных тестов и студентов и ответы на удаленные вопросы не восстанавливаются
+    records = [row for row in records if row["test_id"] in tests]
+    questions = set(Question.objects.filter(test__in=tests).values_list("pk", flat=True))
+
+    try_fields, answer_fields, result_fields = _fields(Try), _fields(StudentAnswer), _fields(QuestionResult)
+    with transaction.atomic():
+        tries = Try.objects.bulk_create([
+            Try(**{name: row[name] for name in try_fields if name in row}) for row in records
+            if row["user_id"] in users
+        ])
+        restored = {student_try.pk for student_try in tries}
+        StudentAnswer.objects.bulk_create([
+            StudentAnswer(**{name: answer[name] for name in answer_fields if name in answer})
+            for row in records if row["id"] in restored for answer in row["answers"] if answer["question_id"] in questions
+        ])
+        QuestionResult.objects.bulk_create([
+            QuestionResult(**{name: result[name] for name in result_fields if name in result})
+            for row in records if row["id"] in restored for result in row["results"]
+            if result["question_id"] in questions
+        ])
+        for row in records:
+            if row["id"] in restored and row.get("exam_session_id"):
+                ExamSession.objects.filter(pk=row["exam_session_id"], student_try__isnull=True).update(
+                    student_try_id=row["id"])
+        batch.delete()
+    # bulk_create не отправляет post_save, кеш студентов сбрасывается здесь
+    invalidate_tags(*(user_tag(user_id) for user_id in users))
+    return len(restored)
+
+
+def restore_course(course, progress=None):
+    """
+    Возвращает архивированные попытки дисциплины группы в рабочие таблицы. Возвращает число попыток.
+    """
+    batches = list(course.archive_batches.order_by("pk").values_list("pk", flat=True))
+    done = 0
+    if progress:
+        progress(0, len(batches))
+    for number, pk in enumerate(batches, start=1):
+        done += _restore_batch(ArchiveBatch.objects.get(pk=pk))
+        if progress:
+            progress(number, len(batches))
+    return done
+
+
+def archived_tries(course, user=None):
+    """
+    Попытки из архива дисциплины группы (все или одного студента) с ответами и результатами по вопросам.
+    """
+    tries = []
+    batches = course.archive_batches.order_by("pk")
+    if user is not None:
+        batches = batches.filter(rollups__user=user).distinct()
+    for data in batches.values_list("data", flat=True):
+        tries += [row for row in _decode(data) if user is None or row["user_id"] == user.pk]
+    return tries
+
+
+def transcript(user):
+    """
+    Ведомость студента: лучший балл и число попыток по каждому тесту занятий его дисциплин,
+    из рабочих таблиц и из архива.
+    """
+    rows = {}
+
+    def add(key, values, archived):
+        row = rows.setdefault(key, {**values, "attempts": 0, "best_score": None, "archived": False})
+        row["attempts"] += values["attempts"]
+        row["best_score"] = max(filter(lambda score: score is not None, (row["best_score"], values["best_score"])))
+        row["archived"] = row["archived"] or archived
+
+    hot = (
+        Try.objects.filter(user=user, test__lesson__subject__isnull=False)
+        .values("test_id", course_id=F("test__lesson__subject"), subject=F("test__lesson__subject__subject__name"),
+                group=F("test__lesson__subject__group__number"), test_name=F("test__name"),
+                lesson=F("test__lesson__name"))
+        .annotate(attempts=Count("pk"), best_score=Max("score"))
+    )
+    for values in hot:
+        add((values["course_id"], values["test_id"]), values, False)
+
+    archived = (
+        GradeRollup.objects.filter(user=user)
+        .values("course_id", "test_id", "test_name", subject=F("course__subject__name"),
+                group=F("course__group__number"), lesson=F("lesson_name"))
+        .annotate(attempts=Sum("attempts"), best_score=Max("best_score"))
+    )
+    for values in archived:
+        add((values["course_id"], values["test_id"]), values, True)
+
+    return sorted(rows.values(), key=lambda row: (row["subject"], row["group"], row["lesson"] or "", row["test_id"]))
+
+
+def run_archive(params, progress):
+    course = TeacherGroupSubject.objects.get(pk=params["course"])
+    return {"tries": archive_course(course, progress=progress)}
+
+
+def run_restore(params, progress):
+    course = TeacherGroupSubject.objects.get(pk=params["course"])
+    return {"tries": restore_course(course, progress=progress)}
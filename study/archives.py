@@ -0,0 +1,118 @@
+"""
+Потоковая выгрузка работ студентов ZIP-архивом. zipfile пишет в поток без seek (размеры и CRC
+записываются после данных каждого файла), поэтому архив отдается кусками по мере чтения файлов
+из хранилища и не собирается ни на диске, ни в памяти: память не зависит от размера архива.
+"""
+import logging
+import re
+import zipfile
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+from .models import StudentIndividualWork
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+MISSING_NAME = "не_найдены.txt"
+
+
+class _Sink:
+    """
+    Поток без seek, из которого генератор забирает записанные zipfile байты.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _safe(name):
+    return re.sub(r'[\\/:*?"<>|\x00-\x1f]+', "_", name).strip(" .") or "_"
+
+
+def stream_zip(entries, chunk_size=CHUNK_SIZE):
+    """
+    Генератор байтов ZIP-архива. entries - пары (имя в архиве, FieldFile). Файлы уже сжаты
+    (pdf, docx, изображения), поэтому сохраняются без сжатия. Файлы, которых нет в хранилище,
+    перечисляются в MISSING_NAME в конце архива.
+    """
+    sink = _Sink()
+    missing = []
+    used = set()
+    date_time = timezone.localtime().timetuple()[:6]
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for name, field_file in entries:
+            try:
+                source = field_file.storage.open(field_file.name, "rb")
+                size = field_file.storage.size(field_file.name)
+            except (OSError, ValueError):
+                logger.warning("Файл работы не найден: %s", field_file.name)
+                missing.append(name)
+                continue
+
+            # Одинаковые имена (однофамильцы, повторная загрузка) получают номер
+            base, dot, extension = name.rpartition(".") if "." in name.rsplit("/", 1)[-1] else (name, "", "")
+            number = 1
+            while name in used:
+                number += 1
+                name = f"{base} ({number}){dot}{extension}"
+            used.add(name)
+
+            info = zipfile.ZipInfo(name, date_time)
+            info.file_size = size  # по размеру zipfile решает, нужен ли ZIP64
+            with source, archive.open(info, mode="w") as target:
+                while True:
+                    data = source.read(chunk_size)
+                    if not data:
+                        break
+                    target.write(data)
+                    yield sink.drain()
+            # Дескриптор данных с CRC и размером записывается при закрытии файла архива
+            yield sink.drain()
+
+        if missing:
+            archive.writestr(MISSING_NAME, "\n".join(missing))
+    yield sink.drain()
+
+
+def student_work_entries(queryset):
+    """
+    Пары (имя в архиве, файл) для работ студентов: папка занятия, в ней файл
+    "Фамилия Имя (логин).расширение".
+    """
+    works = queryset.select_related("user", "lesson").order_by("lesson__name", "lesson_id", "user__last_name", "pk")
+    for work in works.iterator(chunk_size=500):
+        if not work.file:
+            continue
+        extension = work.file.name.rsplit(".", 1)[-1] if "." in work.file.name.rsplit("/", 1)[-1] else ""
+        student = " ".join(filter(None, [work.user.last_name, work.user.first_name])) or work.user.username
+        name = f"{_safe(student)} ({_safe(work.user.username)})"
+        yield f"{_safe(work.lesson.name)}/{name}{'.' + _safe(extension) if extension else ''}", work.file
+
+
+def lesson_works(lesson):
+    return student_work_entries(StudentIndividualWork.objects.filter(lesson=lesson))
+
+
+def course_works(course):
+    return student_work_entries(StudentIndividualWork.objects.filter(lesson__subject=course))
+
+
+def zip_response(entries, filename):
+    response = StreamingHttpResponse(stream_zip(entries), content_type="application/zip")
+    response["Content-Disposition"] = content_disposition_header(True, f"{_safe(filename)}.zip")
+    return response
@@ -0,0 +1,366 @@
+"""
+Импорт и экспорт тестов целиком: JSON (формат этого приложения) и GIFT (текстовый формат Moodle).
+Документ сначала целиком проверяется, затем вопросы, варианты и правила создаются bulk_create в одной
+транзакции: новые первичные ключи вопросов сопоставляются вопросам документа по порядку вставки.
+
+JSON:
+    {
+        "format": "ladutsko-test", "version": 1,
+        "test": {"name": "...", "time_limit": 30, "max_attempts": 2, "shuffle": false},
+        "rules": [{"topic": "Матрицы", "count": 5}],
+        "questions": [
+            {"type": "CH", "text": "...", "topic": "Матрицы", "answers": [{"text": "...", "correct": true}]},
+            {"type": "TX", "text": "...", "answers": [{"text": "правильный ответ"}]}
+        ]
+    }
+"""
+import json
+import re
+
+from django.db import transaction
+
+from .cache import bump_version
+from .models import Answer, Question, SearchEntry, Test, TestTopicRule, Topic
+from .search import index_objects
+
+FORMAT = "ladutsko-test"
+VERSION = 1
+MAX_QUESTIONS = 10000
+MAX_ANSWERS = 50
+TEXT_PLACEHOLDER = "Ответ"  # ответ текстового вопроса без правильного ответа, как при создании вопроса вручную
+
+TEXT_LENGTH = Question._meta.get_field("text").max_length
+ANSWER_LENGTH = Answer._meta.get_field("text").max_length
+NAME_LENGTH = Test._meta.get_field("name").max_length
+TOPIC_LENGTH = Topic._meta.get_field("name").max_length
+
+
+class AuthoringError(Exception):
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("; ".join(self.errors[:10]))
+
+
+def _text(value, path, max_length, errors, required=True):
+    if value is None or value == "":
+        if required:
+            errors.append(f"{path}: обязательное поле")
+        return None
+    if not isinstance(value, str):
+        errors.append(f"{path}: должно быть строкой")
+        return None
+    value = value.strip()
+    if len(value) > max_length:
+        errors.append(f"{path}: не больше {max_length} символов")
+    return value
+
+
+def _positive(value, path, errors):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        errors.append(f"{path}: должно быть целым числом больше 0")
+        return None
+    return value
+
+
+def _clean_question(item, path, errors):
+    if not isinstance(item, dict):
+        errors.append(f"{path}: должно быть объектом")
+        return None
+    question_type = item.get("type", Question.Type.CHOOSE)
+    if question_type not in Question.Type.values:
+        errors.append(f"{path}.type: допустимые значения {', '.join(Question.Type.values)}")
+    answers = item.get("answers") or []
+    if not isinstance(answers, list):
+        errors.append(f"{path}.answers: должно быть списком")
+        answers = []
+    if len(answers) > MAX_ANSWERS:
+        errors.append(f"{path}.answers: не больше {MAX_ANSWERS} вариантов")
+
+    cleaned_answers = []
+    for index, answer in enumerate(answers):
+        answer_path = f"{path}.answers[{index}]"
+        if not isinstance(answer, dict):
+            errors.append(f"{answer_path}: должно быть объектом")
+            continue
+        cleaned_answers.append({
+            "text": _text(answer.get("text"), f"{answer_path}.text", ANSWER_LENGTH, errors),
+            "correct": bool(answer.get("correct", question_type == Question.Type.TEXT)),
+        })
+    if question_type == Question.Type.TEXT:
+        if len(cleaned_answers) > 1:
+            errors.append(f"{path}.answers: у текстового вопроса один правильный ответ")
+        cleaned_answers = cleaned_answers[:1] or [{"text": TEXT_PLACEHOLDER, "correct": False}]
+
+    return {
+        "type": question_type,
+        "text": _text(item.get("text"), f"{path}.text", TEXT_LENGTH, errors),
+        "topic": _text(item.get("topic"), f"{path}.topic", TOPIC_LENGTH, errors, required=False),
+        "answers": cleaned_answers,
+    }
+
+
+def validate(data, questions_only=False):
+    """
+    Проверяет документ за один проход и возвращает его очищенную копию. Все найденные ошибки
+    собираются в AuthoringError. questions_only - документ добавляет вопросы в существующий тест.
+    """
+    errors = []
+    if not isinstance(data, dict):
+        raise AuthoringError(["Документ должен быть объектом"])
+    if data.get("format", FORMAT) != FORMAT or data.get("version", VERSION) != VERSION:
+        errors.append(f"Поддерживается формат {FORMAT} версии {VERSION}")
+
+    test = {}
+    if not questions_only:
+        source = data.get("test")
+        if not isinstance(source, dict):
+            errors.append("test: обязательный объект")
+            source = {}
+        test = {
+            "name": _text(source.get("name"), "test.name", NAME_LENGTH, errors),
+            "time_limit": _positive(source.get("time_limit"), "test.time_limit", errors),
+            "max_attempts": _positive(source.get("max_attempts"), "test.max_attempts", errors),
+            "shuffle": bool(source.get("shuffle", False)),
+        }
+
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions:
+        errors.append("questions: нужен непустой список вопросов")
+        questions = []
+    if len(questions) > MAX_QUESTIONS:
+        errors.append(f"questions: не больше {MAX_QUESTIONS} вопросов")
+        questions = []
+    questions = [_clean_question(item, f"questions[{index}]", errors) for index, item in enumerate(questions)]
+
+    rules = data.get("rules") or []
+    if not isinstance(rules, list):
+        errors.append("rules: должно быть списком")
+        rules = []
+    cleaned_rules = {}
+    topics = {question["topic"] for question in questions}
+    for index, rule in enumerate(rules):
+        if not isinstance(rule, dict):
+            errors.append(f"rules[{index}]: должно быть объектом")
+            continue
+        topic = _text(rule.get("topic"), f"rules[{index}].topic", TOPIC_LENGTH, errors)
+        count = _positive(rule.get("count"), f"rules[{index}].count", errors)
+        if topic and topic in cleaned_rules:
+            errors.append(f"rules[{index}].topic: тема {topic} уже указана")
+        elif topic and topic not in topics:
+            errors.append(f"rules[{index}].topic: в документе нет вопросов темы {topic}")
+        cleaned_rules[topic] = count
+
+    if errors:
+        raise AuthoringError(errors)
+    return {
+        "test": test,
+        "questions": questions,
+        "rules": [{"topic": topic, "count": count} for topic, count in cleaned_rules.items()],
+    }
+
+
+def _topic_ids(names):
+    names = set(names) - {None}
+    topics = dict(Topic.objects.filter(name__in=names).order_by("-pk").values_list("name", "pk"))
+    missing = [Topic(name=name) for name in sorted(names - set(topics))]
+    for topic in Topic.objects.bulk_create(missing):
+        topics[topic.name] = topic.pk
+    return topics
+
+
+def import_test(data, test=None):
+    """
+    Создает тест из документа или, если test передан, добавляет в него вопросы документа.
+    Возвращает тест и число созданных вопросов.
+    """
+    data = validate(data, questions_only=test is not None)
+    with transaction.atomic():
+        if test is None:
+            test = Test.objects.create(**data["test"])
+        topics = _topic_ids([question["topic"] for question in data["questions"]] +
+                            [rule["topic"] for rule in data["rules"]])
+
+        questions = Question.objects.bulk_create([
+            Question(test=test, type=question["type"], text=question["text"], topic_id=topics.get(question["topic"]))
+            for question in data["questions"]
+        ])
+        Answer.objects.bulk_create([
+            Answer(question_id=new_question.pk, text=answer["text"], correct=answer["correct"])
+            for new_question, question in zip(questions, data["questions"]) for answer in question["answers"]
+        ])
+        # Правило для темы, уже заданной в тесте, остается прежним
+        TestTopicRule.objects.bulk_create([
+            TestTopicRule(test=test, topic_id=topics[rule["topic"]], count=rule["count"]) for rule in data["rules"]
+        ], ignore_conflicts=True)
+
+        # bulk_create не вызывает сигналы: ключ теста и поисковый индекс обновляются здесь
+        bump_version("test", test.pk)
+        index_objects(SearchEntry.Kind.QUESTION, [question.pk for question in questions], replace=False)
+    return test, len(questions)
+
+
+def export_test(test):
+    """
+    Документ JSON с тестом, его вопросами, вариантами и правилами банка вопросов.
+    """
+    answers = {}
+    for question_id, text, correct in Answer.objects.filter(question__test=test).order_by("pk").values_list(
+            "question_id", "text", "correct"):
+        answers.setdefault(question_id, []).append({"text": text, "correct": correct})
+    return {
+        "format": FORMAT,
+        "version": VERSION,
+        "test": {
+            "name": test.name, "time_limit": test.time_limit, "max_attempts": test.max_attempts,
+            "shuffle": test.shuffle,
+        },
+        "rules": [
+            {"topic": topic, "count": count}
+            for topic, count in test.topic_rules.order_by("pk").values_list("topic__name", "count")
+        ],
+        "questions": [
+            {"type": question_type, "text": text, "topic": topic, "answers": answers.get(pk, [])}
+            for pk, question_type, text, topic in Question.objects.filter(test=test).order_by("pk").values_list(
+                "pk", "type", "text", "topic__name")
+        ],
+    }
+
+
+# GIFT: "::название:: текст {=правильный ~неправильный}", "{}" - ответ в свободной форме,
+# "{=ответ}" - короткий ответ, "$CATEGORY: тема" задает тему следующих вопросов
+
+GIFT_ANSWER = re.compile(r"(?<!\\)([=~])")
+
+
+def _gift_escape(text):
+    return re.sub(r"([~=#{}:\\])", r"\\\1", text).replace("\n", "\\n")
+
+
+def _gift_unescape(text):
+    return re.sub(r"\\(.)", lambda match: "\n" if match.group(1) == "n" else match.group(1), text).strip()
+
+
+def _gift_find(text, char, start=0):
+    # Позиция неэкранированного символа
+    index = start
+    while True:
+        index = text.find(char, index)
+        if index <= 0 or text[index - 1] != "\\":
+            return index
+        index += 1
+
+
+def _gift_answers(block):
+    """
+    Варианты блока ответов и признак короткого ответа (все варианты начинаются с "=").
+    Вариант с положительным весом "~%50%" считается правильным.
+    """
+    answers = []
+    parts = GIFT_ANSWER.split(block)
+    for marker, text in zip(parts[1::2], parts[2::2]):
+        weight = re.match(r"\s*%(-?\d+(?:\.\d+)?)%", text)
+        if weight:
+            text = text[weight.end():]
+        feedback = _gift_find(text, "#")
+        if feedback != -1:
+            text = text[:feedback]
+        correct = marker == "=" or bool(weight and float(weight.group(1)) > 0)
+        answers.append({"text": _gift_unescape(text), "correct": correct})
+    return answers, "~" not in parts[1::2]
+
+
+def parse_gift(text, name=None):
+    """
+    Документ JSON из вопросов GIFT. Поддерживаются вопросы с вариантами, короткий ответ
+    и ответ в свободной форме, остальные типы GIFT считаются ошибкой.
+    """
+    errors, questions = [], []
+    topic = None
+    blocks = re.split(r"\n\s*\n", "\n".join(
+        line for line in text.replace("\r\n", "\n").split("\n") if not line.lstrip().startswith("//")
+    ))
+    for number, block in enumerate(blocks, start=1):
+        block = block.strip()
+        if not block:
+            continue
+        if block.startswith("$CATEGORY:"):
+            topic = block[len("$CATEGORY:"):].strip().split("/")[-1] or None
+            continue
+        if block.startswith("::"):
+            end = _gift_find(block, "::", 2)
+            block = block[end + 2:].lstrip() if end != -1 else block
+        if block.startswith("[") and "]" in block:
+            block = block[block.index("]") + 1:]  # [html], [markdown] - текст хранится как есть
+        start, end = _gift_find(block, "{"), _gift_find(block, "}")
+        if start == -1 or end < start:
+            errors.append(f"Вопрос {number}: нет блока ответов {{...}}")
+            continue
+        question_text = _gift_unescape(block[:start] + " " + block[end + 1:])
+        answer_block = block[start + 1:end].strip()
+        if answer_block.startswith("#") or answer_block in ("T", "TRUE", "F", "FALSE") or "->" in answer_block:
+            errors.append(f"Вопрос {number}: числовые вопросы, верно/неверно и сопоставление не поддерживаются")
+            continue
+        answers, short = _gift_answers(answer_block)
+        if short:
+            questions.append({"type": Question.Type.TEXT, "text": question_text, "topic": topic,
+                              "answers": answers[:1]})
+        else:
+            questions.append({"type": Question.Type.CHOOSE, "text": question_text, "topic": topic,
+                              "answers": answers})
+    if errors:
+        raise AuthoringError(errors)
+    return {"format": FORMAT, "version": VERSION, "test": {"name": name}, "questions": questions}
+
+
+def to_gift(data):
+    """
+    Вопросы документа в GIFT. Правила банка вопросов и настройки теста в GIFT не переносятся.
+    """
+    lines = []
+    topic = None
+    for question in data["questions"]:
+        if question.get("topic") != topic:
+            # Пустая категория - следующие вопросы без темы
+            topic = question.get("topic")
+            lines += [f"$CATEGORY: {topic or ''}".rstrip(), ""]
+        answers = question["answers"]
+        if question["type"] == Question.Type.TEXT:
+            text_answers = [answer for answer in answers if answer["text"] != TEXT_PLACEHOLDER]
+            block = " ".join(f"={_gift_escape(answer['text'])}" for answer in text_answers[:1])
+        elif sum(answer["correct"] for answer in answers) == 1 and not all(answer["correct"] for answer in answers):
+            block = " ".join(("=" if answer["correct"] else "~") + _gift_escape(answer["text"]) for answer in answers)
+        else:
+            # Несколько правильных вариантов записываются весами, иначе GIFT прочитает их как короткий ответ
+            weight = f"%{100 / max(sum(answer['correct'] for answer in answers), 1):g}%"
+            block = " ".join("~" + (weight if answer["correct"] else "") + _gift_escape(answer["text"])
+                             for answer in answers)
+        lines += [f"{_gift_escape(question['text'])} {{{block}}}", ""]
+    return "\n".join(lines)
+
+
+EXPORTERS = {
+    "json": ("application/json", "json", lambda data: json.dumps(data, ensure_ascii=False, indent=2)),
+    "gift": ("text/plain; charset=utf-8", "gift", to_gift),
+}
+
+
+def read_document(file, name=None):
+    """
+    Документ из загруженного файла: .gift и .txt читаются как GIFT, остальные как JSON.
+    name - название теста, если в файле его нет.
+    """
+    try:
+        text = file.read().decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise AuthoringError(["Файл должен быть в кодировке UTF-8"])
+    if file.name.lower().endswith((".gift", ".txt")):
+        return parse_gift(text, name=name or file.name.rsplit(".", 1)[0])
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise AuthoringError([f"Неверный JSON: {e}"])
+    if name and isinstance(data, dict) and isinstance(data.get("test"), dict):
+        data["test"]["name"] = name
+    return data
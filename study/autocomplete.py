@@ -0,0 +1,88 @@
+from django.contrib.auth.models import User
+from django.db.models import Q, Value
+from django.db.models.functions import Concat, Upper
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
+
+from .models import Group, Subject, TeacherGroupSubject, Test
+
+LIMIT = 20
+MAX_LIMIT = 50
+PREFIX_END = "\U0010ffff"  # больше любого символа: верхняя граница диапазона строк с общим началом
+
+
+def prefix_condition(field, term):
+    """
+    Начало строки без учета регистра диапазоном UPPER(field) >= UPPER(term) AND < UPPER(term) || PREFIX_END.
+    istartswith (LIKE) не использует индексы, а диапазон использует функциональный индекс по Upper(field).
+    Обе части приводятся к верхнему регистру функцией базы, поэтому регистр учитывается так же, как в LIKE.
+    """
+    start = Upper(Value(term))
+    return Q(GreaterThanOrEqual(Upper(field), start), LessThan(Upper(field), Concat(start, Value(PREFIX_END))))
+
+
+class Lookup:
+    """
+    Поиск объектов для выпадающих списков по началу строки (prefix_condition, индексы по Upper полей поиска)
+    с ограничением числа результатов. search_filter сужает поиск, например, до объектов преподавателя,
+    но подписи уже выбранных значений берутся из всего queryset.
+    """
+
+    def __init__(self, name, queryset, search_fields, label, search_filter=None):
+        self.name = name
+        self.queryset = queryset
+        self.search_fields = search_fields
+        self.label = label
+        self.search_filter = search_filter
+
+    def search(self, user, term="", limit=LIMIT):
+        queryset = self.queryset()
+        if self.search_filter:
+            queryset = self.search_filter(queryset, user)
+        term = term.strip()
+        if term:
+            condition = Q()
+            for field in self.search_fields:
+                condition |= prefix_condition(field, term)
+            queryset = queryset.filter(condition)
+        return [{"id": obj.pk, "text": self.label(obj)} for obj in queryset[:limit]]
+
+    def choices_for(self, values):
+        pks = [value for value in values if str(value).isdigit()]
+        if not pks:
+            return []
+        return [(obj.pk, self.label(obj)) for obj in self.queryset().filter(pk__in=pks)]
+
+
+def _own_subjects(queryset, user):
+    if user.profile.type == 2:
+        return queryset.filter(teacher=user)
+    return queryset
+
+
+LOOKUPS = {
+    lookup.name: lookup for lookup in (
+        Lookup("groups", lambda: Group.objects.order_by("number"), ("number", ), lambda group: group.number),
+        Lookup("subjects", lambda: Subject.objects.order_by("name"), ("name", ), lambda subject: subject.name),
+        Lookup(
+            "teachers",
+            lambda: User.objects.filter(profile__type=2).order_by("username"),
+            ("username", ),
+            str,
+        ),
+        Lookup(
+            "teacher-subjects",
+            lambda: TeacherGroupSubject.objects.select_related("subject", "group", "teacher").order_by(
+                "subject__name", "group__number", "pk"),
+            ("subject__name", "group__number"),
+            str,
+            search_filter=_own_subjects,
+        ),
+        Lookup(
+            "free-tests",
+            lambda: Test.objects.order_by("name"),
+            ("name", ),
+            str,
+            search_filter=lambda queryset, user: queryset.filter(lesson__isnull=True),
+        ),
+    )
+}
@@ -0,0 +1,38 @@
+import random
+
+from .cache import CacheNamespace, get_version
+from .models import Question
+
+pool_cache = CacheNamespace("bank", timeout=60 * 60 * 24)
+
+
+def build_pools(test):
+    """
+    Номера вопросов теста по темам: {pk темы: [pk вопросов]}, вопросы без темы - под ключом None.
+    """
+    pools = {}
+    for topic_id, question_id in Question.objects.filter(test=test).order_by("pk").values_list("topic_id", "pk"):
+        pools.setdefault(topic_id, []).append(question_id)
+    return pools
+
+
+def get_pools(test):
+    version = get_version("test", test.pk)
+    return pool_cache.get_or_set(test.pk, version, default=lambda: build_pools(test))
+
+
+def draw_questions(test, rng=random):
+    """
+    Выбирает вопросы для новой попытки по правилам теста. Вопросы без темы и вопросы тем без правила
+    выпадают всегда. Тест без правил не является банком вопросов - возвращается None, оцениваются
+    все вопросы; так же, если по правилам не выпало ни одного вопроса (в темах правил не осталось вопросов).
+    Выборка идет по готовым спискам номеров, поэтому не зависит от размера банка.
+    """
+    rules = dict(test.topic_rules.values_list("topic_id", "count"))
+    if not rules:
+        return None
+    question_ids = []
+    for topic_id, pool in get_pools(test).items():
+        count = rules.get(topic_id) if topic_id is not None else None
+        question_ids += pool if count is None else rng.sample(pool, min(count, len(pool)))
+    return question_ids or None
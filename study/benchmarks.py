@@ -0,0 +1,308 @@
+"""
+Микробенчмарки оценивания и ведомостей. Каждый случай запускается на синтетических данных
+нескольких размеров, для него замеряется время и число SQL запросов, результаты
+сравниваются с сохраненным базовым файлом.
+"""
+import io
+import json
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import Profile
+from .api.renderers import FastJSONRenderer
+from .api.serializers import TrySerializer, TryValuesSerializer
+from .excel import write_table
+from .models import Group, Question, TeacherGroupSubject, Test, Try
+from .search import rebuild_index, search
+from .synthetic import generate_institution, student_username, teacher_username
+
+SIZES = (1, 3, 9)
+SERIALIZER_ROWS = 10000
+REPEAT = 5
+TOLERANCE = 0.25  # допустимое замедление относительно базового файла
+PREFIX = "bench"
+BASELINE_PATH = "benchmarks/baseline.json"
+
+
+@dataclass
+class Dataset:
+    size: int
+    student: User
+    teacher: User
+    admin: User
+    test: Test
+    student_try: Try
+    item: TeacherGroupSubject
+
+
+def seed(size):
+    """
+    Размер 1 - две группы по 25 студентов, по 4 занятия в дисциплине, тесты по 5 вопросов;
+    остальное растет пропорционально размеру. Вызывается только на тестовой базе: она очищается целиком.
+    """
+    call_command("flush", interactive=False, verbosity=0)
+    generate_institution(
+        groups=2 * size, teachers=2 * size, students=50 * size, subjects=6, subjects_per_group=6,
+        lessons_per_subject=2 * size + 2, questions_per_test=5 * size, tries_ratio=0.8, with_media=False,
+        prefix=PREFIX, seed=size,
+    )
+    # bulk_create не вызывает сигналы, поисковый индекс строится отдельно
+    rebuild_index()
+    admin, _ = User.objects.get_or_create(username=f"{PREFIX}-admin")
+    Profile.objects.update_or_create(user=admin, defaults={"type": Profile.Type.ADMIN})
+
+    student = User.objects.get(username=student_username(PREFIX, 0))
+    test = (
+        Test.objects.filter(lesson__subject__group__students=student, questions__type=Question.Type.TEXT)
+        .distinct().order_by("pk").first()
+    )
+    return Dataset(
+        size=size,
+        student=student,
+        teacher=User.objects.get(username=teacher_username(PREFIX, 0)),
+        admin=admin,
+        test=test,
+        student_try=Try.objects.filter(test=test).order_by("pk").first(),
+        item=TeacherGroupSubject.objects.filter(group__students=student).order_by("pk").first(),
+    )
+
+
+def _excel(columns, rows):
+    buffer = io.BytesIO()
+    # Первая строка файла пропускается загрузчиком как заголовок
+    write_table(buffer, [columns, *rows], index=False, header=False)
+    return SimpleUploadedFile("upload.xlsx", buffer.getvalue())
+
+
+def _client(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def _checked(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request['PATH_INFO']}: статус {response.status_code}")
+    return response.content
+
+
+def case_calculate_score(data):
+    answers = {str(pk): "on" for pk in data.test.questions.values_list("answers__pk", flat=True)}
+    return lambda: data.test.calculate_score(answers, data.student)
+
+
+def case_try_checking(data):
+    marks = {str(pk): 5 for pk in data.student_try.students_answers.values_list("pk", flat=True)}
+    return lambda: Try.objects.get(pk=data.student_try.pk).checking(marks)
+
+
+def case_get_grade(data):
+    return lambda: data.student.profile.get_grade()
+
+
+def case_average_score(data):
+    return lambda: data.item.get_user_average_score(data.student)
+
+
+def case_download_test_tries(data):
+    client = _client(data.teacher)
+    url = reverse("test-download-tries", kwargs={"test_id": data.test.pk})
+    return lambda: _checked(client.get(url))
+
+
+def case_upload_subjects(data):
+    client = _client(data.admin)
+    groups = list(Group.objects.filter(number__startswith=PREFIX).values_list("number", flat=True))
+    rows = [[f"{PREFIX} загрузка {n}", data.teacher.username, groups[n % len(groups)]] for n in range(10 * data.size)]
+    columns = ["name", "teacher", "group"]
+    return lambda: _checked(client.post(reverse("subjects-upload"), {"excel": _excel(columns, rows)}))
+
+
+def case_upload_lessons(data):
+    client = _client(data.admin)
+    item = data.item
+    rows = [
+        [f"{PREFIX} загрузка {n}", "LC", item.subject.name, item.teacher.username, item.group.number, "Текст"]
+        for n in range(10 * data.size)
+    ]
+    columns = ["name", "type", "subject", "teacher", "group", "text"]
+    return lambda: _checked(client.post(reverse("lessons-upload"), {"excel": _excel(columns, rows)}))
+
+
+def case_search(data):
+    return lambda: (search(data.student, "занятия"), search(data.admin, "текст занятия"))
+
+
+CASES = {
+    "calculate_score": case_calculate_score,
+    "try_checking": case_try_checking,
+    "profile_get_grade": case_get_grade,
+    "get_user_average_score": case_average_score,
+    "download_test_tries": case_download_test_tries,
+    "upload_subjects": case_upload_subjects,
+    "upload_lessons": case_upload_lessons,
+    "search": case_search,
+}
+
+
+def measure(func, repeat=REPEAT):
+    timings = []
+    queries = []
+
+    # Запросы считаются через execute_wrapper: лог connection.queries очищается в начале каждого запроса к view
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    for _ in range(repeat):
+        cache.clear()
+        queries.clear()
+        # Каждый запуск откатывается, чтобы изменения не влияли на следующие замеры
+        with transaction.atomic(), connection.execute_wrapper(count_query):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+            transaction.set_rollback(True)
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "queries": len(queries),
+    }
+
+
+def run(sizes=SIZES, cases=None, repeat=REPEAT):
+    results = {}
+    for size in sizes:
+        data = seed(size)
+        for name in cases or CASES:
+            results[f"{name}@{size}"] = measure(CASES[name](data), repeat)
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Случаи, ставшие медленнее базового файла больше чем на tolerance или делающие больше запросов.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if result["queries"] > base["queries"]:
+            regressions.append(f"{key}: запросов {base['queries']} -> {result['queries']}")
+        if result["median_ms"] > base["median_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: {base['median_ms']} мс -> {result['median_ms']} мс")
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    with open(path, "w") as file:
+        json.dump(results, file, ensure_ascii=False, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def serializer_throughput(rows=SERIALIZER_ROWS, repeat=REPEAT):
+    """
+    Строк в секунду при выдаче списка попыток из rows строк: ModelSerializer и JSONRenderer DRF
+    против values() с ValuesSerializer и orjson. В замер входят запрос к базе и рендеринг JSON.
+    """
+    call_command("flush", interactive=False, verbosity=0)
+    user = User.objects.create(username=f"{PREFIX}-serializers")
+    test = Test.objects.create(name=f"{PREFIX} сериализация")
+    Try.objects.bulk_create(
+        [Try(user=user, test=test, score=n % 100, question_ids=[1, 2, 3], selections=[1, 5, 9], choice_score=n % 50)
+         for n in range(rows)],
+        batch_size=2000,
+    )
+    queryset = Try.objects.filter(test=test)
+    variants = {
+        "model_serializer": lambda: JSONRenderer().render(TrySerializer(queryset.all(), many=True).data),
+        "values": lambda: JSONRenderer().render(TryValuesSerializer(TryValuesSerializer.project(queryset.all())).data),
+        "values_orjson": lambda: FastJSONRenderer().render(
+            TryValuesSerializer(TryValuesSerializer.project(queryset.all())).data),
+    }
+    results = {}
+    for name, func in variants.items():
+        result = measure(func, repeat)
+        result["rows_per_s"] = round(rows / result["median_ms"] * 1000)
+        results[f"{name}@{rows}"] = result
+    return results
+
+
+HEAVY_MODULES = ("pandas", "openpyxl", "numpy")
+STARTUP_URL = "/about/"
+STARTUP_SCRIPT = """
+import json, os, resource, sys, time
+started = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+ready = time.perf_counter()
+from django.test import Client
+status = Client(HTTP_HOST="localhost").get(sys.argv[1]).status_code
+finished = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "setup_ms": (ready - started) * 1000,
+    "first_response_ms": (finished - started) * 1000,
+    "maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+def _run_startup(url, importtime=False):
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", STARTUP_SCRIPT, url,
+               *HEAVY_MODULES]
+    process = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True)
+    return json.loads(process.stdout.strip().splitlines()[-1]), process.stderr
+
+
+def _top_imports(importtime_log, count):
+    # Строки -X importtime: "import time: self [us] | cumulative | пакет", пакеты верхнего уровня без отступа
+    packages = []
+    for line in importtime_log.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or parts[2].startswith("  "):
+            continue
+        if parts[1].strip().isdigit():
+            packages.append((parts[2].strip(), int(parts[1].strip()) / 1000))
+    return [[name, round(ms, 1)] for name, ms in sorted(packages, key=lambda item: -item[1])[:count]]
+
+
+def startup_profile(url=STARTUP_URL, repeat=REPEAT, top=10):
+    """
+    Холодный старт веб-процесса в отдельном интерпретаторе: загрузка WSGI приложения, время до
+    первого ответа на url, пиковая память и какие тяжелые библиотеки оказались загружены.
+    """
+    runs = [_run_startup(url)[0] for _ in range(repeat)]
+    result, importtime_log = _run_startup(url, importtime=True)
+    return {
+        "status": result["status"],
+        "setup_ms": round(statistics.median(run["setup_ms"] for run in runs), 1),
+        "first_response_ms": round(statistics.median(run["first_response_ms"] for run in runs), 1),
+        "maxrss_mb": round(statistics.median(run["maxrss_mb"] for run in runs), 1),
+        "loaded": result["loaded"],
+        "top_imports": _top_imports(importtime_log, top),
+    }
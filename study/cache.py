@@ -0,0 +1,189 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+DEFAULT_TIMEOUT = 60 * 15
+
+KEY_PREFIX = "study"
+STATS_FLUSH_INTERVAL = 10  # секунд между сбросом локальных счетчиков в общий кэш
+STATS_FIELDS = ("hits", "misses", "stale", "sets", "evictions")
+
+
+def get_cache():
+    return caches[getattr(settings, "STUDY_CACHE_ALIAS", "default")]
+
+
+class CacheStats:
+    """
+    Счетчики попаданий/промахов копятся в памяти процесса и периодически
+    добавляются к общим счетчикам в кэше, чтобы не писать в кэш на каждое чтение.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = dict.fromkeys(STATS_FIELDS, 0)
+        self._flushed_at = time.monotonic()
+
+    def record(self, field, count=1):
+        with self._lock:
+            self._local[field] += count
+
+    def maybe_flush(self):
+        if time.monotonic() - self._flushed_at >= STATS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            local, self._local = self._local, dict.fromkeys(STATS_FIELDS, 0)
+            self._flushed_at = time.monotonic()
+        cache = get_cache()
+        for field, count in local.items():
+            if not count:
+                continue
+            key = f"{KEY_PREFIX}:stats:{field}"
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                if not cache.add(key, count, None):
+                    cache.incr(key, count)
+
+    def snapshot(self):
+        self.flush()
+        values = get_cache().get_many([f"{KEY_PREFIX}:stats:{field}" for field in STATS_FIELDS])
+        result = {field: values.get(f"{KEY_PREFIX}:stats:{field}", 0) for field in STATS_FIELDS}
+        lookups = result["hits"] + result["misses"] + result["stale"]
+        result["hit_ratio"] = round(result["hits"] / lookups, 4) if lookups else None
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._local = dict.fromkeys(STATS_FIELDS, 0)
+        get_cache().delete_many([f"{KEY_PREFIX}:stats:{field}" for field in STATS_FIELDS])
+
+
+stats = CacheStats()
+
+
+def _tag_key(tag):
+    return f"{KEY_PREFIX}:tag:{tag}"
+
+
+def tag_versions(tags):
+    """
+    Текущие версии тегов. Версия тега - время его последней инвалидации,
+    если тега еще нет в кэше, он создается с текущим временем.
+    """
+    cache = get_cache()
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def invalidate_tags(*tags):
+    now = time.time()
+    get_cache().set_many({_tag_key(tag): now for tag in tags if tag is not None}, None)
+
+
+class CacheNamespace:
+    """
+    Именованная область кэша. Ключи имеют вид study:<namespace>:v<version>:<части ключа>,
+    каждое значение хранится вместе с версиями своих тегов и считается устаревшим,
+    как только любой из тегов инвалидирован. Смена version у namespace
+    отбрасывает все старые значения (например, при изменении формата данных).
+    """
+
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT, version=1):
+        self.name = name
+        self.timeout = timeout
+        self.version = version
+
+    @property
+    def tag(self):
+        return f"namespace:{self.name}"
+
+    def key(self, *parts):
+        return ":".join([KEY_PREFIX, self.name, f"v{self.version}", *map(str, parts)])
+
+    def get(self, *parts, default=None):
+        entry = get_cache().get(self.key(*parts))
+        stats.maybe_flush()
+        if entry is None:
+            stats.record("misses")
+            return default
+        saved_versions, value = entry
+        if tag_versions(saved_versions) != saved_versions:
+            stats.record("stale")
+            return default
+        stats.record("hits")
+        return value
+
+    def set(self, *parts, value, tags=(), timeout=None, versions=None):
+        # versions - версии тегов, прочитанные до вычисления value: если тег инвалидировали
+        # во время вычисления, значение сразу окажется устаревшим
+        if versions is None:
+            versions = tag_versions([self.tag, *tags])
+        get_cache().set(self.key(*parts), (versions, value), self.timeout if timeout is None else timeout)
+        stats.record("sets")
+
+    def get_or_set(self, *parts, default, tags=(), timeout=None):
+        marker = object()
+        value = self.get(*parts, default=marker)
+        if value is marker:
+            versions = tag_versions([self.tag, *tags])
+            value = default() if callable(default) else default
+            self.set(*parts, value=value, tags=tags, timeout=timeout, versions=versions)
+        return value
+
+    def delete(self, *parts):
+        get_cache().delete(self.key(*parts))
+
+    def clear(self):
+        invalidate_tags(self.tag)
+
+
+def get_version(kind, pk):
+    """
+    Версия объекта - время его последнего изменения (timestamp).
+    Используется и как часть ключа кэша фрагментов, и как Last-Modified.
+    """
+    tag = f"{kind}:{pk}"
+    return tag_versions([tag])[tag]
+
+
+def bump_version(kind, pk):
+    if pk is not None:
+        invalidate_tags(f"{kind}:{pk}")
+
+
+def version_to_datetime(version):
+    return datetime.fromtimestamp(version, tz=timezone.utc)
+
+
+def conditional_response(request, etag, last_modified=None):
+    # Пока в сессии есть непоказанные сообщения, страницу нужно отрисовать заново
+    if len(messages.get_messages(request)):
+        return None
+    if last_modified is not None:
+        last_modified = int(last_modified.timestamp())
+    return get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+
+
+def set_conditional_headers(response, etag, last_modified=None):
+    response.headers["ETag"] = quote_etag(etag)
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
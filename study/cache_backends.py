@@ -0,0 +1,37 @@
+"""
+Встроенные бэкенды кэша Django, которые дополнительно считают вытесненные записи.
+"""
+from django.core.cache.backends import db, filebased, locmem
+from django.db import connections
+
+from .cache import stats
+
+
+class LocMemCache(locmem.LocMemCache):
+
+    def _cull(self):
+        before = len(self._cache)
+        super()._cull()
+        stats.record("evictions", before - len(self._cache))
+
+
+class FileBasedCache(filebased.FileBasedCache):
+
+    def _cull(self):
+        before = len(self._list_cache_files())
+        if before < self._max_entries:
+            return
+        super()._cull()
+        stats.record("evictions", max(before - len(self._list_cache_files()), 0))
+
+
+class DatabaseCache(db.DatabaseCache):
+
+    def _cull(self, db, cursor, now, num):
+        # Учитываются и просроченные записи, которые Django удаляет в том же проходе
+        table = connections[db].ops.quote_name(self._table)
+        cursor.execute("SELECT COUNT(*) FROM %s" % table)
+        before = cursor.fetchone()[0]
+        super()._cull(db, cursor, now, num)
+        cursor.execute("SELECT COUNT(*) FROM %s" % table)
+        stats.record("evictions", max(before - cursor.fetchone()[0], 0))
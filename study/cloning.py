@@ -0,0 +1,209 @@
+"""
+Копирование теста вместе с вопросами, вариантами ответов и правилами банка вопросов и копирование
+занятий дисциплины группы в другие группы. Копии создаются bulk_create: новые первичные ключи
+сопоставляются старым по порядку вставки, поэтому число запросов не зависит от числа вопросов и занятий.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+
+from accounts.models import Profile
+from .cache import bump_version, invalidate_tags
+from .deadlines import group_tag
+from .models import Answer, Lesson, LessonFile, LessonPhoto, LessonVideo, Question, SearchEntry, \
+    TeacherGroupSubject, Test, TestTopicRule
+from .search import index_objects
+
+MAX_COPIES = 50
+
+
+class CloneError(Exception):
+    pass
+
+
+def _rows(queryset):
+    # Все поля, чтобы новые поля моделей копировались без правки этого модуля
+    return list(queryset.values("pk", *(field.attname for field in queryset.model._meta.concrete_fields
+                                        if not field.primary_key)))
+
+
+def _copy(model, row, **overrides):
+    values = {name: value for name, value in row.items() if name != "pk"}
+    return model(**{**values, **overrides})
+
+
+def _clone_name(test, lesson, number, copies):
+    if lesson is not None and lesson.subject_id:
+        suffix = f"группа {lesson.subject.group.number}"
+    else:
+        suffix = "копия" if copies == 1 else f"копия {number}"
+    return f"{test.name} ({suffix})"[:Test._meta.get_field("name").max_length]
+
+
+def available_lessons(user):
+    """
+    Занятия, к которым можно привязать копию теста: без теста, у преподавателя - только свои.
+    Общий список для формы и API.
+    """
+    lessons = Lesson.objects.filter(test__isnull=True).select_related("subject__group")
+    if user.profile.type == Profile.Type.TEACHER:
+        lessons = lessons.filter(subject__teacher=user)
+    return lessons
+
+
+def get_target_lessons(user, lesson_ids):
+    """
+    Занятия, к которым привязываются копии, по правилам available_lessons. Занятия с тестом
+    отклоняются с отдельной ошибкой.
+    """
+    lesson_ids = {int(pk) for pk in lesson_ids}
+    lessons = Lesson.objects.filter(pk__in=lesson_ids).select_related("subject__group").order_by("pk")
+    if user.profile.type == Profile.Type.TEACHER:
+        lessons = lessons.filter(subject__teacher=user)
+    lessons = list(lessons)
+
+    missing = lesson_ids - {lesson.pk for lesson in lessons}
+    if missing:
+        raise CloneError(f"Занятия не найдены: {', '.join(map(str, sorted(missing)))}")
+    busy = [lesson.name for lesson in lessons if lesson.test_id]
+    if busy:
+        raise CloneError(f"У занятий уже есть тест: {', '.join(busy)}")
+    return lessons
+
+
+def clone_test(test, copies=1, lessons=()):
+    """
+    Создает копии теста: по одной на каждое занятие из lessons (копия сразу привязывается к нему)
+    или copies непривязанных копий. Возвращает созданные тесты.
+    """
+    lessons = list(lessons)
+    copies = len(lessons) or copies
+    if not 1 <= copies <= MAX_COPIES:
+        raise CloneError(f"Количество копий должно быть от 1 до {MAX_COPIES}")
+
+    with transaction.atomic():
+        test_row = _rows(Test.objects.filter(pk=test.pk))[0]
+        questions = _rows(Question.objects.filter(test=test).order_by("pk"))
+        answers = _rows(Answer.objects.filter(question__test=test).order_by("pk"))
+        rules = _rows(TestTopicRule.objects.filter(test=test))
+
+        clones = Test.objects.bulk_create([
+            _copy(Test, test_row, name=_clone_name(test, lessons[n] if lessons else None, n + 1, copies))
+            for n in range(copies)
+        ])
+        new_questions = Question.objects.bulk_create([
+            _copy(Question, row, test_id=clone.pk) for clone in clones for row in questions
+        ])
+        # Вопросы вставлены в том же порядке: копия n занимает отрезок [n * len(questions), (n + 1) * len(questions))
+        question_map = {
+            (clone.pk, row["pk"]): new_questions[n * len(questions) + index].pk
+            for n, clone in enumerate(clones) for index, row in enumerate(questions)
+        }
+        Answer.objects.bulk_create([
+            _copy(Answer, row, question_id=question_map[clone.pk, row["question_id"]])
+            for clone in clones for row in answers
+        ])
+        TestTopicRule.objects.bulk_create([_copy(TestTopicRule, row, test_id=clone.pk) for clone in clones for row in rules])
+
+        # bulk_create не вызывает сигналы: записи поиска создаются здесь, тест занятия индексирует сигнал занятия
+        index_objects(SearchEntry.Kind.QUESTION, [question.pk for question in new_questions], replace=False)
+        for lesson, clone in zip(lessons, clones):
+            lesson.test = clone
+            lesson.save(update_fields=["test"])
+        if not lessons:
+            index_objects(SearchEntry.Kind.TEST, [clone.pk for clone in clones], replace=False)
+    return clones
+
+
+def available_courses(user, source=None):
+    """
+    Дисциплины групп, в которые можно копировать занятия: у преподавателя - только свои.
+    """
+    courses = TeacherGroupSubject.objects.select_related("group", "subject")
+    if user.profile.type == Profile.Type.TEACHER:
+        courses = courses.filter(teacher=user)
+    if source is not None:
+        courses = courses.exclude(pk=source.pk)
+    return courses
+
+
+def get_target_courses(user, source, course_ids):
+    """
+    Дисциплины групп, в которые копируются занятия. Преподаватель может выбрать только свои.
+    """
+    course_ids = {int(pk) for pk in course_ids}
+    if not course_ids:
+        raise CloneError("Выберите дисциплины групп")
+    if source.pk in course_ids:
+        raise CloneError("Нельзя копировать занятия в ту же дисциплину")
+    courses = list(available_courses(user).filter(pk__in=course_ids).order_by("pk"))
+
+    missing = course_ids - {course.pk for course in courses}
+    if missing:
+        raise CloneError(f"Дисциплины групп не найдены: {', '.join(map(str, sorted(missing)))}")
+    return courses
+
+
+def clone_course(source, targets, offset=timedelta(0), progress=None, checkpoint=None):
+    """
+    Копирует занятия source в каждую дисциплину targets: фото, видео и файлы ссылаются на те же
+    файлы в хранилище, прикрепленные тесты копируются, сроки сдвигаются на offset.
+    Каждая группа и каждый тест копируются в своей транзакции, progress(done, total, checkpoint)
+    вызывается в ней же: checkpoint прерванного запуска говорит, что уже скопировано, и повторный
+    запуск не создает занятия и тесты второй раз.
+    """
+    lessons = _rows(Lesson.objects.filter(subject=source).order_by("pk"))
+    media = [(model, _rows(model.objects.filter(lesson__subject=source).order_by("pk")))
+             for model in (LessonPhoto, LessonVideo, LessonFile)]
+    tests = {row["test_id"]: index for index, row in enumerate(lessons) if row["test_id"]}
+    total = len(targets) + len(tests)
+    state = {"copies": {}, "tests": [], **(checkpoint or {})}
+    done = len(state["copies"]) + len(state["tests"])
+    if progress:
+        progress(done, total)
+
+    for target in targets:
+        if str(target.pk) in state["copies"]:
+            continue
+        with transaction.atomic():
+            new_lessons = Lesson.objects.bulk_create([
+                _copy(Lesson, row, subject_id=target.pk, test_id=None,
+                      deadline=row["deadline"] + offset if row["deadline"] else None)
+                for row in lessons
+            ])
+            lesson_map = {}
+            for row, lesson in zip(lessons, new_lessons):
+                lesson_map[row["pk"]] = lesson.pk
+            for model, rows in media:
+                # Путь файла копируется как есть: новая запись ссылается на уже загруженный файл
+                model.objects.bulk_create([_copy(model, row, lesson_id=lesson_map[row["lesson_id"]]) for row in rows])
+            index_objects(SearchEntry.Kind.LESSON, lesson_map.values(), replace=False)
+            state["copies"][str(target.pk)] = [lesson.pk for lesson in new_lessons]
+            done += 1
+            if progress:
+                progress(done, total, state)
+        bump_version("subject", target.pk)
+        invalidate_tags(group_tag(target.group_id))
+
+    # Копии занятий читаются заново: после перезапуска в памяти есть только их номера из checkpoint
+    copied = {
+        lesson.pk: lesson
+        for lesson in Lesson.objects.filter(
+            pk__in=[pk for target in targets for pk in state["copies"][str(target.pk)]]).select_related("subject__group")
+    }
+    for test in Test.objects.filter(pk__in=tests).exclude(pk__in=state["tests"]).order_by("pk"):
+        with transaction.atomic():
+            # название копии теста берет номер группы из занятия
+            clone_test(test, lessons=[copied[state["copies"][str(target.pk)][tests[test.pk]]] for target in targets])
+            state["tests"].append(test.pk)
+            done += 1
+            if progress:
+                progress(done, total, state)
+    return {"lessons": len(lessons) * len(targets), "tests": len(tests) * len(targets)}
+
+
+def run_course_clone(params, progress):
+    source = TeacherGroupSubject.objects.get(pk=params["source"])
+    targets = list(TeacherGroupSubject.objects.filter(pk__in=params["targets"]).select_related("group").order_by("pk"))
+    return clone_course(source, targets, offset=timedelta(days=params.get("offset_days", 0)), progress=progress,
+                        checkpoint=params.get("checkpoint"))
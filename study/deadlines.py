@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from django.db.models import Exists, F, Max, OuterRef, Subquery
+from django.utils import timezone
+
+from .cache import CacheNamespace
+from .models import GradeRollup, Lesson, Try, StudentIndividualWork
+
+OVERDUE_DAYS = 30  # насколько далеко в прошлое показывать просроченные занятия
+
+feed_cache = CacheNamespace("deadlines", timeout=60 * 10)
+
+
+def group_tag(group_pk):
+    return f"deadlines:group:{group_pk}"
+
+
+def user_tag(user_pk):
+    return f"deadlines:user:{user_pk}"
+
+
+def group_lessons(group, since):
+    """
+    Занятия группы со сроком сдачи - общие для всех студентов группы.
+    """
+    return (
+        Lesson.objects
+        .filter(subject__group=group, deadline__gte=since)
+        .annotate(subject_name=F("subject__subject__name"))
+        .order_by("deadline", "pk")
+        .values("id", "name", "type", "deadline", "test_id", "subject_id", "subject_name")
+    )
+
+
+def status_queryset(user, lesson_ids):
+    """
+    Состояние сдачи занятий студентом - одним запросом по номерам занятий.
+    """
+    tries = Try.objects.filter(test=OuterRef("test"), user=user)
+    works = StudentIndividualWork.objects.filter(lesson=OuterRef("pk"), user=user)
+    # Попытки закрытых дисциплин могут быть в архиве, от них остаются итоги (study.archival)
+    rollups = GradeRollup.objects.filter(test_id=OuterRef("test"), user=user)
+    return (
+        Lesson.objects
+        .filter(pk__in=lesson_ids)
+        .annotate(
+            has_try=Exists(tries) | Exists(rollups),
+            best_score=Subquery(tries.order_by().values("test").annotate(best=Max("score")).values("best")),
+            archived_score=Subquery(rollups.order_by().values("test_id").annotate(best=Max("best_score")).values("best")),
+            has_work=Exists(works),
+            work_score=Subquery(works.values("score")[:1]),
+        )
+        .values("id", "has_try", "best_score", "archived_score", "has_work", "work_score")
+    )
+
+
+def get_group_rows(group):
+    def load():
+        since = timezone.now() - timedelta(days=OVERDUE_DAYS)
+        rows = list(group_lessons(group, since))
+        for row in rows:
+            row["type_display"] = Lesson.Type(row["type"]).label
+        return rows
+
+    return feed_cache.get_or_set("group", group.pk, default=load, tags=[group_tag(group.pk)])
+
+
+def get_deadline_rows(user, group):
+    """
+    Лента сроков студента: занятия группы кэшируются один раз на группу, поверх них -
+    состояние сдачи студента из отдельной записи кэша.
+    """
+    rows = get_group_rows(group)
+
+    def load():
+        statuses = {}
+        for status in status_queryset(user, [row["id"] for row in rows]):
+            archived = status.pop("archived_score")
+            if archived is not None:
+                status["best_score"] = max(archived, status["best_score"] if status["best_score"] is not None else archived)
+            statuses[status.pop("id")] = status
+        return statuses
+
+    statuses = feed_cache.get_or_set(
+        "user", group.pk, user.pk, default=load, tags=[group_tag(group.pk), user_tag(user.pk)]) if rows else {}
+    feed = []
+    for row in rows:
+        status = statuses.get(row["id"]) or {"has_try": False, "best_score": None, "has_work": False, "work_score": None}
+        feed.append({**row, **status, "submitted": status["has_try"] or status["has_work"]})
+    return feed
+
+
+def split_deadlines(rows, now=None):
+    now = now or timezone.now()
+    upcoming = [row for row in rows if row["deadline"] >= now]
+    overdue = [row for row in rows if row["deadline"] < now and not row["submitted"]]
+    return upcoming, overdue
+
+
+def _ical_escape(value):
+    return str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ical_fold(line):
+    # Строки длиннее 75 октетов переносятся с пробелом в начале продолжения (RFC 5545)
+    chunks = []
+    encoded = line.encode("utf-8")
+    while len(encoded) > 75:
+        cut = 75 if not chunks else 74
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        chunks.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    chunks.append(encoded.decode("utf-8"))
+    return "\r\n ".join(chunks)
+
+
+def _ical_datetime(value):
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def to_ical(rows, host="ladutsko"):
+    stamp = _ical_datetime(timezone.now())
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//ladutsko//deadlines//RU",
+        "CALSCALE:GREGORIAN",
+    ]
+    for row in rows:
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:lesson-{row['id']}@{host}",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{_ical_datetime(row['deadline'])}",
+            f"DTEND:{_ical_datetime(row['deadline'])}",
+            f"SUMMARY:{_ical_escape(row['name'])} ({_ical_escape(row['subject_name'])})",
+            f"DESCRIPTION:{_ical_escape(row['type_display'])}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_ical_fold(line) for line in lines) + "\r\n"
@@ -0,0 +1,131 @@
+"""
+Удаление групп, занятий, тестов и пользователей. delete_later сразу помечает объект удаленным
+(deleted_at, у пользователя - is_active) и ставит задачу study.jobs, которая удаляет связанные
+записи снизу вверх порциями по CHUNK_SIZE: каждая порция - короткая транзакция, в памяти не больше
+одной порции. Файлы удаленных записей стираются из хранилища, если на них не ссылаются другие записи
+(копии занятий ссылаются на те же файлы).
+"""
+import logging
+
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.utils import timezone
+
+from .cache import invalidate_tags
+from .deadlines import group_tag, user_tag
+from .jobs import enqueue
+from .models import Group, Job, Lesson, Test
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+MODELS = {
+    "group": Group,
+    "lesson": Lesson,
+    "test": Test,
+    "user": User,
+}
+LABELS = {model: label for label, model in MODELS.items()}
+
+
+def _mark(instance):
+    if isinstance(instance, User):
+        instance.is_active = False
+        instance.save(update_fields=["is_active"])
+        invalidate_tags(user_tag(instance.pk))
+        return
+    if isinstance(instance, Test):
+        # Тест сразу отвязывается от занятия, чтобы занятие не показывало удаленный тест
+        for lesson in Lesson.objects.filter(test=instance):
+            lesson.test = None
+            lesson.save(update_fields=["test"])
+    instance.deleted_at = timezone.now()
+    instance.save(update_fields=["deleted_at"])
+    if isinstance(instance, Group):
+        invalidate_tags(group_tag(instance.pk))
+
+
+def delete_later(instance, user=None):
+    """
+    Помечает объект удаленным и ставит задачу удаления. Возвращает задачу.
+    """
+    with transaction.atomic():
+        _mark(instance)
+        return enqueue(Job.Kind.DELETE, user, model=LABELS[type(instance)], pk=instance.pk)
+
+
+def _plan(model, queryset, steps, depth=0):
+    """
+    Шаги удаления в порядке выполнения: сначала записи, которые ссылаются на queryset (рекурсивно),
+    потом сам queryset. ("null", модель, поле, записи) - обнулить ссылку, ("delete", модель, записи).
+    """
+    if depth > 10:
+        raise RuntimeError(f"Слишком глубокая цепочка связей у {model.__name__}")
+    for relation in model._meta.related_objects:
+        if relation.many_to_many:
+            continue  # строки промежуточных таблиц удаляются вместе с порцией объектов
+        child = relation.related_model
+        child_queryset = child._base_manager.filter(**{f"{relation.field.name}__in": queryset.values("pk")})
+        if relation.on_delete is models.CASCADE:
+            _plan(child, child_queryset, steps, depth + 1)
+        elif relation.on_delete is models.SET_NULL:
+            steps.append(("null", child, relation.field.name, child_queryset))
+    steps.append(("delete", model, None, queryset))
+    return steps
+
+
+def _file_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+
+
+def _remove_files(model, files):
+    # Файл стирается, только если на него не ссылается ни одна оставшаяся запись той же модели
+    for field, names in files.items():
+        names.discard("")
+        if not names:
+            continue
+        used = set(model._base_manager.filter(**{f"{field.attname}__in": names}).values_list(field.attname, flat=True))
+        for name in names - used:
+            try:
+                field.storage.delete(name)
+            except OSError:
+                logger.warning("Не удалось удалить файл %s", name)
+
+
+def _run_step(step, progress, done, total, chunk_size):
+    action, model, field_name, queryset = step
+    file_fields = _file_fields(model) if action == "delete" else []
+    while True:
+        pks = list(queryset.values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            return done
+        chunk = model._base_manager.filter(pk__in=pks)
+        with transaction.atomic():
+            if action == "null":
+                chunk.update(**{field_name: None})
+            else:
+                files = {field: set(chunk.values_list(field.attname, flat=True)) for field in file_fields}
+                chunk.delete()
+        if file_fields:
+            _remove_files(model, files)
+        done += len(pks)
+        progress(done, max(total, done))
+
+
+def purge(model, pk, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Удаляет объект со всеми связанными записями порциями. Возвращает число удаленных и измененных записей.
+    """
+    progress = progress or (lambda done, total=None: None)
+    steps = _plan(model, model._base_manager.filter(pk=pk), [])
+    total = sum(step[3].count() for step in steps)
+    progress(0, total)
+    done = 0
+    for step in steps:
+        done = _run_step(step, progress, done, total, chunk_size)
+    return done
+
+
+def run_deletion(params, progress):
+    return {"deleted": purge(MODELS[params["model"]], params["pk"], progress=progress)}
@@ -0,0 +1,67 @@
+import random
+
+from .cache import CacheNamespace, get_version
+from .models import Answer, Question
+
+delivery_cache = CacheNamespace("delivery", timeout=60 * 60 * 24)
+
+
+def build_payload(test):
+    """
+    Вопросы теста с вариантами ответа без признака правильности - два запроса.
+    У текстового вопроса отдается только номер ответа, в который пишет студент.
+    """
+    answers = {}
+    for answer in Answer.objects.filter(question__test=test).order_by("pk").values("id", "question_id", "text"):
+        answers.setdefault(answer["question_id"], []).append({"id": answer["id"], "text": answer["text"]})
+
+    questions = []
+    for question in Question.objects.filter(test=test).order_by("pk").values("id", "type", "text"):
+        options = answers.get(question["id"], [])
+        if question["type"] == Question.Type.TEXT:
+            question["answer_id"] = options[0]["id"] if options else None
+            question["answers"] = []
+        else:
+            question["answers"] = options
+        questions.append(question)
+
+    return {
+        "id": test.pk,
+        "name": test.name,
+        "time_limit": test.time_limit,
+        "shuffle": test.shuffle,
+        "questions": questions,
+    }
+
+
+def get_payload(test):
+    """
+    Общий для всех студентов payload теста, пересобирается только после изменения теста.
+    """
+    version = get_version("test", test.pk)
+    payload = delivery_cache.get_or_set(test.pk, version, default=lambda: build_payload(test))
+    return {**payload, "version": version}
+
+
+def personalize(payload, user_pk, question_ids=None):
+    """
+    Порядок вопросов и вариантов ответа для конкретного студента, для банка вопросов -
+    только выпавшие студенту вопросы. Порядок зависит только от теста и студента,
+    поэтому при повторном открытии не меняется.
+    """
+    questions = payload["questions"]
+    if question_ids is not None:
+        question_ids = set(question_ids)
+        questions = [question for question in questions if question["id"] in question_ids]
+    if not payload["shuffle"]:
+        return {**payload, "questions": questions}
+    rng = random.Random(f"{payload['id']}:{user_pk}")
+    questions = [{**question, "answers": list(question["answers"])} for question in questions]
+    rng.shuffle(questions)
+    for question in questions:
+        rng.shuffle(question["answers"])
+    return {**payload, "questions": questions}
+
+
+def get_student_payload(test, user, question_ids=None):
+    return personalize(get_payload(test), user.pk, question_ids)
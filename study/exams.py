@@ -0,0 +1,184 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .bank import draw_questions
+from .items import record_try
+from .models import ExamSession, GradeRollup, StudentAnswer, Try
+
+SUBMIT_GRACE = timedelta(seconds=30)  # запас на задержку сети при отправке в последний момент
+SWEEP_BATCH_SIZE = 100
+
+
+class ExamError(Exception):
+    pass
+
+
+def compact_answers(data):
+    """
+    Черновик хранит только заполненные ответы: {"<pk варианта>": 1} для отмеченных
+    вариантов и {"<pk ответа>": "текст"} для текстовых вопросов.
+    """
+    compact = {}
+    for key, value in data.items():
+        key = str(key)
+        if not key.isdigit():
+            continue
+        if isinstance(value, (list, tuple)):
+            value = value[-1] if value else None
+        if value is None or value is False or value == "":
+            continue
+        compact[key] = 1 if value is True or value == "on" else str(value)[:512]
+    return compact
+
+
+def get_lesson_deadline(test):
+    lesson = getattr(test, "lesson", None)
+    return lesson.deadline if lesson else None
+
+
+def is_course_closed(test):
+    lesson = getattr(test, "lesson", None)
+    return bool(lesson and lesson.subject_id and lesson.subject.closed_at)
+
+
+def count_attempts(user, test):
+    # Попытки закрытых дисциплин могли быть перенесены в архив (study.archival), там остается их число
+    archived = GradeRollup.objects.filter(user=user, test_id=test.pk).aggregate(total=Sum("attempts"))["total"]
+    return Try.objects.filter(user=user, test=test).count() + (archived or 0)
+
+
+def start_session(user, test):
+    """
+    Возвращает активную сессию студента или начинает новую попытку. Сессия, время которой истекло,
+    сначала оценивается по черновику, новая попытка начинается по обычным правилам.
+    """
+    session = ExamSession.objects.filter(user=user, test=test, finished_at__isnull=True).first()
+    if session and not is_expired(session):
+        return session
+    if session:
+        try:
+            finish_session(session, autosubmitted=True)
+        except ExamError:
+            pass  # сессию параллельно завершил другой запрос или sweep_expired
+
+    now = timezone.now()
+    deadline = get_lesson_deadline(test)
+    if deadline and now > deadline:
+        raise ExamError("Возможности сдать тест больше нет!")
+    if is_course_closed(test):
+        raise ExamError("Дисциплина закрыта, тест больше не принимается!")
+    if test.max_attempts and count_attempts(user, test) >= test.max_attempts:
+        raise ExamError("Попытки закончились!")
+
+    expires_at = now + timedelta(minutes=test.time_limit) if test.time_limit else None
+    if deadline and (expires_at is None or deadline < expires_at):
+        expires_at = deadline
+
+    try:
+        with transaction.atomic():
+            return ExamSession.objects.create(
+                user=user, test=test, expires_at=expires_at, question_ids=draw_questions(test))
+    except IntegrityError:
+        # Сессию параллельно создал другой запрос того же студента
+        return ExamSession.objects.get(user=user, test=test, finished_at__isnull=True)
+
+
+def is_expired(session, now=None):
+    now = now or timezone.now()
+    return session.expires_at is not None and now > session.expires_at + SUBMIT_GRACE
+
+
+def save_draft(session, patch):
+    """
+    Добавляет в черновик только изменившиеся ответы. Пустое значение удаляет ответ.
+    """
+    if session.is_finished or is_expired(session):
+        return False
+    draft = dict(session.draft)
+    for key, value in patch.items():
+        key = str(key)
+        compact = compact_answers({key: value})
+        if compact:
+            draft.update(compact)
+        else:
+            draft.pop(key, None)
+    session.draft = draft
+    session.draft_updated_at = timezone.now()
+    return ExamSession.objects.filter(pk=session.pk, finished_at__isnull=True).update(
+        draft=session.draft, draft_updated_at=session.draft_updated_at) == 1
+
+
+def grade(user, test, data, question_ids=None):
+    from .scoring import get_answer_key, selected_answer_ids
+
+    score, need_check = test.calculate_score(data, user, question_ids)
+    # Ключ уже в кэше после calculate_score; отметки сохраняются, чтобы пересчитать баллы при изменении ключа
+    key = get_answer_key(test)
+    student_try = Try.objects.create(
+        user=user, test=test, score=score, need_check=need_check, question_ids=question_ids,
+        selections=key.selected(selected_answer_ids(data)), choice_score=score)
+    record_try(student_try, key)
+    StudentAnswer.objects.filter(user=user, question__test=test, student_try__isnull=True).update(student_try=student_try)
+    return student_try
+
+
+def finish_session(session, data=None, autosubmitted=False):
+    """
+    Оценивает попытку и закрывает сессию. После окончания времени принимаются
+    только ответы, сохраненные в черновике до окончания времени.
+    """
+    with transaction.atomic():
+        session = ExamSession.objects.select_for_update().select_related("test", "user").get(pk=session.pk)
+        if session.is_finished:
+            raise ExamError("Попытка уже завершена")
+        if data is None or is_expired(session):
+            data = session.draft
+            autosubmitted = autosubmitted or is_expired(session)
+
+        session.student_try = grade(session.user, session.test, compact_answers(data), session.question_ids)
+        session.finished_at = timezone.now()
+        session.autosubmitted = autosubmitted
+        session.save(update_fields=["student_try", "finished_at", "autosubmitted"])
+    return session
+
+
+def submit(user, test, data, session_pk=None):
+    """
+    Отправка ответов. Клиент, начавший попытку, передает номер своей сессии,
+    без него попытка начинается и сразу же завершается.
+    """
+    if session_pk:
+        if not str(session_pk).isdigit():
+            raise ExamError("Попытка не найдена")
+        session = ExamSession.objects.filter(pk=session_pk, user=user, test=test).first()
+        if not session:
+            raise ExamError("Попытка не найдена")
+    else:
+        session = start_session(user, test)
+    return finish_session(session, data)
+
+
+def sweep_expired(batch_size=SWEEP_BATCH_SIZE, now=None):
+    """
+    Оценивает сохраненные черновики сессий, время которых истекло. Возвращает число оцененных попыток.
+    """
+    now = now or timezone.now()
+    graded = 0
+    while True:
+        batch = list(
+            ExamSession.objects
+            .filter(finished_at__isnull=True, expires_at__lt=now - SUBMIT_GRACE)
+            .order_by("expires_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not batch:
+            return graded
+        for session in ExamSession.objects.filter(pk__in=batch):
+            try:
+                finish_session(session, autosubmitted=True)
+                graded += 1
+            except ExamError:
+                pass
@@ -0,0 +1,26 @@
+"""
+Загрузка и выгрузка Excel. pandas и openpyxl импортируются только внутри функций: веб-процесс
+не тратит на них время запуска и память, пока никто не загружает и не скачивает таблицы.
+"""
+
+
+def write_table(file, rows, sheet_name="Sheet1", header=True, index=True):
+    """
+    Записывает список словарей (или списков) в xlsx: file - путь, файловый объект или HttpResponse.
+    """
+    import pandas as pd
+
+    with pd.ExcelWriter(file) as writer:
+        pd.DataFrame(rows).to_excel(writer, sheet_name=sheet_name, header=header, index=index)
+
+
+def read_rows(file, columns):
+    """
+    Строки загруженного xlsx словарями с ключами columns, пустые ячейки - None. Первая строка
+    файла - заголовок, следующая за ней тоже пропускается, как в прежних загрузчиках.
+    """
+    import pandas as pd
+
+    df = pd.read_excel(file, names=columns)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict("records")[1:]
@@ -1,7 +1,10 @@
 from django import forms
+from django.db.models import Case, When
 from accounts.forms import ProfileEditForm
 from .models import Group, Subject, TeacherGroupSubject, Lesson, Test, Question, Answer, LessonPhoto, \
     StudentIndividualWork
+from .cloning import available_courses, available_lessons
+from .widgets import AutocompleteSelect
 from django.contrib.auth.models import User
 
 
@@ -16,6 +19,7 @@ class StudentForm(ProfileEditForm):
         self.fields['group'] = forms.ModelChoiceField(
             queryset=Group.objects.all(),
             label='Группа',
+            widget=AutocompleteSelect("groups", attrs={"class": "form__input"}),
         )
         self.fields['group'].required = False
 
@@ -51,6 +55,7 @@ class TeacherGroupSubjectForm(forms.ModelForm):
         model = TeacherGroupSubject
         fields = ("teacher", "subject")
         labels = {"teacher": "Преподаватель", "subject": "Дисциплина"}
+        widgets = {"teacher": AutocompleteSelect("teachers"), "subject": AutocompleteSelect("subjects")}
 
     def __init__(self, *args, **kwargs):
         super(TeacherGroupSubjectForm, self).__init__(*args, **kwargs)
@@ -64,6 +69,7 @@ class GroupForTeacherSubjectForm(forms.ModelForm):
         model = TeacherGroupSubject
         fields = ("group", )
         labels = {"group": "Группа"}
+        widgets = {"group": AutocompleteSelect("groups")}
 
     def __init__(self, *args, **kwargs):
         super(GroupForTeacherSubjectForm, self).__init__(*args, **kwargs)
@@ -89,6 +95,7 @@ class LessonForm(forms.ModelForm):
             "text": "Текст",
             "deadline": "Срок сдачи"
         }
+        widgets = {"subject": AutocompleteSelect("teacher-subjects"), "test": AutocompleteSelect("free-tests")}
 
     def __init__(self, *args, **kwargs):
         super(LessonForm, self).__init__(*args, **kwargs)
@@ -105,7 +112,7 @@ class LessonForm(forms.ModelForm):
 class TestForm(forms.ModelForm):
     class Meta:
         model = Test
-        fields = ["name"]
+        fields = ["name", "time_limit", "max_attempts", "shuffle"]
         labels = {"name": "Название"}
 
     def __init__(self, *args, **kwargs):
@@ -118,8 +125,8 @@ class TestForm(forms.ModelForm):
 class QuestionForm(forms.ModelForm):
     class Meta:
         model = Question
-        fields = ("text", "type")
-        labels = {"text": "Вопрос", "type": "Тип"}
+        fields = ("text", "type", "topic")
+        labels = {"text": "Вопрос", "type": "Тип", "topic": "Тема"}
         widgets = {"type": forms.RadioSelect}
 
     def __init__(self, *args, **kwargs):
@@ -152,6 +159,72 @@ class ExcelForm(forms.Form):
             visible.field.widget.attrs['class'] = 'form__input'
 
 
+class RosterForm(forms.Form):
+    target = forms.ModelChoiceField(
+        queryset=Group.objects.all(), label="Перевести в группу", required=False,
+        widget=AutocompleteSelect("groups"),
+    )
+    file = forms.FileField(label="CSV файл со столбцом email", required=False)
+
+    def __init__(self, *args, **kwargs):
+        super(RosterForm, self).__init__(*args, **kwargs)
+
+        for visible in self.visible_fields():
+            visible.field.widget.attrs['class'] = 'form__input'
+
+
+class TestCloneForm(forms.Form):
+    lessons = forms.ModelMultipleChoiceField(
+        queryset=Lesson.objects.none(), label="Привязать копии к занятиям", required=False,
+        widget=forms.CheckboxSelectMultiple,
+    )
+    copies = forms.IntegerField(label="Или создать копий без занятия", min_value=1, max_value=50, initial=1,
+                                required=False)
+
+    def __init__(self, *args, test=None, user=None, **kwargs):
+        super(TestCloneForm, self).__init__(*args, **kwargs)
+        self.fields['copies'].widget.attrs['class'] = 'form__input'
+
+        # Те же занятия, что принимает API; занятия той же дисциплины в других группах - первыми
+        lessons = available_lessons(user)
+        source = Lesson.objects.filter(test=test).values_list("subject__subject_id", flat=True).first()
+        if source:
+            lessons = lessons.order_by(
+                Case(When(subject__subject_id=source, then=0), default=1), "subject__group__number", "name")
+        else:
+            lessons = lessons.order_by("subject__group__number", "name")
+        self.fields['lessons'].queryset = lessons
+        self.fields['lessons'].label_from_instance = lambda lesson: (
+            f"{lesson.name}, группа {lesson.subject.group.number}" if lesson.subject_id else lesson.name)
+
+
+class TestImportForm(forms.Form):
+    file = forms.FileField(label="Файл теста (JSON или GIFT)")
+    name = forms.CharField(label="Название теста (для GIFT - если не указано, берется имя файла)", max_length=128,
+                           required=False)
+
+    def __init__(self, *args, **kwargs):
+        super(TestImportForm, self).__init__(*args, **kwargs)
+
+        for visible in self.visible_fields():
+            visible.field.widget.attrs['class'] = 'form__input'
+
+
+class CourseCloneForm(forms.Form):
+    targets = forms.ModelMultipleChoiceField(
+        queryset=TeacherGroupSubject.objects.none(), label="Копировать занятия в дисциплины групп",
+        widget=forms.CheckboxSelectMultiple,
+    )
+    offset_days = forms.IntegerField(label="Сдвинуть сроки сдачи на (дней)", min_value=-365, max_value=365, initial=0)
+
+    def __init__(self, *args, source=None, user=None, **kwargs):
+        super(CourseCloneForm, self).__init__(*args, **kwargs)
+        self.fields['offset_days'].widget.attrs['class'] = 'form__input'
+
+        self.fields['targets'].queryset = available_courses(user, source).order_by("subject__name", "group__number")
+        self.fields['targets'].label_from_instance = lambda course: f"{course.subject}, группа {course.group.number}"
+
+
 class StudentWorkForm(forms.ModelForm):
 
     class Meta:
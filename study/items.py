@@ -0,0 +1,152 @@
+"""
+Анализ вопросов теста. При сдаче результаты попытки по вопросам с вариантами ответа записываются
+в QuestionResult, а суммы в QuestionStats и AnswerStats увеличиваются одним UPDATE на таблицу,
+поэтому чтение анализа зависит только от числа вопросов, а не попыток.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Prefetch, Value, When
+
+from .models import Answer, AnswerStats, Question, QuestionResult, QuestionStats, Try
+
+CHUNK_SIZE = 2000
+BATCH_SIZE = 1000
+UPDATE_BATCH = 200  # веток CASE в одном UPDATE
+
+
+def tries_in_chunks(test, fields, chunk_size=CHUNK_SIZE):
+    """
+    Попытки теста порциями по возрастанию pk. Используется вместо iterator(): SQLite не изолирует
+    чтение от записи в ту же таблицу в одном соединении.
+    """
+    last_pk = 0
+    while True:
+        rows = list(
+            Try.objects.filter(test=test, pk__gt=last_pk).order_by("pk").values_list("pk", *fields)[:chunk_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield rows
+
+
+def _increment(model, key_field, deltas):
+    """
+    deltas: {pk: {поле: прибавка}}. Недостающие строки создаются, затем все поля увеличиваются через F().
+    """
+    if not deltas:
+        return
+    model.objects.bulk_create([model(**{key_field: pk}) for pk in deltas], ignore_conflicts=True)
+    pks = list(deltas)
+    fields = next(iter(deltas.values())).keys()
+    for start in range(0, len(pks), UPDATE_BATCH):
+        batch = pks[start:start + UPDATE_BATCH]
+        model.objects.filter(**{f"{key_field}__in": batch}).update(**{
+            field: F(field) + Case(
+                *(When(**{key_field: pk}, then=Value(deltas[pk][field])) for pk in batch),
+                default=Value(0),
+                output_field=type(model._meta.get_field(field))(),
+            )
+            for field in fields
+        })
+
+
+def _accumulate(key, try_pks, selections, question_ids, choice_scores):
+    # numpy загружается при первой сдаче, а не при старте веб-процесса (модуль импортируют study.views)
+    import numpy as np
+
+    matrix = key.selection_matrix(selections)
+    drawn = key.drawn_matrix(question_ids)
+    ratios = key.question_ratios(matrix, drawn)
+    question_scores = np.array([100 / len(ids) if ids else 100 / max(key.question_count, 1) for ids in question_ids])
+    # Балл попытки без самого вопроса, чтобы вопрос не коррелировал сам с собой
+    rest = (np.asarray(choice_scores)[:, None] - ratios * question_scores[:, None]) * drawn
+
+    rows, columns = np.nonzero(drawn)
+    QuestionResult.objects.bulk_create([
+        QuestionResult(student_try_id=try_pks[row], question_id=int(key.question_ids[column]),
+                       score=float(ratios[row, column]))
+        for row, column in zip(rows.tolist(), columns.tolist())
+    ], batch_size=BATCH_SIZE)
+
+    attempts = drawn.sum(axis=0)
+    sums = {
+        "attempts": attempts,
+        "score_sum": ratios.sum(axis=0),
+        "score_sq_sum": (ratios ** 2).sum(axis=0),
+        "rest_sum": rest.sum(axis=0),
+        "rest_sq_sum": (rest ** 2).sum(axis=0),
+        "cross_sum": (ratios * rest).sum(axis=0),
+    }
+    _increment(QuestionStats, "question_id", {
+        int(pk): {name: values[column].item() for name, values in sums.items()}
+        for column, pk in enumerate(key.question_ids.tolist()) if attempts[column]
+    })
+    selected = matrix.sum(axis=0)
+    _increment(AnswerStats, "answer_id", {
+        int(pk): {"selected": int(selected[column])}
+        for column, pk in enumerate(key.answer_ids.tolist()) if selected[column]
+    })
+
+
+def record_try(student_try, key=None):
+    """
+    Учитывает новую попытку в анализе вопросов.
+    """
+    from .scoring import get_answer_key
+
+    key = key or get_answer_key(student_try.test)
+    if not len(key.question_ids) or student_try.selections is None:
+        return
+    _accumulate(key, [student_try.pk], [student_try.selections], [student_try.question_ids],
+                [student_try.choice_score])
+
+
+@transaction.atomic
+def rebuild_item_stats(test, key=None, chunk_size=CHUNK_SIZE):
+    """
+    Пересчитывает анализ вопросов теста по сохраненным отметкам всех попыток, например после пересчета баллов.
+    """
+    from .scoring import get_answer_key
+
+    QuestionResult.objects.filter(question__test=test).delete()
+    QuestionStats.objects.filter(question__test=test).delete()
+    AnswerStats.objects.filter(answer__question__test=test).delete()
+    key = key or get_answer_key(test)
+    if not len(key.question_ids):
+        return
+    for chunk in tries_in_chunks(test, ("selections", "question_ids", "choice_score"), chunk_size):
+        rows = [row for row in chunk if row[1] is not None and row[3] is not None]
+        if rows:
+            _accumulate(key, *zip(*rows))
+
+
+def _answer_row(answer, attempts):
+    selected = getattr(answer, "stats", None) and answer.stats.selected or 0
+    return {
+        "id": answer.pk,
+        "text": answer.text,
+        "correct": answer.correct,
+        "selected": selected,
+        "share": round(selected / attempts * 100, 1) if attempts else None,
+    }
+
+
+def get_item_analysis(test):
+    questions = (
+        Question.objects.filter(test=test, type=Question.Type.CHOOSE)
+        .select_related("stats")
+        .prefetch_related(Prefetch("answers", queryset=Answer.objects.select_related("stats").order_by("pk")))
+        .order_by("pk")
+    )
+    result = []
+    for question in questions:
+        stats = getattr(question, "stats", None) or QuestionStats(question=question)
+        discrimination = stats.discrimination
+        result.append({
+            "id": question.pk,
+            "text": question.text,
+            "attempts": stats.attempts,
+            "mean_score": round(stats.mean_score * 100, 1) if stats.attempts else None,
+            "discrimination": round(discrimination, 2) if discrimination is not None else None,
+            "answers": [_answer_row(answer, stats.attempts) for answer in question.answers.all()],
+        })
+    return result
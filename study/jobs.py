@@ -0,0 +1,129 @@
+"""
+Фоновые задачи. enqueue создает Job и после коммита запускает его в потоке веб-процесса
+(JOBS_RUN_IN_THREAD = False - задачи выполняет только команда run_jobs). Задачу забирает тот,
+кто первым переведет ее из pending в running, поэтому поток и команда не выполнят ее дважды.
+Задача, которая дольше JOBS_STALE_AFTER не отмечала прогресс (процесс перезапустили посреди
+задачи), возвращается в очередь и продолжается с сохраненного checkpoint, после JOBS_MAX_ATTEMPTS
+запусков - завершается ошибкой.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Обработчик получает параметры задачи (с ключом "checkpoint" - сохраненное состояние прерванного запуска)
+# и функцию progress(done, total, checkpoint), возвращает результат для Job.result. Обработчик должен
+# вызывать progress хотя бы раз в JOBS_STALE_AFTER и быть готовым продолжить работу после перезапуска.
+HANDLERS = {
+    Job.Kind.COURSE_CLONE: "study.cloning.run_course_clone",
+    Job.Kind.DELETE: "study.deletion.run_deletion",
+    Job.Kind.ARCHIVE: "study.archival.run_archive",
+    Job.Kind.RESTORE: "study.archival.run_restore",
+}
+
+
+def _stale_after():
+    return getattr(settings, "JOBS_STALE_AFTER", timedelta(minutes=10))
+
+
+def _max_attempts():
+    return getattr(settings, "JOBS_MAX_ATTEMPTS", 3)
+
+
+def enqueue(kind, user=None, **params):
+    job = Job.objects.create(kind=kind, params=params, created_by=user)
+    if getattr(settings, "JOBS_RUN_IN_THREAD", True):
+        def start():
+            # Прерванные задачи подхватываются и без воркера run_jobs
+            for pk in [job.pk, *recover_stale()]:
+                start_thread(pk)
+        transaction.on_commit(start)
+    return job
+
+
+def start_thread(pk):
+    thread = threading.Thread(target=_run_in_thread, args=(pk,), name=f"job-{pk}", daemon=True)
+    thread.start()
+    return thread
+
+
+def _run_in_thread(pk):
+    try:
+        run_job(pk)
+    finally:
+        # У потока свое соединение с базой, оно закрывается вместе с потоком
+        connection.close()
+
+
+def recover_stale(now=None):
+    """
+    Возвращает в очередь задачи, которые выполняются, но давно не отмечали прогресс.
+    Возвращает номера возвращенных задач.
+    """
+    now = now or timezone.now()
+    stale = Job.objects.filter(status=Job.Status.RUNNING, heartbeat_at__lt=now - _stale_after())
+    failed = stale.filter(attempts__gte=_max_attempts()).update(
+        status=Job.Status.FAILED, error="Задача прервана и не завершилась после повторных запусков", finished_at=now)
+    if failed:
+        logger.warning("Задач завершено ошибкой после повторных запусков: %s", failed)
+    pks = list(stale.values_list("pk", flat=True))
+    # Условие повторяется в update: задачу мог одновременно вернуть в очередь другой процесс
+    return [pk for pk in pks if stale.filter(pk=pk).update(status=Job.Status.PENDING)]
+
+
+def _progress(pk):
+    def progress(done, total=None, checkpoint=None):
+        fields = {"done": done, "heartbeat_at": timezone.now()}
+        if total is not None:
+            fields["total"] = total
+        if checkpoint is not None:
+            fields["checkpoint"] = checkpoint
+        Job.objects.filter(pk=pk).update(**fields)
+    return progress
+
+
+def run_job(pk):
+    """
+    Выполняет задачу, если она еще в очереди. Возвращает задачу или None, если ее забрал другой процесс.
+    """
+    now = timezone.now()
+    claimed = Job.objects.filter(pk=pk, status=Job.Status.PENDING).update(
+        status=Job.Status.RUNNING, started_at=now, heartbeat_at=now, attempts=F("attempts") + 1,
+    )
+    if not claimed:
+        return None
+    job = Job.objects.get(pk=pk)
+    try:
+        result = import_string(HANDLERS[job.kind])({**job.params, "checkpoint": job.checkpoint}, _progress(pk))
+    except Exception as e:
+        logger.exception("Задача %s завершилась ошибкой", pk)
+        Job.objects.filter(pk=pk).update(status=Job.Status.FAILED, error=str(e), finished_at=timezone.now())
+    else:
+        Job.objects.filter(pk=pk).update(status=Job.Status.DONE, result=result, finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def run_pending(limit=None):
+    """
+    Возвращает в очередь прерванные задачи и выполняет задачи из очереди по порядку создания,
+    возвращает число выполненных.
+    """
+    recover_stale()
+    count = 0
+    while limit is None or count < limit:
+        pk = Job.objects.filter(status=Job.Status.PENDING).order_by("created_at", "pk").values_list("pk", flat=True).first()
+        if pk is None:
+            break
+        if run_job(pk) is not None:
+            count += 1
+    return count
@@ -0,0 +1,206 @@
+"""
+Нагрузочное тестирование: виртуальные студенты и преподаватели ходят по HTML и API страницам
+через простой асинхронный HTTP/1.1 клиент на asyncio, время ответа собирается по каждой странице.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from .models import Lesson, TeacherGroupSubject
+
+
+class HttpClient:
+    """
+    Одно keep-alive соединение с сервером. Поддерживаются ответы с Content-Length и chunked.
+    """
+
+    def __init__(self, base_url, headers=None, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = parts.scheme == "https"
+        self.headers = {"Host": parts.netloc, "Connection": "keep-alive", **(headers or {})}
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def _read_body(self, headers):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    return body
+                body += await self.reader.readexactly(size)
+                await self.reader.readline()
+        return await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+    async def _request(self, path, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None)
+        lines = [f"GET {path} HTTP/1.1", *(f"{name}: {value}" for name, value in {**self.headers, **headers}.items())]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = (await self.reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        body = await self._read_body(response_headers)
+        if response_headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, body
+
+    async def get(self, path, headers=None):
+        try:
+            return await asyncio.wait_for(self._request(path, headers or {}), self.timeout)
+        except Exception:
+            # После ошибки состояние соединения неизвестно, открываем новое
+            await self.close()
+            raise
+
+
+@dataclass
+class EndpointStats:
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+
+    def percentile(self, value):
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return 0
+        return ordered[min(int(len(ordered) * value / 100), len(ordered) - 1)]
+
+
+@dataclass
+class VirtualUser:
+    role: str
+    cookie: str
+    token: str
+    urls: list  # [(название, путь, вес)]
+
+
+def _session_cookie(user):
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+
+def _student_urls(user):
+    group = user.group_set.first()
+    items = list(TeacherGroupSubject.objects.filter(group=group).values_list("pk", flat=True)) if group else []
+    lessons = list(Lesson.objects.filter(subject__group=group).values_list("pk", flat=True)[:50]) if group else []
+    urls = [
+        ("index", reverse("index"), 2),
+        ("student-deadlines", reverse("student-deadlines"), 2),
+        ("api-student-deadlines", reverse("api-student-deadlines"), 2),
+        ("api-index", reverse("api-index"), 1),
+    ]
+    urls += [("student-subject", reverse("student-subject", kwargs={"pk": pk}), 3) for pk in items]
+    urls += [("api-student-subject", reverse("api-student-subject", kwargs={"pk": pk}), 1) for pk in items]
+    urls += [("student-lesson", reverse("student-lesson", kwargs={"pk": pk}), 4) for pk in lessons]
+    urls += [("api-student-lesson", reverse("api-student-lesson", kwargs={"pk": pk}), 1) for pk in lessons]
+    return urls
+
+
+def _teacher_urls(user):
+    lessons = list(Lesson.objects.filter(subject__teacher=user).values_list("pk", flat=True)[:20])
+    urls = [
+        ("index", reverse("index"), 1),
+        ("my-lessons", reverse("my-lessons"), 3),
+        ("api-my-lessons", reverse("api-my-lessons"), 2),
+        ("my-lessons-filtered", reverse("my-lessons") + "?ordering=-deadline&has_deadline=1", 1),
+        ("my-subjects", reverse("my-subjects"), 1),
+    ]
+    urls += [("my-lesson", reverse("my-lesson", kwargs={"pk": pk}), 1) for pk in lessons]
+    return urls
+
+
+def prepare_users(prefix, students, teachers):
+    """
+    Сессии и токены для синтетических пользователей создаются напрямую в базе, без входа через форму.
+    """
+    virtual_users = []
+    for role, count, build_urls in (("student", students, _student_urls), ("teacher", teachers, _teacher_urls)):
+        for user in User.objects.filter(username__startswith=f"{prefix}-{role}-").order_by("pk")[:count]:
+            token, _ = Token.objects.get_or_create(user=user)
+            virtual_users.append(VirtualUser(role, _session_cookie(user), token.key, build_urls(user)))
+    return virtual_users
+
+
+async def _run_user(base_url, virtual_user, deadline, think_time, stats, rng):
+    client = HttpClient(base_url)
+    names = [url[0] for url in virtual_user.urls]
+    weights = [url[2] for url in virtual_user.urls]
+    paths = {url[0]: [] for url in virtual_user.urls}
+    for name, path, _ in virtual_user.urls:
+        paths[name].append(path)
+    try:
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            path = rng.choice(paths[name])
+            if name.startswith("api-"):
+                headers = {"Authorization": f"Token {virtual_user.token}", "Accept": "application/json"}
+            else:
+                headers = {"Cookie": virtual_user.cookie}
+            endpoint = stats.setdefault(name, EndpointStats())
+            started = time.perf_counter()
+            try:
+                status, _ = await client.get(path, headers)
+            except Exception:
+                endpoint.errors += 1
+            else:
+                endpoint.latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    endpoint.errors += 1
+            if think_time:
+                await asyncio.sleep(rng.expovariate(1 / think_time))
+    finally:
+        await client.close()
+
+
+async def run(base_url, virtual_users, duration, think_time=0.5, seed=0):
+    stats = {}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(
+        _run_user(base_url, virtual_user, deadline, think_time, stats, random.Random(f"{seed}:{n}"))
+        for n, virtual_user in enumerate(virtual_users)
+    ))
+    return stats
+
+
+def report(stats, duration):
+    rows = []
+    for name, endpoint in sorted(stats.items()):
+        rows.append({
+            "endpoint": name,
+            "requests": len(endpoint.latencies),
+            "errors": endpoint.errors,
+            "rps": round(len(endpoint.latencies) / duration, 2),
+            "p50_ms": round(endpoint.percentile(50) * 1000, 1),
+            "p90_ms": round(endpoint.percentile(90) * 1000, 1),
+            "p99_ms": round(endpoint.percentile(99) * 1000, 1),
+            "max_ms": round(max(endpoint.latencies, default=0) * 1000, 1),
+        })
+    return rows
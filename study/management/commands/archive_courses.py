@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from study.archival import archive_course
+from study.models import TeacherGroupSubject
+
+
+class Command(BaseCommand):
+    help = "Переносит проверенные попытки закрытых дисциплин групп в архив"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--course", type=int, action="append", help="Только эта дисциплина группы (можно несколько)")
+        parser.add_argument("--closed-before", help="Только дисциплины, закрытые до даты ГГГГ-ММ-ДД")
+
+    def handle(self, *args, **options):
+        courses = TeacherGroupSubject.objects.filter(closed_at__isnull=False).order_by("pk")
+        if options["course"]:
+            courses = courses.filter(pk__in=options["course"])
+        if options["closed_before"]:
+            courses = courses.filter(closed_at__date__lt=parse_date(options["closed_before"]))
+        for course in courses:
+            count = archive_course(course)
+            self.stdout.write(f"{course}: в архив перенесено попыток: {count}")
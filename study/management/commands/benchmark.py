@@ -0,0 +1,88 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from study.benchmarks import BASELINE_PATH, CASES, REPEAT, SIZES, TOLERANCE, compare, load_baseline, run, \
+    save_baseline, serializer_throughput, startup_profile
+
+
+class Command(BaseCommand):
+    help = "Микробенчмарки оценивания и ведомостей на отдельной тестовой базе"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="Размеры данных через запятую")
+        parser.add_argument("--case", action="append", choices=list(CASES), help="Запустить только эти случаи")
+        parser.add_argument("--repeat", type=int, default=REPEAT)
+        parser.add_argument("--baseline", default=BASELINE_PATH)
+        parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+        parser.add_argument("--save-baseline", action="store_true", help="Записать результаты в базовый файл")
+        parser.add_argument("--json", help="Сохранить результаты в JSON файл")
+        parser.add_argument("--serializers", type=int, metavar="ROWS",
+                            help="Сравнить скорость выдачи списка из ROWS попыток разными сериализаторами")
+        parser.add_argument("--startup", action="store_true",
+                            help="Холодный старт веб-процесса: время до первого ответа, память, импорты")
+
+    def handle(self, *args, **options):
+        if options["startup"]:
+            return self.handle_startup(options)
+        sizes = [int(size) for size in options["sizes"].split(",")]
+
+        # Данные создаются в тестовой базе, рабочая база не затрагивается
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if options["serializers"]:
+                results = serializer_throughput(options["serializers"], options["repeat"])
+            else:
+                results = run(sizes, options["case"], options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["json"]:
+            with open(options["json"], "w") as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+
+        if options["serializers"]:
+            self.stdout.write(f"{'variant':32} {'median ms':>10} {'rows/s':>10} {'queries':>8}")
+            for key, result in results.items():
+                self.stdout.write(f"{key:32} {result['median_ms']:>10} {result['rows_per_s']:>10} {result['queries']:>8}")
+            return
+
+        baseline = load_baseline(options["baseline"])
+        self.stdout.write(f"{'case':32} {'median ms':>10} {'min ms':>10} {'queries':>8} {'baseline ms':>12}")
+        for key, result in results.items():
+            base = baseline.get(key, {})
+            self.stdout.write(
+                f"{key:32} {result['median_ms']:>10} {result['min_ms']:>10} {result['queries']:>8} "
+                f"{base.get('median_ms', '-'):>12}"
+            )
+
+        if options["save_baseline"]:
+            os.makedirs(os.path.dirname(options["baseline"]) or ".", exist_ok=True)
+            save_baseline({**baseline, **results}, options["baseline"])
+            self.stdout.write(f"Базовый файл обновлен: {options['baseline']}")
+            return
+
+        regressions = compare(results, baseline, options["tolerance"])
+        if regressions:
+            raise CommandError("Регрессии производительности:\n" + "\n".join(regressions))
+
+    def handle_startup(self, options):
+        # Рабочая и тестовая базы не нужны: запрос идет к странице без обращений к базе
+        result = startup_profile(repeat=options["repeat"])
+        if options["json"]:
+            with open(options["json"], "w") as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+
+        self.stdout.write(f"Статус первого ответа: {result['status']}")
+        self.stdout.write(f"Загрузка приложения: {result['setup_ms']} мс")
+        self.stdout.write(f"До первого ответа: {result['first_response_ms']} мс")
+        self.stdout.write(f"Пиковая память: {result['maxrss_mb']} МБ")
+        self.stdout.write(f"Загружены при старте: {', '.join(result['loaded']) or '-'}")
+        self.stdout.write("Самые долгие импорты (мс):")
+        for name, ms in result["top_imports"]:
+            self.stdout.write(f"  {name:40} {ms:>8}")
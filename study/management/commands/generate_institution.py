@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from study.synthetic import BATCH_SIZE, PASSWORD, clear_institution, generate_institution
+
+
+class Command(BaseCommand):
+    help = "Создает синтетическое учебное заведение для нагрузочного тестирования"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--groups", type=int, default=10)
+        parser.add_argument("--teachers", type=int, default=20)
+        parser.add_argument("--students", type=int, default=250)
+        parser.add_argument("--subjects", type=int, default=15)
+        parser.add_argument("--subjects-per-group", type=int, default=6)
+        parser.add_argument("--lessons-per-subject", type=int, default=12)
+        parser.add_argument("--questions-per-test", type=int, default=10)
+        parser.add_argument("--tries-ratio", type=float, default=0.7, help="Доля тестов, которые студент уже сдавал")
+        parser.add_argument("--no-media", action="store_true", help="Не создавать заглушки фото, видео и файлов")
+        parser.add_argument("--prefix", default="synthetic")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--clear", action="store_true", help="Удалить ранее созданные данные с этим префиксом")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            clear_institution(options["prefix"])
+            self.stdout.write("Синтетические данные удалены")
+            return
+
+        counts = generate_institution(
+            groups=options["groups"],
+            teachers=options["teachers"],
+            students=options["students"],
+            subjects=options["subjects"],
+            subjects_per_group=options["subjects_per_group"],
+            lessons_per_subject=options["lessons_per_subject"],
+            questions_per_test=options["questions_per_test"],
+            tries_ratio=options["tries_ratio"],
+            with_media=not options["no_media"],
+            prefix=options["prefix"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+        )
+        for name, count in counts.items():
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(f"Пароль всех пользователей: {PASSWORD}")
@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from study.loadtest import prepare_users, report, run
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный тест: синтетические студенты и преподаватели открывают HTML и API страницы"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--students", type=int, default=50, help="Число виртуальных студентов")
+        parser.add_argument("--teachers", type=int, default=5, help="Число виртуальных преподавателей")
+        parser.add_argument("--duration", type=int, default=60, help="Длительность теста в секундах")
+        parser.add_argument("--think-time", type=float, default=0.5, help="Средняя пауза между запросами (сек)")
+        parser.add_argument("--prefix", default="synthetic", help="Префикс данных generate_institution")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", help="Сохранить результаты в JSON файл")
+
+    def handle(self, *args, **options):
+        virtual_users = prepare_users(options["prefix"], options["students"], options["teachers"])
+        if not virtual_users:
+            raise CommandError("Нет синтетических пользователей, сначала запустите generate_institution")
+
+        self.stdout.write(f"Пользователей: {len(virtual_users)}, длительность: {options['duration']} сек")
+        stats = asyncio.run(run(
+            options["base_url"], virtual_users, options["duration"], options["think_time"], options["seed"]))
+        rows = report(stats, options["duration"])
+
+        header = f"{'endpoint':32} {'requests':>9} {'errors':>7} {'rps':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}"
+        self.stdout.write(header)
+        for row in rows:
+            self.stdout.write(
+                f"{row['endpoint']:32} {row['requests']:>9} {row['errors']:>7} {row['rps']:>8} "
+                f"{row['p50_ms']:>8} {row['p90_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8}"
+            )
+        total = sum(row["requests"] for row in rows)
+        self.stdout.write(f"Всего запросов: {total}, {round(total / options['duration'], 2)} в секунду")
+
+        if options["json"]:
+            with open(options["json"], "w") as file:
+                json.dump(rows, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from study.models import SearchEntry
+from study.search import BATCH_SIZE, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Строит поисковый индекс заново по всем занятиям, тестам, вопросам и дисциплинам"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        counts = rebuild_index(batch_size=options["batch_size"])
+        for kind, label in SearchEntry.Kind.choices:
+            self.stdout.write(f"{label}: {counts.get(kind, 0)}")
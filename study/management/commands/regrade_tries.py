@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from study.models import Test
+from study.regrade import CHUNK_SIZE, regrade_test
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает баллы попыток тестов по текущему ключу ответов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tests", nargs="*", type=int, help="Номера тестов")
+        parser.add_argument("--all", action="store_true", help="Пересчитать все тесты, у которых есть попытки")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Только показать изменения, не сохраняя их")
+        parser.add_argument("--json", action="store_true", help="Вывести отчет в JSON")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            tests = Test.objects.filter(users_tries__isnull=False).distinct().order_by("pk")
+        elif options["tests"]:
+            tests = Test.objects.filter(pk__in=options["tests"]).order_by("pk")
+            missing = set(options["tests"]) - set(tests.values_list("pk", flat=True))
+            if missing:
+                raise CommandError(f"Тесты не найдены: {', '.join(map(str, sorted(missing)))}")
+        else:
+            raise CommandError("Укажите номера тестов или --all")
+
+        reports = []
+        for test in tests:
+            report = regrade_test(test, chunk_size=options["chunk_size"], dry_run=options["dry_run"]).as_dict()
+            reports.append(report)
+            if not options["json"]:
+                self.stdout.write(
+                    f"{test}: попыток {report['tries']}, изменено {report['changed']} "
+                    f"(+{report['increased']} / -{report['decreased']}), пропущено {report['skipped']}, "
+                    f"изменение от {report['min_delta']} до {report['max_delta']}"
+                )
+        if options["json"]:
+            self.stdout.write(json.dumps(reports, ensure_ascii=False, indent=2))
+        elif options["dry_run"]:
+            self.stdout.write("Пробный запуск: изменения не сохранены")
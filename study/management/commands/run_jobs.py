@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from study.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = "Выполняет фоновые задачи из очереди (копирование дисциплин и т.п.)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Выполнить не больше N задач")
+        parser.add_argument(
+            "--interval", type=int, default=0,
+            help="Проверять очередь повторно каждые N секунд (0 - выполнить один раз)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_pending(limit=options["limit"])
+            self.stdout.write(f"Выполнено задач: {count}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
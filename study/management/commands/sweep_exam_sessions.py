@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from study.exams import SWEEP_BATCH_SIZE, sweep_expired
+
+
+class Command(BaseCommand):
+    help = "Оценивает сохраненные ответы сессий тестов, время которых истекло"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE)
+        parser.add_argument(
+            "--interval", type=int, default=0,
+            help="Запускаться повторно каждые N секунд (0 - выполнить один раз)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            graded = sweep_expired(batch_size=options["batch_size"])
+            self.stdout.write(f"Оценено попыток: {graded}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0025_lesson_deadline'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['subject', 'deadline'], name='lesson_subject_deadline_idx'),
+        ),
+    ]
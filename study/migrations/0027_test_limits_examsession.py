@@ -0,0 +1,50 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('study', '0026_lesson_subject_deadline_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='max_attempts',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Количество попыток'),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='time_limit',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Время на прохождение (мин)'),
+        ),
+        migrations.CreateModel(
+            name='ExamSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('draft', models.JSONField(blank=True, default=dict)),
+                ('draft_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('autosubmitted', models.BooleanField(default=False)),
+                ('student_try', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exam_session', to='study.try')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_sessions', to='study.test')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Сессия теста',
+                'verbose_name_plural': 'Сессии тестов',
+                'indexes': [models.Index(fields=['finished_at', 'expires_at'], name='exam_session_expiry_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='examsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('finished_at__isnull', True)), fields=('user', 'test'), name='exam_session_one_active'),
+        ),
+    ]
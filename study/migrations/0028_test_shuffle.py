@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0027_test_limits_examsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='shuffle',
+            field=models.BooleanField(default=False, verbose_name='Перемешивать вопросы и ответы'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0028_test_shuffle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestTopicRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(verbose_name='Количество вопросов')),
+            ],
+            options={
+                'verbose_name': 'Правило выбора вопросов',
+                'verbose_name_plural': 'Правила выбора вопросов',
+            },
+        ),
+        migrations.CreateModel(
+            name='Topic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+            ],
+            options={
+                'verbose_name': 'Тема',
+                'verbose_name_plural': 'Темы',
+            },
+        ),
+        migrations.AddField(
+            model_name='examsession',
+            name='question_ids',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='try',
+            name='question_ids',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testtopicrule',
+            name='test',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_rules', to='study.test'),
+        ),
+        migrations.AddField(
+            model_name='testtopicrule',
+            name='topic',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='study.topic'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='topic',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='questions', to='study.topic'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['test', 'topic'], name='question_test_topic_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='testtopicrule',
+            constraint=models.UniqueConstraint(fields=('test', 'topic'), name='test_topic_rule_unique'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-19 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0029_question_bank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='try',
+            name='choice_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='try',
+            name='selections',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.5 on 2026-10-19 15:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0031_try_selections'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerStats',
+            fields=[
+                ('answer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='study.answer')),
+                ('selected', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Статистика варианта ответа',
+                'verbose_name_plural': 'Статистика вариантов ответа',
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='study.question')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('score_sq_sum', models.FloatField(default=0)),
+                ('rest_sum', models.FloatField(default=0)),
+                ('rest_sq_sum', models.FloatField(default=0)),
+                ('cross_sum', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Статистика вопроса',
+                'verbose_name_plural': 'Статистика вопросов',
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='study.question')),
+                ('student_try', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_results', to='study.try')),
+            ],
+            options={
+                'verbose_name': 'Результат по вопросу',
+                'verbose_name_plural': 'Результаты по вопросам',
+            },
+        ),
+    ]
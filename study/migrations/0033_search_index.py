@@ -0,0 +1,117 @@
+# Generated by Django 4.2.5 on 2026-10-19 15:30
+
+from django.db import migrations, models
+
+SQLITE_CREATE = [
+    # Группа записи индексируется отдельной колонкой: поиск студента ограничивается ею внутри FTS5,
+    # а не фильтром по всем совпадениям
+    """
+    CREATE VIEW study_search_content AS
+    SELECT id, title_terms, body_terms, 'group' || scope_group AS scope_terms FROM study_searchentry
+    """,
+    # Внешнее содержимое: тексты лежат в study_searchentry, FTS5 хранит только индекс
+    """
+    CREATE VIRTUAL TABLE study_search_fts USING fts5(
+        title_terms, body_terms, scope_terms, content='study_search_content', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER study_search_ai AFTER INSERT ON study_searchentry BEGIN
+        INSERT INTO study_search_fts(rowid, title_terms, body_terms, scope_terms)
+        VALUES (new.id, new.title_terms, new.body_terms, 'group' || new.scope_group);
+    END
+    """,
+    """
+    CREATE TRIGGER study_search_ad AFTER DELETE ON study_searchentry BEGIN
+        INSERT INTO study_search_fts(study_search_fts, rowid, title_terms, body_terms, scope_terms)
+        VALUES ('delete', old.id, old.title_terms, old.body_terms, 'group' || old.scope_group);
+    END
+    """,
+    """
+    CREATE TRIGGER study_search_au AFTER UPDATE ON study_searchentry BEGIN
+        INSERT INTO study_search_fts(study_search_fts, rowid, title_terms, body_terms, scope_terms)
+        VALUES ('delete', old.id, old.title_terms, old.body_terms, 'group' || old.scope_group);
+        INSERT INTO study_search_fts(rowid, title_terms, body_terms, scope_terms)
+        VALUES (new.id, new.title_terms, new.body_terms, 'group' || new.scope_group);
+    END
+    """,
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS study_search_au",
+    "DROP TRIGGER IF EXISTS study_search_ad",
+    "DROP TRIGGER IF EXISTS study_search_ai",
+    "DROP TABLE IF EXISTS study_search_fts",
+    "DROP VIEW IF EXISTS study_search_content",
+]
+
+# Слова уже приведены к основе стеммером, поэтому конфигурация simple, а не russian
+POSTGRESQL_CREATE = [
+    """
+    ALTER TABLE study_searchentry ADD COLUMN document tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title_terms), 'A') || setweight(to_tsvector('simple', body_terms), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX study_search_document_idx ON study_searchentry USING GIN (document)",
+]
+POSTGRESQL_DROP = [
+    "DROP INDEX IF EXISTS study_search_document_idx",
+    "ALTER TABLE study_searchentry DROP COLUMN IF EXISTS document",
+]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _execute(schema_editor, SQLITE_CREATE)
+    elif vendor == "postgresql":
+        _execute(schema_editor, POSTGRESQL_CREATE)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _execute(schema_editor, SQLITE_DROP)
+    elif vendor == "postgresql":
+        _execute(schema_editor, POSTGRESQL_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0032_item_analysis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('lesson', 'Занятие'), ('test', 'Тест'), ('question', 'Вопрос'), ('subject', 'Дисциплина'), ('course', 'Дисциплина группы')], max_length=16)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('parent_id', models.PositiveBigIntegerField(null=True)),
+                ('title', models.CharField(max_length=256)),
+                ('title_terms', models.TextField(blank=True)),
+                ('body_terms', models.TextField(blank=True)),
+                ('scope_group', models.PositiveBigIntegerField(null=True)),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='search_entry_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=models.Index(fields=['scope_group', 'kind'], name='study_searc_scope_g_3b3c1b_idx'),
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.5 on 2026-10-19 16:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('study', '0035_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teachergroupsubject',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Закрыта'),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('course_clone', 'Копирование занятий дисциплины'), ('delete', 'Удаление'), ('archive', 'Архивация попыток'), ('restore', 'Восстановление попыток из архива')], max_length=32),
+        ),
+        migrations.CreateModel(
+            name='ArchiveBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('try_count', models.PositiveIntegerField(default=0)),
+                ('answer_count', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archive_batches', to='study.teachergroupsubject')),
+            ],
+            options={
+                'verbose_name': 'Архив попыток',
+                'verbose_name_plural': 'Архивы попыток',
+            },
+        ),
+        migrations.CreateModel(
+            name='GradeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('test_id', models.PositiveBigIntegerField()),
+                ('test_name', models.CharField(max_length=128)),
+                ('lesson_name', models.CharField(blank=True, max_length=128)),
+                ('attempts', models.PositiveIntegerField()),
+                ('best_score', models.FloatField()),
+                ('last_score', models.FloatField()),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='study.archivebatch')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grade_rollups', to='study.teachergroupsubject')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grade_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Итог архивированных попыток',
+                'verbose_name_plural': 'Итоги архивированных попыток',
+                'indexes': [models.Index(fields=['user', 'course'], name='grade_rollup_user_idx'), models.Index(fields=['test_id', 'user'], name='grade_rollup_test_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.5 on 2026-10-19 16:45
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('study', '0037_job_recovery'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(django.db.models.functions.text.Upper('number'), name='group_number_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='subject_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='test_name_upper_idx'),
+        ),
+        # Модель пользователя принадлежит django.contrib.auth, индекс для поиска преподавателей создается вручную
+        migrations.RunSQL(
+            'CREATE INDEX auth_user_username_upper_idx ON auth_user (UPPER(username))',
+            'DROP INDEX auth_user_username_upper_idx',
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.5 on 2026-10-19 16:46
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0038_prefix_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='graderollup',
+            index=models.Index(django.db.models.functions.text.Upper('test_name'), name='rollup_test_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='lesson_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(django.db.models.functions.text.Upper('text'), name='question_text_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='topic_name_upper_idx'),
+        ),
+    ]
@@ -1,16 +1,34 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
-from datetime import datetime as dt
-import pytz
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+class ActiveManager(models.Manager):
+    """
+    Скрывает объекты, помеченные удаленными: их связанные записи еще удаляются в фоне (study.deletion).
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class Group(models.Model):
     number = models.CharField(max_length=32)
     students = models.ManyToManyField(User, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = "Группа"
         verbose_name_plural = "Группы"
+        indexes = [
+            models.Index(Upper("number"), name="group_number_upper_idx"),
+        ]
 
     def __str__(self):
         return self.number
@@ -23,6 +41,9 @@ class Subject(models.Model):
     class Meta:
         verbose_name = "Дисциплина"
         verbose_name_plural = "Дисциплины"
+        indexes = [
+            models.Index(Upper("name"), name="subject_name_upper_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -32,6 +53,7 @@ class TeacherGroupSubject(models.Model):
     teacher = models.ForeignKey(User, related_name="subjects", on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, related_name="items", on_delete=models.CASCADE)
     group = models.ForeignKey(Group, related_name="subjects", on_delete=models.CASCADE)
+    closed_at = models.DateTimeField("Закрыта", null=True, blank=True)  # семестр закончен, попытки можно архивировать
 
     class Meta:
         verbose_name = "Дисциплина группы"
@@ -44,6 +66,27 @@ class TeacherGroupSubject(models.Model):
     def name_for_student(self):
         return f"{self.subject} ({self.teacher})"
 
+    def lessons_by_type(self):
+        lessons = {l_type[1]: [] for l_type in Lesson.type.field.choices}
+        for lesson in self.lessons.all():
+            lessons[lesson.get_type_display()].append(lesson)
+        return lessons
+
+    def archived_best_scores(self, user=None):
+        """
+        Лучшие баллы из архива по тестам дисциплины группы: {test_id: балл}. Читается одним запросом
+        на дисциплину и запоминается в объекте, пока по ней считаются баллы за занятия.
+        """
+        scores = self.__dict__.setdefault("_archived_best_scores", {})
+        key = user.pk if user is not None else None
+        if key not in scores:
+            rollups = GradeRollup.objects.filter(course=self)
+            if user is not None:
+                rollups = rollups.filter(user=user)
+            scores[key] = dict(
+                rollups.values("test_id").annotate(best=models.Max("best_score")).values_list("test_id", "best"))
+        return scores[key]
+
     def get_user_average_score(self, user):
         lessons = self.lessons.filter(test__isnull=False)
         score = sum(lesson.get_test_user_best_try(user) for lesson in lessons)
@@ -55,10 +98,20 @@ class TeacherGroupSubject(models.Model):
 
 class Test(models.Model):
     name = models.CharField(max_length=128)
+    time_limit = models.PositiveIntegerField("Время на прохождение (мин)", null=True, blank=True)
+    max_attempts = models.PositiveIntegerField("Количество попыток", null=True, blank=True)
+    shuffle = models.BooleanField("Перемешивать вопросы и ответы", default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = "Тест"
         verbose_name_plural = "Тесты"
+        indexes = [
+            models.Index(Upper("name"), name="test_name_upper_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -70,38 +123,70 @@ class Test(models.Model):
                 return False
         return True
 
-    def get_question_score(self):
-        return 100 / self.questions.count()
-
-    def calculate_score(self, data, user):
-        need_check = False  # нужна ли проверка от преподавателя
-        question_score = self.get_question_score()  # максимальный балл за вопрос
-        try_score = 0  # итоговый балл
-        for question in self.questions.all():
-            if question.type == "CH":
-                answers = {}
-                for answer in question.answers.all():
-                    answers[answer.pk] = answer.correct
-                correct_choices = 0  # количетсво совпадений
-                incorrect_choices = 0
-                for ans_pk, is_correct in answers.items():
-                    if is_correct and data.get(str(ans_pk)):
-                        correct_choices += 1
-                    elif not is_correct and not data.get(str(ans_pk)):
-                        correct_choices += 1
-                    else:
-                        incorrect_choices += 1
-                ans_score = question_score * (correct_choices / len(answers)) - question_score * (incorrect_choices / len(answers))
-                if ans_score > 0:
-                    try_score += ans_score
-            elif question.type == "TX":
-                student_answer = data.get(str(question.answers.first().pk))
-                StudentAnswer.objects.create(user=user, question=question, answer=student_answer)
-                need_check = True
+    def get_question_score(self, question_ids=None):
+        # Пустая выборка оценивается по всем вопросам теста, как и при пересчете (study.regrade)
+        if question_ids:
+            return 100 / len(question_ids)
+        return 100 / max(self.questions.count(), 1)
+
+    def calculate_score(self, data, user, question_ids=None):
+        """
+        question_ids - вопросы, выпавшие студенту из банка вопросов, по умолчанию оцениваются все вопросы теста.
+        """
+        from .scoring import get_answer_key, selected_answer_ids
+
+        key = get_answer_key(self)
+        if question_ids:
+            key = key.subset(question_ids)
+        question_score = 100 / max(key.question_count, 1)  # максимальный балл за вопрос
+        try_score = key.score(selected_answer_ids(data), question_score)  # итоговый балл
+        StudentAnswer.objects.bulk_create([
+            StudentAnswer(user=user, question_id=question_pk, answer=data.get(str(answer_pk)) or "")
+            for question_pk, answer_pk in key.text_answers.items()
+        ])
+        need_check = bool(key.text_answers)  # нужна ли проверка от преподавателя
 
         return try_score, need_check
 
 
+class Topic(models.Model):
+    name = models.CharField(max_length=128)
+
+    class Meta:
+        verbose_name = "Тема"
+        verbose_name_plural = "Темы"
+        indexes = [
+            models.Index(Upper("name"), name="topic_name_upper_idx"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class TestTopicRule(models.Model):
+    """
+    Правило банка вопросов: сколько вопросов темы выпадает студенту.
+    """
+    test = models.ForeignKey(Test, related_name="topic_rules", on_delete=models.CASCADE)
+    topic = models.ForeignKey(Topic, related_name="rules", on_delete=models.CASCADE)
+    count = models.PositiveIntegerField("Количество вопросов")
+
+    class Meta:
+        verbose_name = "Правило выбора вопросов"
+        verbose_name_plural = "Правила выбора вопросов"
+        constraints = [
+            models.UniqueConstraint(fields=["test", "topic"], name="test_topic_rule_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.topic}: {self.count} ({self.test})"
+
+    def clean(self):
+        # Правило для темы без вопросов дало бы пустую выборку
+        if self.test_id and self.topic_id and not Question.objects.filter(test_id=self.test_id, topic_id=self.topic_id).exists():
+            raise ValidationError({"topic": "В тесте нет вопросов этой темы"})
+
+
 class Question(models.Model):
 
     class Type(models.TextChoices):
@@ -109,12 +194,17 @@ class Question(models.Model):
         CHOOSE = "CH", "С вариантами ответа"
 
     test = models.ForeignKey(Test, related_name="questions", on_delete=models.CASCADE)
+    topic = models.ForeignKey(Topic, related_name="questions", on_delete=models.SET_NULL, null=True, blank=True)
     type = models.CharField("Тип", max_length=32, choices=Type.choices)
     text = models.CharField(max_length=256)
 
     class Meta:
         verbose_name = "Вопрос"
         verbose_name_plural = "Вопросы"
+        indexes = [
+            models.Index(fields=["test", "topic"], name="question_test_topic_idx"),
+            models.Index(Upper("text"), name="question_text_upper_idx"),
+        ]
 
     def __str__(self):
         return f"{self.text[:20]}... ({self.test})"
@@ -134,6 +224,67 @@ class Answer(models.Model):
         return f"{self.text[:20]}... ({self.question.test})"
 
 
+def _parse_date_param(value):
+    try:
+        return parse_date(value or "")
+    except ValueError:
+        return None
+
+
+class LessonQuerySet(models.QuerySet):
+
+    ORDERING = {
+        "name": ("name", "pk"),
+        "-name": ("-name", "-pk"),
+        "type": ("type", "pk"),
+        "-type": ("-type", "-pk"),
+        "deadline": (models.F("deadline").asc(nulls_last=True), "pk"),
+        "-deadline": (models.F("deadline").desc(nulls_last=True), "-pk"),
+        "group": ("subject__group__number", "pk"),
+        "-group": ("-subject__group__number", "-pk"),
+        "subject": ("subject__subject__name", "pk"),
+        "-subject": ("-subject__subject__name", "-pk"),
+    }
+
+    def for_listing(self):
+        return self.select_related("subject__subject", "subject__group", "subject__teacher", "test")
+
+    def for_teacher(self, user):
+        return self.filter(subject__teacher=user)
+
+    def filter_by_params(self, params):
+        qs = self
+
+        l_type = params.get("type")
+        if l_type in self.model.Type.values:
+            qs = qs.filter(type=l_type)
+
+        group = params.get("group")
+        if group and group.isdigit():
+            qs = qs.filter(subject__group_id=group)
+
+        subject = params.get("subject_pk")
+        if subject and subject.isdigit():
+            qs = qs.filter(subject_id=subject)
+
+        deadline_from = _parse_date_param(params.get("deadline_from"))
+        if deadline_from:
+            qs = qs.filter(deadline__date__gte=deadline_from)
+
+        deadline_to = _parse_date_param(params.get("deadline_to"))
+        if deadline_to:
+            qs = qs.filter(deadline__date__lte=deadline_to)
+
+        has_deadline = params.get("has_deadline")
+        if has_deadline in ("0", "1"):
+            qs = qs.filter(deadline__isnull=has_deadline == "0")
+
+        return qs
+
+    def ordered_by_param(self, ordering):
+        return self.order_by(*self.ORDERING.get(ordering, ("pk", )))
+
+
 class Lesson(models.Model):
 
     class Type(models.TextChoices):
@@ -149,22 +300,43 @@ class Lesson(models.Model):
     test = models.OneToOneField(Test, on_delete=models.SET_NULL, null=True, blank=True)
     text = models.TextField(null=True, blank=True)
     deadline = models.DateTimeField(null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager.from_queryset(LessonQuerySet)()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = "Занятие"
         verbose_name_plural = "Занятия"
+        indexes = [
+            models.Index(fields=["subject", "deadline"], name="lesson_subject_deadline_idx"),
+            models.Index(Upper("name"), name="lesson_name_upper_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.get_type_display()})"
 
+    def _archived_best(self, user=None):
+        # Попытки могли быть перенесены в архив (study.archival), там остаются итоги - и после
+        # повторного открытия дисциплины, пока архив не восстановлен
+        if not self.test_id or not self.subject_id:
+            return None
+        return self.subject.archived_best_scores(user).get(self.test_id)
+
     def get_test_best_try(self):
         tries = [try_.score for try_ in Try.objects.filter(test=self.test)]
+        archived = self._archived_best()
+        if archived is not None:
+            tries.append(archived)
         if tries:
             return max(tries)
         return 0
 
     def get_test_user_best_try(self, user):
         tries = [try_.score for try_ in Try.objects.filter(test=self.test, user=user)]
+        archived = self._archived_best(user=user)
+        if archived is not None:
+            tries.append(archived)
         if tries:
             return max(tries)
         return 0
@@ -172,9 +344,7 @@ class Lesson(models.Model):
     def is_late(self):
         if not self.deadline:
             return False
-        utc = pytz.UTC
-        now = utc.localize(dt.now())
-        if now > self.deadline:
+        if timezone.now() > self.deadline:
             return True  # уже поздно
         return False
 
@@ -220,6 +390,9 @@ class Try(models.Model):
     test = models.ForeignKey(Test, related_name="users_tries", on_delete=models.CASCADE)
     score = models.FloatField()
     need_check = models.BooleanField(default=False)
+    question_ids = models.JSONField(null=True, blank=True)  # вопросы из банка, выпавшие в этой попытке
+    selections = models.JSONField(null=True, blank=True)  # отмеченные варианты ответа, для пересчета баллов
+    choice_score = models.FloatField(null=True, blank=True)  # баллы за вопросы с вариантами ответа
 
     class Meta:
         verbose_name = "Попытка"
@@ -229,7 +402,7 @@ class Try(models.Model):
         return f"[{self.score}]{self.user} ({self.test})"
 
     def checking(self, data):
-        question_score = self.test.get_question_score()  # максимальеый балл за вопрос
+        question_score = self.test.get_question_score(self.question_ids)  # максимальеый балл за вопрос
         checking_score = 0  # баллы за проверку
 
         for answer in self.students_answers.all():
@@ -254,6 +427,64 @@ class StudentAnswer(models.Model):
         return f"{self.answer[:10]}... ({self.question.test})"
 
 
+class QuestionResult(models.Model):
+    """
+    Результат попытки по вопросу с вариантами ответа: доля максимального балла от 0 до 1.
+    """
+    student_try = models.ForeignKey(Try, related_name="question_results", on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, related_name="results", on_delete=models.CASCADE)
+    score = models.FloatField()
+
+    class Meta:
+        verbose_name = "Результат по вопросу"
+        verbose_name_plural = "Результаты по вопросам"
+
+
+class QuestionStats(models.Model):
+    """
+    Накопленные суммы по результатам вопроса: x - доля балла за вопрос, y - балл попытки без этого вопроса.
+    Обновляются при каждой сдаче, чтобы анализ вопросов не читал все попытки.
+    """
+    question = models.OneToOneField(Question, related_name="stats", on_delete=models.CASCADE, primary_key=True)
+    attempts = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)  # Σx
+    score_sq_sum = models.FloatField(default=0)  # Σx²
+    rest_sum = models.FloatField(default=0)  # Σy
+    rest_sq_sum = models.FloatField(default=0)  # Σy²
+    cross_sum = models.FloatField(default=0)  # Σxy
+
+    class Meta:
+        verbose_name = "Статистика вопроса"
+        verbose_name_plural = "Статистика вопросов"
+
+    def __str__(self):
+        return f"{self.question}: {self.attempts}"
+
+    @property
+    def mean_score(self):
+        return self.score_sum / self.attempts if self.attempts else None
+
+    @property
+    def discrimination(self):
+        """
+        Корреляция результата по вопросу с баллом за остальные вопросы (исправленная точечно-бисериальная).
+        """
+        n = self.attempts
+        variance = (n * self.score_sq_sum - self.score_sum ** 2) * (n * self.rest_sq_sum - self.rest_sum ** 2)
+        if n < 2 or variance <= 1e-9:
+            return None
+        return (n * self.cross_sum - self.score_sum * self.rest_sum) / variance ** 0.5
+
+
+class AnswerStats(models.Model):
+    answer = models.OneToOneField(Answer, related_name="stats", on_delete=models.CASCADE, primary_key=True)
+    selected = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Статистика варианта ответа"
+        verbose_name_plural = "Статистика вариантов ответа"
+
+
 class StudentIndividualWork(models.Model):
 
     file = models.FileField(upload_to="lessons/students-works/")
@@ -267,3 +498,177 @@ class StudentIndividualWork(models.Model):
 
     def __str__(self):
         return f"{self.user} - {self.lesson.name}"
+
+
+class ExamSession(models.Model):
+    user = models.ForeignKey(User, related_name="exam_sessions", on_delete=models.CASCADE)
+    test = models.ForeignKey(Test, related_name="exam_sessions", on_delete=models.CASCADE)
+    started_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    draft = models.JSONField(default=dict, blank=True)
+    question_ids = models.JSONField(null=True, blank=True)
+    draft_updated_at = models.DateTimeField(null=True, blank=True)
+    student_try = models.OneToOneField(Try, related_name="exam_session", on_delete=models.SET_NULL, null=True, blank=True)
+    autosubmitted = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "Сессия теста"
+        verbose_name_plural = "Сессии тестов"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "test"], condition=models.Q(finished_at__isnull=True), name="exam_session_one_active",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["finished_at", "expires_at"], name="exam_session_expiry_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} ({self.test})"
+
+    @property
+    def is_finished(self):
+        return self.finished_at is not None
+
+    def remaining_seconds(self):
+        if not self.expires_at:
+            return None
+        return max(int((self.expires_at - timezone.now()).total_seconds()), 0)
+
+
+class SearchEntry(models.Model):
+    """
+    Строка поискового индекса. Слова хранятся приведенными к основе (study.stemmer), полнотекстовый
+    индекс над ними создается миграцией: FTS5 в SQLite или tsvector в PostgreSQL.
+    """
+
+    class Kind(models.TextChoices):
+        LESSON = "lesson", "Занятие"
+        TEST = "test", "Тест"
+        QUESTION = "question", "Вопрос"
+        SUBJECT = "subject", "Дисциплина"
+        COURSE = "course", "Дисциплина группы"
+
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    object_id = models.PositiveBigIntegerField()
+    parent_id = models.PositiveBigIntegerField(null=True)  # тест вопроса или дисциплина дисциплины группы
+    title = models.CharField(max_length=256)
+    title_terms = models.TextField(blank=True)
+    body_terms = models.TextField(blank=True)
+    scope_group = models.PositiveBigIntegerField(null=True)  # группа, студентам которой видна запись
+
+    class Meta:
+        verbose_name = "Запись поискового индекса"
+        verbose_name_plural = "Поисковый индекс"
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="search_entry_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["scope_group", "kind"]),
+        ]
+
+
+class Job(models.Model):
+    """
+    Фоновая задача. Выполняется в потоке веб-процесса или командой run_jobs (study.jobs),
+    done/total - прогресс для страницы задачи. heartbeat_at обновляется при каждом шаге: задачу,
+    которая давно не делала шагов (процесс перезапустили), забирают заново и продолжают с checkpoint.
+    """
+
+    class Kind(models.TextChoices):
+        COURSE_CLONE = "course_clone", "Копирование занятий дисциплины"
+        DELETE = "delete", "Удаление"
+        ARCHIVE = "archive", "Архивация попыток"
+        RESTORE = "restore", "Восстановление попыток из архива"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "В очереди"
+        RUNNING = "running", "Выполняется"
+        DONE = "done", "Выполнена"
+        FAILED = "failed", "Ошибка"
+
+    kind = models.CharField(max_length=32, choices=Kind.choices)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    params = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    done = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    created_by = models.ForeignKey(User, related_name="jobs", on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    checkpoint = models.JSONField(null=True, blank=True)  # что уже сделано, для продолжения после перезапуска
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.DONE, self.Status.FAILED)
+
+    @property
+    def percent(self):
+        if self.status == self.Status.DONE:
+            return 100
+        return int(self.done * 100 / self.total) if self.total else 0
+
+    def as_dict(self):
+        return {
+            "id": self.pk, "kind": self.kind, "status": self.status, "done": self.done, "total": self.total,
+            "percent": self.percent, "result": self.result, "error": self.error,
+        }
+
+
+class ArchiveBatch(models.Model):
+    """
+    Порция попыток закрытой дисциплины группы, перенесенная из Try, StudentAnswer и QuestionResult:
+    JSON Lines (попытка с ответами и результатами по вопросам на строку), сжатые gzip (study.archival).
+    """
+    course = models.ForeignKey(TeacherGroupSubject, related_name="archive_batches", on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    try_count = models.PositiveIntegerField(default=0)
+    answer_count = models.PositiveIntegerField(default=0)
+    data = models.BinaryField()
+
+    class Meta:
+        verbose_name = "Архив попыток"
+        verbose_name_plural = "Архивы попыток"
+
+    def __str__(self):
+        return f"{self.course} ({self.try_count} попыток)"
+
+
+class GradeRollup(models.Model):
+    """
+    Итог архивированных попыток студента по тесту. Названия хранятся копией, чтобы ведомость
+    читалась и после удаления теста.
+    """
+    batch = models.ForeignKey(ArchiveBatch, related_name="rollups", on_delete=models.CASCADE)
+    course = models.ForeignKey(TeacherGroupSubject, related_name="grade_rollups", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name="grade_rollups", on_delete=models.CASCADE)
+    test_id = models.PositiveBigIntegerField()
+    test_name = models.CharField(max_length=128)
+    lesson_name = models.CharField(max_length=128, blank=True)
+    attempts = models.PositiveIntegerField()
+    best_score = models.FloatField()
+    last_score = models.FloatField()
+
+    class Meta:
+        verbose_name = "Итог архивированных попыток"
+        verbose_name_plural = "Итоги архивированных попыток"
+        indexes = [
+            models.Index(fields=["user", "course"], name="grade_rollup_user_idx"),
+            models.Index(fields=["test_id", "user"], name="grade_rollup_test_idx"),
+            models.Index(Upper("test_name"), name="rollup_test_name_upper_idx"),
+        ]
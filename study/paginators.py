@@ -0,0 +1,36 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц. Число строк всей таблицы берется из статистики PostgreSQL,
+    а при фильтрах или на других базах строки считаются только до COUNT_LIMIT.
+    """
+
+    COUNT_LIMIT = 10000
+    ESTIMATE_THRESHOLD = 100000  # меньшие таблицы быстрее посчитать точно
+
+    def estimate(self):
+        queryset = self.object_list
+        query = getattr(queryset, "query", None)
+        if query is None or query.where or query.distinct:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] > self.ESTIMATE_THRESHOLD else None
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate()
+        if estimate is not None:
+            return estimate
+        queryset = self.object_list
+        if not hasattr(queryset, "query"):
+            return len(queryset)
+        return queryset.order_by()[:self.COUNT_LIMIT].count()
@@ -0,0 +1,114 @@
+"""
+Пересчет баллов попыток после изменения ключа ответов теста. Попытки читаются порциями по pk,
+баллы считаются пакетно через AnswerKey, изменения записываются через bulk_update в одной транзакции.
+Баллы за проверенные преподавателем текстовые ответы сохраняются: меняется только choice_score.
+"""
+import heapq
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from .cache import invalidate_tags
+from .deadlines import user_tag
+from .items import rebuild_item_stats, tries_in_chunks
+from .models import Try
+
+CHUNK_SIZE = 2000
+TOP_CHANGES = 10
+EPSILON = 1e-6
+
+
+@dataclass
+class RegradeReport:
+    test: int
+    tries: int = 0
+    changed: int = 0
+    skipped: int = 0  # попытки, сохраненные до появления отметок вариантов
+    increased: int = 0
+    decreased: int = 0
+    total_delta: float = 0
+    min_delta: float = 0
+    max_delta: float = 0
+    dry_run: bool = False
+    largest: list = field(default_factory=list)  # куча (|изменение|, pk, user_id, старый балл, новый балл)
+
+    def add(self, pk, user_id, old_score, new_score):
+        delta = new_score - old_score
+        self.tries += 1
+        if abs(delta) <= EPSILON:
+            return False
+        self.changed += 1
+        self.increased += delta > 0
+        self.decreased += delta < 0
+        self.total_delta += delta
+        self.min_delta = min(self.min_delta, delta)
+        self.max_delta = max(self.max_delta, delta)
+        item = (abs(delta), pk, user_id, old_score, new_score)
+        if len(self.largest) < TOP_CHANGES:
+            heapq.heappush(self.largest, item)
+        else:
+            heapq.heappushpop(self.largest, item)
+        return True
+
+    def as_dict(self):
+        return {
+            "test": self.test,
+            "dry_run": self.dry_run,
+            "tries": self.tries,
+            "changed": self.changed,
+            "skipped": self.skipped,
+            "increased": self.increased,
+            "decreased": self.decreased,
+            "mean_delta": round(self.total_delta / self.changed, 4) if self.changed else 0,
+            "min_delta": round(self.min_delta, 4),
+            "max_delta": round(self.max_delta, 4),
+            "largest": [
+                {"try": pk, "user": user_id, "old_score": round(old, 4), "new_score": round(new, 4)}
+                for _, pk, user_id, old, new in sorted(self.largest, reverse=True)
+            ],
+        }
+
+
+def regrade_test(test, chunk_size=CHUNK_SIZE, dry_run=False):
+    """
+    Пересчитывает баллы всех попыток теста по текущему ключу ответов. С dry_run изменения не записываются.
+    """
+    import numpy as np
+
+    from .scoring import AnswerKey
+
+    key = AnswerKey.build(test)
+    report = RegradeReport(test=test.pk, dry_run=dry_run)
+    changed_users = set()
+    with transaction.atomic():
+        fields = ("user_id", "score", "choice_score", "selections", "question_ids")
+        for chunk in tries_in_chunks(test, fields, chunk_size):
+            rows = [row for row in chunk if row[3] is not None and row[4] is not None]
+            report.skipped += len(chunk) - len(rows)
+            if not rows:
+                continue
+            question_scores = np.array(
+                [100 / len(row[5]) if row[5] else 100 / max(key.question_count, 1) for row in rows])
+            choice_scores = key.score_batch(
+                key.selection_matrix([row[4] for row in rows]), question_scores,
+                key.drawn_matrix([row[5] for row in rows]))
+
+            changed = []
+            for (pk, user_id, score, old_choice, _, _), choice_score in zip(rows, choice_scores.tolist()):
+                new_score = score - old_choice + choice_score
+                if report.add(pk, user_id, score, new_score):
+                    changed.append(Try(pk=pk, score=new_score, choice_score=choice_score))
+                    changed_users.add(user_id)
+            if changed and not dry_run:
+                Try.objects.bulk_update(changed, ["score", "choice_score"])
+
+        if report.changed and not dry_run:
+            rebuild_item_stats(test, key, chunk_size)
+        if changed_users and not dry_run:
+            # bulk_update не вызывает post_save, кэш оценок студентов сбрасывается здесь
+            transaction.on_commit(lambda: invalidate_tags(*(user_tag(user_id) for user_id in changed_users)))
+    return report
+
+
+def has_regradable_tries(test_id):
+    return Try.objects.filter(test_id=test_id, selections__isnull=False).exists()
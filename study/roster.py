@@ -0,0 +1,170 @@
+"""
+Массовые операции со списками групп. Студент состоит не больше чем в одной группе, поэтому
+добавление в группу убирает его из прежней. Все изменения делаются запросами к промежуточной
+таблице Group.students.through без загрузки списков групп в память.
+"""
+import csv
+import io
+from dataclasses import dataclass, field
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from accounts.authentication import principal_tag
+from accounts.models import Profile
+from .cache import invalidate_tags
+from .deadlines import user_tag
+from .models import Group
+
+Membership = Group.students.through
+
+
+class RosterError(Exception):
+    pass
+
+
+@dataclass
+class RosterResult:
+    added: int = 0
+    moved: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    unknown: list = field(default_factory=list)  # номера или email, которые не найдены среди студентов
+
+    def as_dict(self):
+        return {
+            "added": self.added,
+            "moved": self.moved,
+            "removed": self.removed,
+            "unchanged": self.unchanged,
+            "unknown": self.unknown,
+        }
+
+
+def _student_ids(values):
+    values = {int(value) for value in values if str(value).isdigit()}
+    found = set(
+        User.objects.filter(pk__in=values, profile__type=Profile.Type.STUDENT).values_list("pk", flat=True))
+    return found, sorted(values - found)
+
+
+def _changed(student_ids):
+    # Группа студента хранится и в кэше аутентификации по токену
+    transaction.on_commit(lambda: invalidate_tags(
+        *(user_tag(pk) for pk in student_ids), *(principal_tag(pk) for pk in student_ids)))
+
+
+def is_member(group, user):
+    return Membership.objects.filter(group=group, user=user).exists()
+
+
+def set_student_group(user, group):
+    """
+    Переводит одного студента в группу или убирает из всех групп, если group is None.
+    """
+    with transaction.atomic():
+        if group is not None and is_member(group, user):
+            return False
+        Membership.objects.filter(user=user).delete()
+        if group is not None:
+            Membership.objects.create(group=group, user=user)
+        _changed([user.pk])
+    return True
+
+
+def _place(group, student_ids, result):
+    current = dict(Membership.objects.filter(user_id__in=student_ids).values_list("user_id", "group_id"))
+    elsewhere = [pk for pk, group_id in current.items() if group_id != group.pk]
+    Membership.objects.filter(user_id__in=elsewhere).delete()
+    new = [pk for pk in student_ids if current.get(pk) != group.pk]
+    Membership.objects.bulk_create([Membership(group_id=group.pk, user_id=pk) for pk in new])
+    result.moved += len(elsewhere)
+    result.added += len(new) - len(elsewhere)
+    result.unchanged += len(student_ids) - len(new)
+    _changed(new)
+
+
+@transaction.atomic
+def add_students(group, values):
+    student_ids, unknown = _student_ids(values)
+    result = RosterResult(unknown=unknown)
+    _place(group, student_ids, result)
+    return result
+
+
+@transaction.atomic
+def remove_students(group, values):
+    student_ids, unknown = _student_ids(values)
+    result = RosterResult(unknown=unknown)
+    removed = list(Membership.objects.filter(group=group, user_id__in=student_ids).values_list("user_id", flat=True))
+    Membership.objects.filter(group=group, user_id__in=removed).delete()
+    result.removed = len(removed)
+    result.unchanged = len(student_ids) - len(removed)
+    _changed(removed)
+    return result
+
+
+@transaction.atomic
+def move_students(source, target, values=None):
+    """
+    Переводит студентов группы source в target; без values - всю группу целиком.
+    """
+    if source.pk == target.pk:
+        raise RosterError("Группы перевода совпадают")
+    memberships = Membership.objects.filter(group=source)
+    result = RosterResult()
+    if values is not None:
+        student_ids, result.unknown = _student_ids(values)
+        memberships = memberships.filter(user_id__in=student_ids)
+    moved = list(memberships.values_list("user_id", flat=True))
+    # Дубликатов в target быть не может: студент состоит только в одной группе
+    result.moved = Membership.objects.filter(group=source, user_id__in=moved).update(group=target)
+    if values is not None:
+        result.unchanged = len(student_ids) - result.moved
+    _changed(moved)
+    return result
+
+
+def _decode_csv(content):
+    for encoding in ("utf-8-sig", "cp1251"):
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise RosterError("Файл должен быть в кодировке UTF-8 или Windows-1251")
+
+
+def read_roster_csv(file):
+    """
+    Email студентов из CSV: колонка email (или первая колонка, если заголовка нет), разделитель , или ;.
+    Кодировка UTF-8 или Windows-1251 (так сохраняет CSV русский Excel).
+    """
+    content = file.read()
+    if isinstance(content, bytes):
+        content = _decode_csv(content)
+    lines = content.splitlines()
+    if not lines:
+        return []
+    delimiter = ";" if lines[0].count(";") > lines[0].count(",") else ","
+    rows = [row for row in csv.reader(io.StringIO(content), delimiter=delimiter) if any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = header.index("email") if "email" in header else 0
+    if "email" in header or "@" not in rows[0][column]:
+        rows = rows[1:]
+    return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+
+
+@transaction.atomic
+def import_roster(group, file):
+    """
+    Добавляет в группу студентов из CSV по email (он же логин). Ненайденные адреса возвращаются
+    в unknown: новые учетные записи создаются как обычно, с отправкой пароля на почту.
+    """
+    emails = read_roster_csv(file)
+    found = dict(
+        User.objects.filter(username__in=emails, profile__type=Profile.Type.STUDENT).values_list("username", "pk"))
+    result = RosterResult(unknown=sorted(set(emails) - set(found)))
+    _place(group, set(found.values()), result)
+    return result
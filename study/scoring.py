@@ -0,0 +1,159 @@
+"""
+Оценивание вопросов с вариантами ответа на NumPy. Ключ теста хранится упакованными массивами:
+номера вариантов и их правильность подряд по вопросам и смещения начала каждого вопроса.
+
+Балл за вопрос из n вариантов, в котором c вариантов отмечены верно (правильный отмечен или
+неправильный не отмечен): question_score * (c - (n - c)) / n, отрицательный балл не засчитывается.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .cache import CacheNamespace, get_version
+from .models import Question
+
+key_cache = CacheNamespace("scoring", timeout=60 * 60 * 24)
+
+
+@dataclass
+class AnswerKey:
+    question_ids: np.ndarray  # вопросы с вариантами ответа, у которых есть варианты
+    offsets: np.ndarray  # начало вариантов каждого вопроса в answer_ids, длина - вопросов + 1
+    answer_ids: np.ndarray
+    correct: np.ndarray
+    text_answers: dict  # {pk текстового вопроса: pk ответа, в который пишет студент}
+    question_count: int  # все вопросы теста, включая текстовые и вопросы без вариантов
+
+    @classmethod
+    def build(cls, test):
+        question_ids, offsets, answer_ids, correct = [], [], [], []
+        text_answers = {}
+        question_count = 0
+        rows = (
+            Question.objects.filter(test=test)
+            .order_by("pk", "answers__pk")
+            .values_list("pk", "type", "answers__pk", "answers__correct")
+        )
+        previous = None
+        for question_id, question_type, answer_id, is_correct in rows:
+            if question_id != previous:
+                previous = question_id
+                question_count += 1
+                if question_type == Question.Type.TEXT:
+                    text_answers[question_id] = answer_id
+                elif answer_id is not None:
+                    question_ids.append(question_id)
+                    offsets.append(len(answer_ids))
+            if question_type == Question.Type.CHOOSE and answer_id is not None:
+                answer_ids.append(answer_id)
+                correct.append(is_correct)
+        offsets.append(len(answer_ids))
+        return cls(
+            question_ids=np.array(question_ids, dtype=np.int64),
+            offsets=np.array(offsets, dtype=np.int64),
+            answer_ids=np.array(answer_ids, dtype=np.int64),
+            correct=np.array(correct, dtype=bool),
+            text_answers=text_answers,
+            question_count=question_count,
+        )
+
+    @property
+    def sizes(self):
+        return np.diff(self.offsets)
+
+    def subset(self, question_ids):
+        """
+        Ключ только для вопросов, выпавших студенту из банка вопросов.
+        """
+        wanted = set(question_ids)
+        keep = np.array([pk in wanted for pk in self.question_ids.tolist()], dtype=bool)
+        answer_mask = np.repeat(keep, self.sizes)
+        sizes = self.sizes[keep]
+        return AnswerKey(
+            question_ids=self.question_ids[keep],
+            offsets=np.concatenate(([0], np.cumsum(sizes))).astype(np.int64),
+            answer_ids=self.answer_ids[answer_mask],
+            correct=self.correct[answer_mask],
+            text_answers={pk: answer for pk, answer in self.text_answers.items() if pk in wanted},
+            question_count=len(wanted),
+        )
+
+    def selections(self, selected_ids):
+        """
+        Булев массив отмеченных вариантов в порядке ключа.
+        """
+        selected_ids = np.fromiter(selected_ids, dtype=np.int64)
+        return np.isin(self.answer_ids, selected_ids)
+
+    def selection_matrix(self, submissions):
+        """
+        Матрица отмеченных вариантов для пакета попыток: строка - попытка, столбец - вариант ключа.
+        Варианты, которых больше нет в ключе, отбрасываются.
+        """
+        matrix = np.zeros((len(submissions), len(self.answer_ids)), dtype=bool)
+        if not len(self.answer_ids):
+            return matrix
+        order = np.argsort(self.answer_ids)
+        sorted_ids = self.answer_ids[order]
+        for row, selected_ids in enumerate(submissions):
+            selected_ids = np.fromiter(selected_ids, dtype=np.int64)
+            positions = np.searchsorted(sorted_ids, selected_ids)
+            found = positions < len(sorted_ids)
+            positions, selected_ids = positions[found], selected_ids[found]
+            positions = positions[sorted_ids[positions] == selected_ids]
+            matrix[row, order[positions]] = True
+        return matrix
+
+    def drawn_matrix(self, question_id_lists):
+        """
+        Какие вопросы ключа выпадали в каждой попытке; None - попытка по всем вопросам теста.
+        """
+        drawn = np.ones((len(question_id_lists), len(self.question_ids)), dtype=bool)
+        for row, question_ids in enumerate(question_id_lists):
+            if question_ids is not None:
+                drawn[row] = np.isin(self.question_ids, np.fromiter(question_ids, dtype=np.int64))
+        return drawn
+
+    def question_ratios(self, matrix, drawn=None):
+        """
+        Доля максимального балла за каждый вопрос ключа: строка - попытка, столбец - вопрос.
+        """
+        matrix = np.atleast_2d(matrix)
+        matches = (matrix == self.correct).astype(np.int64)
+        correct_choices = np.add.reduceat(matches, self.offsets[:-1], axis=1)
+        sizes = self.sizes
+        ratios = np.clip((2 * correct_choices - sizes) / sizes, 0, None)
+        if drawn is not None:
+            ratios = ratios * drawn
+        return ratios
+
+    def score_batch(self, matrix, question_score, drawn=None):
+        """
+        Баллы за вопросы с вариантами ответа для каждой строки матрицы отмеченных вариантов.
+        question_score - число или массив максимальных баллов за вопрос для каждой строки.
+        """
+        matrix = np.atleast_2d(matrix)
+        if not len(self.question_ids):
+            return np.zeros(matrix.shape[0])
+        return self.question_ratios(matrix, drawn).sum(axis=1) * question_score
+
+    def score(self, selected_ids, question_score):
+        return float(self.score_batch(self.selections(selected_ids), question_score)[0])
+
+    def selected(self, selected_ids):
+        """
+        Отмеченные варианты, которые есть в ключе, - сохраняются в попытке для пересчета баллов.
+        """
+        return self.answer_ids[self.selections(selected_ids)].tolist()
+
+
+def get_answer_key(test):
+    version = get_version("test", test.pk)
+    return key_cache.get_or_set(test.pk, version, default=lambda: AnswerKey.build(test))
+
+
+def selected_answer_ids(data):
+    """
+    Номера отмеченных вариантов из данных формы или JSON попытки.
+    """
+    return [int(key) for key, value in data.items() if value and str(key).isdigit()]
@@ -0,0 +1,244 @@
+"""
+Полнотекстовый поиск по занятиям, тестам, вопросам и дисциплинам. Тексты приводятся к основе
+стеммером (study.stemmer) и хранятся в SearchEntry, индекс над ними ведет база: FTS5 в SQLite,
+tsvector в PostgreSQL, на остальных базах ищется вхождение основ. Записи обновляются сигналами,
+rebuild_index строит индекс заново.
+"""
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.urls import reverse
+
+from accounts.models import Profile
+from .models import Lesson, Question, SearchEntry, Subject, TeacherGroupSubject, Test
+from .stemmer import tokenize
+
+Kind = SearchEntry.Kind
+
+LIMIT = 20
+MAX_LIMIT = 50
+MAX_TERMS = 8
+BATCH_SIZE = 2000
+CANDIDATES = 5000
+# Совпадение в названии весит больше, чем в тексте
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+# Студенты видят занятия, тесты и дисциплины своей группы, остальные - все, кроме дисциплин групп
+STUDENT_KINDS = (Kind.LESSON, Kind.TEST, Kind.COURSE)
+STAFF_KINDS = (Kind.LESSON, Kind.TEST, Kind.QUESTION, Kind.SUBJECT)
+
+
+def _terms(*texts):
+    return " ".join(term for text in texts for term in tokenize(text))
+
+
+def _entry(kind, pk, title, body="", parent_id=None, scope_group=None):
+    return SearchEntry(
+        kind=kind, object_id=pk, parent_id=parent_id, title=title[:256], title_terms=_terms(title),
+        body_terms=_terms(body), scope_group=scope_group,
+    )
+
+
+def _lesson_entries(pks):
+    rows = Lesson.objects.filter(pk__in=pks).values_list("pk", "name", "text", "subject__group_id")
+    return [_entry(Kind.LESSON, pk, name, text, scope_group=group_id) for pk, name, text, group_id in rows]
+
+
+def _test_entries(pks):
+    # Тест виден группе своего занятия, ссылка для студента ведет на занятие
+    rows = Test.objects.filter(pk__in=pks).values_list("pk", "name", "lesson__pk", "lesson__subject__group_id")
+    return [
+        _entry(Kind.TEST, pk, name, parent_id=lesson_id, scope_group=group_id)
+        for pk, name, lesson_id, group_id in rows
+    ]
+
+
+def _question_entries(pks):
+    rows = Question.objects.filter(pk__in=pks).values_list("pk", "text", "test_id")
+    return [_entry(Kind.QUESTION, pk, text, parent_id=test_id) for pk, text, test_id in rows]
+
+
+def _subject_entries(pks):
+    return [_entry(Kind.SUBJECT, pk, name) for pk, name in Subject.objects.filter(pk__in=pks).values_list("pk", "name")]
+
+
+def _course_entries(pks):
+    rows = TeacherGroupSubject.objects.filter(pk__in=pks).values_list("pk", "subject__name", "subject_id", "group_id")
+    return [
+        _entry(Kind.COURSE, pk, name, parent_id=subject_id, scope_group=group_id)
+        for pk, name, subject_id, group_id in rows
+    ]
+
+
+BUILDERS = {
+    Kind.LESSON: (Lesson, _lesson_entries),
+    Kind.TEST: (Test, _test_entries),
+    Kind.QUESTION: (Question, _question_entries),
+    Kind.SUBJECT: (Subject, _subject_entries),
+    Kind.COURSE: (TeacherGroupSubject, _course_entries),
+}
+
+
+def index_objects(kind, pks, replace=True):
+    """
+    Перестраивает записи объектов одного вида. Записи удаленных объектов просто удаляются.
+    replace=False - записей у объектов еще нет (объекты только что созданы), удалять нечего.
+    """
+    pks = list({pk for pk in pks if pk is not None})
+    for start in range(0, len(pks), BATCH_SIZE):
+        batch = pks[start:start + BATCH_SIZE]
+        entries = BUILDERS[kind][1](batch)
+        if not replace:
+            SearchEntry.objects.bulk_create(entries)
+            continue
+        with transaction.atomic():
+            SearchEntry.objects.filter(kind=kind, object_id__in=batch).delete()
+            SearchEntry.objects.bulk_create(entries)
+
+
+def rebuild_index(batch_size=BATCH_SIZE):
+    """
+    Строит индекс заново по всем объектам, возвращает число записей по видам.
+    """
+    counts = {}
+    with transaction.atomic():
+        SearchEntry.objects.all().delete()
+        for kind, (model, build) in BUILDERS.items():
+            counts[kind] = 0
+            last_pk = 0
+            while True:
+                pks = list(model.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size])
+                if not pks:
+                    break
+                entries = build(pks)
+                SearchEntry.objects.bulk_create(entries)
+                counts[kind] += len(entries)
+                last_pk = pks[-1]
+    return counts
+
+
+def query_terms(text):
+    terms = []
+    for term in tokenize(text):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def _scope(user):
+    """
+    Виды записей и группа, которыми ограничен поиск пользователя. None - пользователю не видно ничего.
+    """
+    if not user.is_authenticated:
+        return None
+    profile = getattr(user, "profile", None)
+    if profile is None or profile.type != Profile.Type.STUDENT:
+        return STAFF_KINDS, None
+    group_id = getattr(user, "study_group_id", None) or user.group_set.values_list("pk", flat=True).first()
+    if group_id is None:
+        return None
+    return STUDENT_KINDS, group_id
+
+
+def _sqlite_search(terms, kinds, group_id, limit):
+    # Слова запроса и индекса уже приведены к основе, поэтому совпадение точное, а не по префиксу
+    match = "{title_terms body_terms} : (" + " ".join(f'"{term}"' for term in terms) + ")"
+    kinds_sql = ", ".join(["%s"] * len(kinds))
+    if group_id is not None:
+        # Группа записи проиндексирована в колонке scope_terms, bm25 считается только для записей группы
+        sql = (
+            "SELECT e.* FROM study_search_fts JOIN study_searchentry e ON e.id = study_search_fts.rowid "
+            f"WHERE study_search_fts MATCH %s AND e.kind IN ({kinds_sql}) "
+            f"ORDER BY bm25(study_search_fts, {TITLE_WEIGHT}, {BODY_WEIGHT}, 0.0) LIMIT %s"
+        )
+        params = [f"{match} AND scope_terms : group{int(group_id)}", *kinds, limit]
+    else:
+        # Частое слово совпадает почти со всеми записями, ранжируются только CANDIDATES последних из них
+        sql = (
+            f"SELECT e.* FROM (SELECT rowid AS id, bm25(study_search_fts, {TITLE_WEIGHT}, {BODY_WEIGHT}, 0.0) AS score "
+            "FROM study_search_fts WHERE study_search_fts MATCH %s ORDER BY rowid DESC LIMIT %s) hits "
+            f"JOIN study_searchentry e ON e.id = hits.id WHERE e.kind IN ({kinds_sql}) ORDER BY hits.score LIMIT %s"
+        )
+        params = [match, CANDIDATES, *kinds, limit]
+    return list(SearchEntry.objects.raw(sql, params))
+
+
+def _postgresql_search(terms, kinds, group_id, limit):
+    query = " & ".join(terms)
+    sql = (
+        "SELECT e.* FROM study_searchentry e, to_tsquery('simple', %s) query "
+        f"WHERE e.document @@ query AND e.kind IN ({', '.join(['%s'] * len(kinds))})"
+    )
+    params = [query, *kinds]
+    if group_id is not None:
+        sql += " AND e.scope_group = %s"
+        params.append(group_id)
+    sql += " ORDER BY ts_rank(e.document, query) DESC, e.id LIMIT %s"
+    return list(SearchEntry.objects.raw(sql, [*params, limit]))
+
+
+def _fallback_search(terms, kinds, group_id, limit):
+    queryset = SearchEntry.objects.filter(kind__in=kinds)
+    if group_id is not None:
+        queryset = queryset.filter(scope_group=group_id)
+    for term in terms:
+        queryset = queryset.filter(Q(title_terms__icontains=term) | Q(body_terms__icontains=term))
+    return list(queryset.order_by("title", "pk")[:limit])
+
+
+BACKENDS = {
+    "sqlite": _sqlite_search,
+    "postgresql": _postgresql_search,
+}
+
+
+@dataclass
+class SearchResult:
+    kind: str
+    kind_label: str
+    id: int
+    title: str
+    url: str
+
+    def as_dict(self):
+        return {"kind": self.kind, "id": self.id, "title": self.title, "url": self.url}
+
+
+def _url(entry, profile_type):
+    kind, pk, parent_id = entry.kind, entry.object_id, entry.parent_id
+    if profile_type == Profile.Type.STUDENT:
+        if kind == Kind.LESSON:
+            return reverse("student-lesson", kwargs={"pk": pk})
+        if kind == Kind.TEST:
+            return reverse("student-lesson", kwargs={"pk": parent_id})
+        return reverse("student-subject", kwargs={"pk": pk})
+
+    teacher = profile_type == Profile.Type.TEACHER
+    if kind == Kind.LESSON:
+        return reverse("my-lesson" if teacher else "lesson", kwargs={"pk": pk})
+    if kind == Kind.TEST:
+        return reverse("test", kwargs={"pk": pk})
+    if kind == Kind.QUESTION:
+        return reverse("test-question", kwargs={"test_pk": parent_id, "question_pk": pk})
+    return reverse("my-subject" if teacher else "subject", kwargs={"pk": pk})
+
+
+def search(user, text, limit=LIMIT):
+    """
+    Записи индекса, подходящие под все слова запроса, по убыванию релевантности (совпадение
+    в названии весит больше, чем в тексте) с учетом того, что пользователю можно видеть.
+    """
+    terms = query_terms(text)
+    scope = _scope(user)
+    if not terms or scope is None:
+        return []
+    kinds, group_id = scope
+    entries = BACKENDS.get(connection.vendor, _fallback_search)(terms, kinds, group_id, limit)
+
+    profile_type = user.profile.type if getattr(user, "profile", None) else None
+    return [
+        SearchResult(entry.kind, entry.get_kind_display(), entry.object_id, entry.title, _url(entry, profile_type))
+        for entry in entries
+    ]
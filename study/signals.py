@@ -0,0 +1,145 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_save, pre_delete
+
+from accounts.authentication import principal_tag
+from .cache import bump_version, invalidate_tags
+from .deadlines import group_tag, user_tag
+from .models import Group, Lesson, LessonPhoto, LessonVideo, LessonFile, TeacherGroupSubject, Try, StudentIndividualWork, \
+    Test, Question, Answer, Topic, Subject, SearchEntry
+from .search import index_objects
+
+
+def remember_lesson_subject(sender, instance, **kwargs):
+    # Запоминаем старую дисциплину, чтобы сбросить кэш и у нее, если занятие перенесли
+    instance._previous_subject_id = None
+    if instance.pk:
+        instance._previous_subject_id = Lesson.objects.filter(pk=instance.pk).values_list("subject_id", flat=True).first()
+
+
+def lesson_changed(sender, instance, **kwargs):
+    bump_version("lesson", instance.pk)
+    subject_ids = {instance.subject_id, getattr(instance, "_previous_subject_id", None)} - {None}
+    for subject_id in subject_ids:
+        bump_version("subject", subject_id)
+    group_ids = TeacherGroupSubject.objects.filter(pk__in=subject_ids).values_list("group_id", flat=True)
+    invalidate_tags(*(group_tag(group_id) for group_id in group_ids))
+
+
+def lesson_media_changed(sender, instance, **kwargs):
+    bump_version("lesson", instance.lesson_id)
+
+
+def course_changed(sender, instance, **kwargs):
+    # Название дисциплины и группа выводятся на странице дисциплины группы
+    bump_version("subject", instance.pk)
+
+
+def subject_changed(sender, instance, **kwargs):
+    for course_id in TeacherGroupSubject.objects.filter(subject=instance).values_list("pk", flat=True):
+        bump_version("subject", course_id)
+
+
+def test_changed(sender, instance, **kwargs):
+    bump_version("test", instance.pk)
+
+
+def question_changed(sender, instance, **kwargs):
+    bump_version("test", instance.test_id)
+
+
+def answer_changed(sender, instance, **kwargs):
+    test_id = Question.objects.filter(pk=instance.question_id).values_list("test_id", flat=True).first()
+    bump_version("test", test_id)
+
+
+def topic_deleted(sender, instance, **kwargs):
+    # Вопросы удаленной темы отвязываются от нее одним UPDATE без сигналов
+    for test_id in instance.questions.values_list("test_id", flat=True).distinct():
+        bump_version("test", test_id)
+
+
+def remember_lesson_test(sender, instance, **kwargs):
+    # Тест, отвязанный от занятия, больше не виден группе, его запись тоже обновляется
+    instance._previous_test_id = None
+    if instance.pk:
+        instance._previous_test_id = Lesson.objects.filter(pk=instance.pk).values_list("test_id", flat=True).first()
+
+
+def index_lesson(sender, instance, created=False, **kwargs):
+    index_objects(SearchEntry.Kind.LESSON, [instance.pk], replace=not created)
+    index_objects(SearchEntry.Kind.TEST, [instance.test_id, getattr(instance, "_previous_test_id", None)])
+
+
+def index_test(sender, instance, created=False, **kwargs):
+    index_objects(SearchEntry.Kind.TEST, [instance.pk], replace=not created)
+
+
+def index_question(sender, instance, created=False, **kwargs):
+    index_objects(SearchEntry.Kind.QUESTION, [instance.pk], replace=not created)
+
+
+def index_subject(sender, instance, created=False, **kwargs):
+    index_objects(SearchEntry.Kind.SUBJECT, [instance.pk], replace=not created)
+    if not created:
+        index_objects(SearchEntry.Kind.COURSE, instance.items.values_list("pk", flat=True))
+
+
+def index_course(sender, instance, created=False, **kwargs):
+    index_objects(SearchEntry.Kind.COURSE, [instance.pk], replace=not created)
+    if created:
+        return
+    # Занятия и тесты видны группе дисциплины, при смене группы их записи тоже меняются
+    lessons = list(Lesson.objects.filter(subject=instance).values_list("pk", "test_id"))
+    index_objects(SearchEntry.Kind.LESSON, [pk for pk, _ in lessons])
+    index_objects(SearchEntry.Kind.TEST, [test_id for _, test_id in lessons])
+
+
+def submission_changed(sender, instance, **kwargs):
+    invalidate_tags(user_tag(instance.user_id))
+
+
+def group_students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Группа студента хранится и в кэше аутентификации по токену (study.roster сбрасывает его сам)
+    if action == "pre_clear" and not reverse:
+        instance._cleared_students = list(instance.students.values_list("pk", flat=True))
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        students = [instance.pk]
+    elif action == "post_clear":
+        students = getattr(instance, "_cleared_students", [])
+    else:
+        students = pk_set or []
+    invalidate_tags(*(user_tag(pk) for pk in students), *(principal_tag(pk) for pk in students))
+
+
+pre_save.connect(remember_lesson_subject, sender=Lesson)
+post_save.connect(lesson_changed, sender=Lesson)
+post_delete.connect(lesson_changed, sender=Lesson)
+
+post_save.connect(course_changed, sender=TeacherGroupSubject)
+post_save.connect(subject_changed, sender=Subject)
+
+for media_model in (LessonPhoto, LessonVideo, LessonFile):
+    post_save.connect(lesson_media_changed, sender=media_model)
+    post_delete.connect(lesson_media_changed, sender=media_model)
+
+for model, handler in ((Test, test_changed), (Question, question_changed), (Answer, answer_changed)):
+    post_save.connect(handler, sender=model)
+    post_delete.connect(handler, sender=model)
+
+pre_save.connect(remember_lesson_test, sender=Lesson)
+post_save.connect(index_lesson, sender=Lesson)
+post_delete.connect(index_lesson, sender=Lesson)
+
+for model, handler in ((Test, index_test), (Question, index_question), (Subject, index_subject),
+                       (TeacherGroupSubject, index_course)):
+    post_save.connect(handler, sender=model)
+    post_delete.connect(handler, sender=model)
+
+pre_delete.connect(topic_deleted, sender=Topic)
+
+for submission_model in (Try, StudentIndividualWork):
+    post_save.connect(submission_changed, sender=submission_model)
+    post_delete.connect(submission_changed, sender=submission_model)
+
+m2m_changed.connect(group_students_changed, sender=Group.students.through)
@@ -0,0 +1,109 @@
+"""
+Стеммер русского языка по алгоритму Snowball (snowballstem.org/algorithms/russian) и разбиение
+текста на слова для поискового индекса. Латинские слова и числа не изменяются.
+"""
+import re
+
+VOWELS = "аеиоуыэюя"
+WORD_RE = re.compile(r"[0-9a-zа-яё]+")
+CYRILLIC_RE = re.compile(r"[а-я]")
+
+
+def _suffixes(after_a, other=()):
+    # (окончание, нужна ли перед ним а/я), длинные окончания проверяются первыми
+    return sorted([(suffix, True) for suffix in after_a] + [(suffix, False) for suffix in other],
+                  key=lambda item: -len(item[0]))
+
+
+PERFECTIVE_GERUND = _suffixes(("в", "вши", "вшись"), ("ив", "ивши", "ившись", "ыв", "ывши", "ывшись"))
+ADJECTIVE = _suffixes((), (
+    "ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом", "его", "ого", "ему", "ому",
+    "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+))
+PARTICIPLE = _suffixes(("ем", "нн", "вш", "ющ", "щ"), ("ивш", "ывш", "ующ"))
+REFLEXIVE = _suffixes((), ("ся", "сь"))
+VERB = _suffixes(
+    ("ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет", "ют", "ны", "ть", "ешь", "нно"),
+    ("ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй", "ил", "ыл", "им", "ым", "ен", "ило", "ыло",
+     "ено", "ят", "ует", "уют", "ит", "ыт", "ены", "ить", "ыть", "ишь", "ую", "ю"),
+)
+NOUN = _suffixes((), (
+    "а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "ей", "ой", "ий", "й", "иям", "ям",
+    "ием", "ем", "ам", "ом", "о", "у", "ах", "иях", "ях", "ы", "ь", "ию", "ью", "ю", "ия", "ья", "я",
+))
+SUPERLATIVE = ("ейше", "ейш")
+DERIVATIONAL = ("ость", "ост")
+
+
+def _region(word, start):
+    for position in range(start + 1, len(word)):
+        if word[position - 1] in VOWELS and word[position] not in VOWELS:
+            return position + 1
+    return len(word)
+
+
+def _strip(rv, suffixes):
+    for suffix, after_a in suffixes:
+        if rv.endswith(suffix):
+            rest = rv[:-len(suffix)]
+            if not after_a:
+                return rest
+            if rest.endswith(("а", "я")):
+                return rest
+    return None
+
+
+def stem(word):
+    word = word.lower().replace("ё", "е")
+    rv_start = next((position + 1 for position, char in enumerate(word) if char in VOWELS), len(word))
+    if rv_start >= len(word):
+        return word
+    r2_start = _region(word, _region(word, 0))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    # Шаг 1: деепричастие, иначе возвратная частица и затем прилагательное, глагол или существительное
+    stripped = _strip(rv, PERFECTIVE_GERUND)
+    if stripped is not None:
+        rv = stripped
+    else:
+        stripped = _strip(rv, REFLEXIVE)
+        if stripped is not None:
+            rv = stripped
+        stripped = _strip(rv, ADJECTIVE)
+        if stripped is not None:
+            participle = _strip(stripped, PARTICIPLE)
+            rv = participle if participle is not None else stripped
+        else:
+            for suffixes in (VERB, NOUN):
+                stripped = _strip(rv, suffixes)
+                if stripped is not None:
+                    rv = stripped
+                    break
+
+    # Шаг 2
+    if rv.endswith("и"):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательное окончание в R2
+    for suffix in DERIVATIONAL:
+        if rv.endswith(suffix) and rv_start + len(rv) - len(suffix) >= r2_start:
+            rv = rv[:-len(suffix)]
+            break
+
+    # Шаг 4
+    for suffix in SUPERLATIVE:
+        if rv.endswith(suffix):
+            rv = rv[:-len(suffix)]
+            break
+    if rv.endswith("нн"):
+        rv = rv[:-1]
+    elif rv.endswith("ь"):
+        rv = rv[:-1]
+    return prefix + rv
+
+
+def tokenize(text):
+    """
+    Слова текста в нижнем регистре, русские слова приведены к основе.
+    """
+    return [stem(word) if CYRILLIC_RE.search(word) else word for word in WORD_RE.findall((text or "").lower())]
@@ -0,0 +1,187 @@
+"""
+Синтетическое учебное заведение для нагрузочного тестирования: все объекты создаются через bulk_create.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Profile
+from .models import (
+    Group, Subject, TeacherGroupSubject, Lesson, LessonPhoto, LessonVideo, LessonFile,
+    Test, Question, Answer, Try, StudentAnswer,
+)
+
+PASSWORD = "synthetic-password"
+BATCH_SIZE = 1000
+TEST_LESSON_TYPES = (Lesson.Type.PRACTICAL, Lesson.Type.LABORATORY)
+
+
+def teacher_username(prefix, number):
+    return f"{prefix}-teacher-{number}"
+
+
+def student_username(prefix, number):
+    return f"{prefix}-student-{number}"
+
+
+def _create_users(prefix, teachers, students, batch_size):
+    password = make_password(PASSWORD)  # хэш считается один раз для всех пользователей
+    users = [
+        User(username=teacher_username(prefix, n), email=f"{teacher_username(prefix, n)}@example.com",
+             first_name="Преподаватель", last_name=str(n), password=password)
+        for n in range(teachers)
+    ] + [
+        User(username=student_username(prefix, n), email=f"{student_username(prefix, n)}@example.com",
+             first_name="Студент", last_name=str(n), password=password)
+        for n in range(students)
+    ]
+    users = User.objects.bulk_create(users, batch_size=batch_size)
+    # bulk_create не вызывает post_save, профили создаются здесь же
+    Profile.objects.bulk_create(
+        [Profile(user=user, type=Profile.Type.TEACHER if n < teachers else Profile.Type.STUDENT)
+         for n, user in enumerate(users)],
+        batch_size=batch_size,
+    )
+    return users[:teachers], users[teachers:]
+
+
+def _create_lessons(rng, prefix, items, lessons_per_subject, questions_per_test, with_media, batch_size):
+    now = timezone.now()
+    types = list(Lesson.Type.values)
+    lessons, tests = [], []
+    for item in items:
+        for n in range(lessons_per_subject):
+            lesson_type = types[n % len(types)]
+            test = None
+            if lesson_type in TEST_LESSON_TYPES:
+                test = Test(name=f"{prefix} тест {item.pk}-{n}")
+                tests.append(test)
+            lessons.append(Lesson(
+                type=lesson_type, subject=item, name=f"{prefix} занятие {n + 1}", test=test,
+                text="Текст занятия " * 20,
+                deadline=now + timedelta(days=rng.randint(-60, 60)) if rng.random() < 0.7 else None,
+            ))
+    Test.objects.bulk_create(tests, batch_size=batch_size)
+    for lesson in lessons:
+        lesson.test_id = lesson.test.pk if lesson.test else None
+    Lesson.objects.bulk_create(lessons, batch_size=batch_size)
+
+    questions = []
+    for test in tests:
+        for n in range(questions_per_test):
+            question_type = Question.Type.TEXT if n == questions_per_test - 1 and rng.random() < 0.3 \
+                else Question.Type.CHOOSE
+            questions.append(Question(test=test, type=question_type, text=f"Вопрос {n + 1}"))
+    Question.objects.bulk_create(questions, batch_size=batch_size)
+
+    answers = []
+    for question in questions:
+        if question.type == Question.Type.TEXT:
+            answers.append(Answer(question=question, text="Эталонный ответ", correct=True))
+        else:
+            correct = rng.randrange(4)
+            answers += [Answer(question=question, text=f"Вариант {n + 1}", correct=n == correct) for n in range(4)]
+    Answer.objects.bulk_create(answers, batch_size=batch_size)
+
+    if with_media:
+        # Заглушки: в базе только имена файлов, сами файлы не создаются
+        LessonPhoto.objects.bulk_create(
+            [LessonPhoto(lesson=lesson, photo="lessons/photos/synthetic.png") for lesson in lessons],
+            batch_size=batch_size)
+        LessonFile.objects.bulk_create(
+            [LessonFile(lesson=lesson, file="lessons/files/synthetic.pdf") for lesson in lessons],
+            batch_size=batch_size)
+        LessonVideo.objects.bulk_create(
+            [LessonVideo(lesson=lesson, video="lessons/videos/synthetic.mp4")
+             for lesson in lessons if lesson.type == Lesson.Type.LECTURE],
+            batch_size=batch_size)
+
+    return lessons, tests, questions
+
+
+def _create_tries(rng, students_by_group, tests_by_group, text_questions, tries_ratio, batch_size):
+    tries = []
+    for group_pk, students in students_by_group.items():
+        for student in students:
+            for test in tests_by_group.get(group_pk, []):
+                if rng.random() < tries_ratio:
+                    tries.append(Try(
+                        user=student, test=test, score=round(rng.uniform(0, 100), 2),
+                        need_check=test.pk in text_questions and rng.random() < 0.2,
+                    ))
+    Try.objects.bulk_create(tries, batch_size=batch_size)
+
+    StudentAnswer.objects.bulk_create(
+        [StudentAnswer(user_id=student_try.user_id, question=question, answer="Ответ студента", student_try=student_try)
+         for student_try in tries for question in text_questions.get(student_try.test_id, [])],
+        batch_size=batch_size,
+    )
+    return tries
+
+
+@transaction.atomic
+def generate_institution(groups=10, teachers=20, students=250, subjects=15, subjects_per_group=6,
+                         lessons_per_subject=12, questions_per_test=10, tries_ratio=0.7, with_media=True,
+                         prefix="synthetic", seed=0, batch_size=BATCH_SIZE):
+    rng = random.Random(seed)
+
+    teacher_users, student_users = _create_users(prefix, teachers, students, batch_size)
+
+    group_objects = Group.objects.bulk_create(
+        [Group(number=f"{prefix}-{n + 1}") for n in range(groups)], batch_size=batch_size)
+    students_by_group = {group.pk: [] for group in group_objects}
+    memberships = []
+    for n, student in enumerate(student_users):
+        group = group_objects[n % groups]
+        students_by_group[group.pk].append(student)
+        memberships.append(Group.students.through(group_id=group.pk, user_id=student.pk))
+    Group.students.through.objects.bulk_create(memberships, batch_size=batch_size)
+
+    subject_objects = Subject.objects.bulk_create(
+        [Subject(name=f"{prefix} дисциплина {n + 1}") for n in range(subjects)], batch_size=batch_size)
+    items = TeacherGroupSubject.objects.bulk_create(
+        [TeacherGroupSubject(group=group, subject=subject, teacher=rng.choice(teacher_users))
+         for group in group_objects
+         for subject in rng.sample(subject_objects, min(subjects_per_group, subjects))],
+        batch_size=batch_size,
+    )
+
+    lessons, tests, questions = _create_lessons(
+        rng, prefix, items, lessons_per_subject, questions_per_test, with_media, batch_size)
+
+    tests_by_group = {}
+    for lesson in lessons:
+        if lesson.test:
+            tests_by_group.setdefault(lesson.subject.group_id, []).append(lesson.test)
+    text_questions = {}
+    for question in questions:
+        if question.type == Question.Type.TEXT:
+            text_questions.setdefault(question.test_id, []).append(question)
+    tries = _create_tries(rng, students_by_group, tests_by_group, text_questions, tries_ratio, batch_size)
+
+    return {
+        "teachers": len(teacher_users),
+        "students": len(student_users),
+        "groups": len(group_objects),
+        "subjects": len(subject_objects),
+        "group_subjects": len(items),
+        "lessons": len(lessons),
+        "tests": len(tests),
+        "questions": len(questions),
+        "tries": len(tries),
+    }
+
+
+@transaction.atomic
+def clear_institution(prefix="synthetic"):
+    """
+    Удаляет объекты, созданные generate_institution с тем же префиксом.
+    """
+    Test.objects.filter(name__startswith=f"{prefix} тест").delete()
+    Subject.objects.filter(name__startswith=f"{prefix} дисциплина").delete()
+    Group.objects.filter(number__startswith=f"{prefix}-").delete()
+    User.objects.filter(username__startswith=f"{prefix}-").delete()
@@ -6,3 +6,16 @@ register = template.Library()
 @register.filter
 def is_dict(value):
     return isinstance(value, dict)
+
+
+@register.simple_tag(takes_context=True)
+def url_replace(context, **kwargs):
+    params = context["request"].GET.copy()
+    for key, value in kwargs.items():
+        params[key] = value
+    return params.urlencode()
+
+
+@register.filter
+def get_item(value, key):
+    return value.get(str(key)) if value else None
@@ -1,10 +1,55 @@
+import io
+import json
+import random
+import tempfile
+import zipfile
+from datetime import timedelta
+
+import numpy as np
+from openpyxl import load_workbook
+
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import User
 
 from accounts.models import Profile
-from .models import Subject, Test
+from .cache import CacheNamespace, invalidate_tags, stats as cache_stats
+from .deadlines import get_deadline_rows, split_deadlines
+from .deletion import purge
+from .bank import draw_questions
+from .api.renderers import FastJSONRenderer
+from .api.serializers import LessonSerializer, LessonValuesSerializer, TrySerializer
+from .autocomplete import LOOKUPS, prefix_condition
+from .archival import ArchiveError, archive_course, archived_tries, restore_course
+from .archives import CHUNK_SIZE, stream_zip
+from .authoring import AuthoringError, export_test, parse_gift
+from .cloning import clone_course, clone_test
+from .benchmarks import compare, measure, startup_profile
+from .excel import write_table
+from .loadtest import EndpointStats, prepare_users, report
+from .paginators import EstimatedCountPaginator
+from .synthetic import clear_institution, generate_institution
+from .delivery import get_payload, personalize
+from .exams import ExamError, start_session, submit, sweep_expired
+from .items import get_item_analysis, rebuild_item_stats
+from .jobs import enqueue, run_pending
+from .regrade import regrade_test
+from .scoring import get_answer_key
+from .search import search
+from .stemmer import stem, tokenize
+from .models import Subject, Test, Group, TeacherGroupSubject, Lesson, LessonFile, Try, Question, Answer, ExamSession, \
+    Topic, TestTopicRule, StudentAnswer, QuestionResult, QuestionStats, SearchEntry, Job, StudentIndividualWork, \
+    ArchiveBatch, GradeRollup
 
 
 class SubjectCreateViewTests(APITestCase):
@@ -118,3 +163,1426 @@ class TestQuestionCreateViewTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('form', response.data)
+
+
+class StudentPagesCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', password='password')
+        self.student = User.objects.create_user(username='student', password='password')
+        Profile.objects.filter(user=self.teacher).update(type=2)
+        Profile.objects.filter(user=self.student).update(type=3)
+        self.group = Group.objects.create(number='101')
+        self.group.students.add(self.student)
+        self.subject = TeacherGroupSubject.objects.create(
+            teacher=self.teacher, subject=Subject.objects.create(name='Math'), group=self.group)
+        self.lesson = Lesson.objects.create(type='LC', subject=self.subject, name='Intro', text='Text')
+        self.client.login(username='student', password='password')
+
+    def test_subject_page_conditional_get(self):
+        url = reverse('student-subject', args=[self.subject.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'Intro')
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_lesson_change_invalidates_subject_fragment(self):
+        url = reverse('student-subject', args=[self.subject.pk])
+        etag = self.client.get(url)['ETag']
+
+        self.lesson.name = 'Renamed'
+        self.lesson.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'Renamed')
+
+    def test_subject_rename_invalidates_subject_page(self):
+        url = reverse('student-subject', args=[self.subject.pk])
+        etag = self.client.get(url)['ETag']
+
+        self.subject.subject.name = 'Algebra'
+        self.subject.subject.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'Algebra')
+
+    def test_course_change_invalidates_subject_page(self):
+        url = reverse('student-subject', args=[self.subject.pk])
+        etag = self.client.get(url)['ETag']
+
+        self.subject.subject = Subject.objects.create(name='Physics')
+        self.subject.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'Physics')
+
+    def test_lesson_media_invalidates_lesson_page(self):
+        url = reverse('student-lesson', args=[self.lesson.pk])
+        etag = self.client.get(url)['ETag']
+
+        LessonFile.objects.create(file='lessons/files/notes.pdf', lesson=self.lesson)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'notes.pdf')
+
+
+class CacheLayerTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        cache_stats.reset()
+        self.namespace = CacheNamespace("tests")
+
+    def test_tag_invalidation(self):
+        self.namespace.set("answer", value=42, tags=["lesson:1"])
+        self.assertEqual(self.namespace.get("answer"), 42)
+
+        invalidate_tags("lesson:2")
+        self.assertEqual(self.namespace.get("answer"), 42)
+
+        invalidate_tags("lesson:1")
+        self.assertIsNone(self.namespace.get("answer"))
+
+    def test_namespace_clear_and_version(self):
+        self.namespace.set("answer", value=42)
+        self.assertIsNone(CacheNamespace("tests", version=2).get("answer"))
+
+        self.namespace.clear()
+        self.assertEqual(self.namespace.get_or_set("answer", default=lambda: 43), 43)
+
+    def test_invalidation_during_rebuild(self):
+        def rebuild():
+            invalidate_tags("lesson:1")
+            return 42
+
+        self.assertEqual(self.namespace.get_or_set("answer", default=rebuild, tags=["lesson:1"]), 42)
+        self.assertIsNone(self.namespace.get("answer"))
+
+    def test_stats_endpoint(self):
+        admin = User.objects.create_user(username='admin', password='password')
+        Profile.objects.filter(user=admin).update(type=1)
+        self.client.login(username='admin', password='password')
+
+        self.namespace.get("missing")
+        self.namespace.set("present", value=1)
+        self.namespace.get("present")
+
+        response = self.client.get(reverse('api-cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["stats"]["hits"], 1)
+        self.assertEqual(response.data["stats"]["misses"], 1)
+        self.assertEqual(response.data["stats"]["sets"], 1)
+
+
+class MyLessonsListViewTests(APITestCase):
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='password')
+        Profile.objects.filter(user=self.teacher).update(type=2)
+        self.subject = Subject.objects.create(name='Math')
+        self.client.login(username='teacher', password='password')
+
+    def add_group(self, number):
+        group = Group.objects.create(number=number)
+        item = TeacherGroupSubject.objects.create(teacher=self.teacher, subject=self.subject, group=group)
+        for n in range(2):
+            Lesson.objects.create(type='PR', subject=item, name=f'{number}-{n}', test=Test.objects.create(name='T'))
+        return group
+
+    def count_page_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('my-lessons'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_constant_queries(self):
+        self.add_group('101')
+        queries = self.count_page_queries()
+        for number in range(102, 110):
+            self.add_group(str(number))
+        self.assertEqual(self.count_page_queries(), queries)
+
+    def test_api_filter_order_and_paginate(self):
+        group = self.add_group('101')
+        self.add_group('102')
+        response = self.client.get(reverse('api-my-lessons'), {"group": group.pk, "ordering": "-name"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual([lesson["name"] for lesson in response.data["results"]], ['101-1', '101-0'])
+
+
+class StudentDeadlinesTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        teacher = User.objects.create_user(username='teacher', password='password')
+        self.student = User.objects.create_user(username='student', password='password')
+        Profile.objects.filter(user=self.student).update(type=3)
+        self.group = Group.objects.create(number='101')
+        self.group.students.add(self.student)
+        subject = TeacherGroupSubject.objects.create(
+            teacher=teacher, subject=Subject.objects.create(name='Math'), group=self.group)
+        now = timezone.now()
+        self.test = Test.objects.create(name='Quiz')
+        self.upcoming = Lesson.objects.create(
+            type='PR', subject=subject, name='Upcoming', test=self.test, deadline=now + timedelta(days=1))
+        self.overdue = Lesson.objects.create(type='IW', subject=subject, name='Overdue', deadline=now - timedelta(days=1))
+        Lesson.objects.create(type='LC', subject=subject, name='No deadline')
+        self.client.login(username='student', password='password')
+
+    def test_feed_is_cached_per_group(self):
+        with self.assertNumQueries(2):
+            rows = get_deadline_rows(self.student, self.group)
+        with self.assertNumQueries(0):
+            get_deadline_rows(self.student, self.group)
+        # Занятия группы уже в кэше, другому студенту нужно только его состояние сдачи
+        other = User.objects.create_user(username='other')
+        with self.assertNumQueries(1):
+            get_deadline_rows(other, self.group)
+
+        upcoming, overdue = split_deadlines(rows)
+        self.assertEqual([row["name"] for row in upcoming], ['Upcoming'])
+        self.assertEqual([row["name"] for row in overdue], ['Overdue'])
+
+    def test_submission_invalidates_feed(self):
+        get_deadline_rows(self.student, self.group)
+        Try.objects.create(user=self.student, test=self.test, score=80)
+
+        upcoming, overdue = split_deadlines(get_deadline_rows(self.student, self.group))
+        self.assertTrue(upcoming[0]["has_try"])
+        self.assertEqual(upcoming[0]["best_score"], 80)
+
+    def test_pages(self):
+        response = self.client.get(reverse('student-deadlines'))
+        self.assertContains(response, 'Upcoming')
+
+        response = self.client.get(reverse('api-student-deadlines'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["upcoming"]), 1)
+
+        response = self.client.get(reverse('student-deadlines-ical'))
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        self.assertEqual(response.content.decode().count("BEGIN:VEVENT"), 2)
+
+
+class ExamSessionTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        teacher = User.objects.create_user(username='teacher', password='password')
+        self.student = User.objects.create_user(username='student', password='password')
+        Profile.objects.filter(user=self.student).update(type=3)
+        group = Group.objects.create(number='101')
+        group.students.add(self.student)
+        subject = TeacherGroupSubject.objects.create(
+            teacher=teacher, subject=Subject.objects.create(name='Math'), group=group)
+        self.test = Test.objects.create(name='Quiz', time_limit=10, max_attempts=1)
+        Lesson.objects.create(type='PR', subject=subject, name='Lesson', test=self.test)
+        question = Question.objects.create(test=self.test, type='CH', text='2 + 2')
+        self.correct = Answer.objects.create(question=question, text='4', correct=True)
+        self.wrong = Answer.objects.create(question=question, text='5')
+        self.client.login(username='student', password='password')
+
+    def expire(self, session):
+        ExamSession.objects.filter(pk=session.pk).update(expires_at=timezone.now() - timedelta(minutes=5))
+
+    def test_attempt_limit(self):
+        session = start_session(self.student, self.test)
+        self.assertEqual(start_session(self.student, self.test), session)
+
+        submit(self.student, self.test, {str(self.correct.pk): 'on'}, session_pk=session.pk)
+        self.assertEqual(Try.objects.get(user=self.student).score, 100)
+        with self.assertRaises(ExamError):
+            start_session(self.student, self.test)
+
+    def test_heartbeat_and_cutoff(self):
+        response = self.client.get(reverse('api-student-test', kwargs={'pk': self.test.pk}))
+        session_pk = response.data["session"]["id"]
+        self.assertGreater(response.data["session"]["remaining"], 500)
+
+        url = reverse('api-student-test-heartbeat', kwargs={'pk': self.test.pk})
+        response = self.client.post(
+            url, {'session': session_pk, 'answers': {str(self.correct.pk): True}}, format='json')
+        self.assertTrue(response.data["saved"])
+
+        self.expire(ExamSession.objects.get(pk=session_pk))
+        response = self.client.post(
+            url, {'session': session_pk, 'answers': {str(self.wrong.pk): True}}, format='json')
+        self.assertFalse(response.data["saved"])
+
+        # После окончания времени засчитывается черновик, а не присланные ответы
+        response = self.client.post(
+            reverse('api-student-test', kwargs={'pk': self.test.pk}),
+            {'session': session_pk, str(self.wrong.pk): 'on'}, format='json')
+        self.assertTrue(response.data["autosubmitted"])
+        self.assertEqual(response.data["try"]["score"], 100)
+
+    def test_invalid_session_number(self):
+        with self.assertRaisesMessage(ExamError, 'Попытка не найдена'):
+            submit(self.student, self.test, {}, session_pk='abc')
+        response = self.client.post(
+            reverse('api-student-test-heartbeat', kwargs={'pk': self.test.pk}), {'session': 'abc'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            reverse('api-student-test', kwargs={'pk': self.test.pk}), {'session': 'abc'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Try.objects.exists())
+
+    def test_expired_session_is_graded_on_start(self):
+        Test.objects.filter(pk=self.test.pk).update(max_attempts=2)
+        self.test.refresh_from_db()
+        session = start_session(self.student, self.test)
+        ExamSession.objects.filter(pk=session.pk).update(draft={str(self.correct.pk): 1})
+        self.expire(session)
+
+        new_session = start_session(self.student, self.test)
+        self.assertNotEqual(new_session, session)
+        session.refresh_from_db()
+        self.assertTrue(session.autosubmitted)
+        self.assertEqual(session.student_try.score, 100)
+
+        self.expire(new_session)
+        with self.assertRaisesMessage(ExamError, 'Попытки закончились'):
+            start_session(self.student, self.test)
+        self.assertEqual(Try.objects.filter(user=self.student).count(), 2)
+
+    def test_page_renders_draft(self):
+        session = start_session(self.student, self.test)
+        ExamSession.objects.filter(pk=session.pk).update(draft={str(self.correct.pk): 1})
+
+        response = self.client.get(reverse('student-test', kwargs={'pk': self.test.pk}))
+        self.assertContains(response, '2 + 2')
+        self.assertContains(response, f'name="{self.correct.pk}" data-value="{self.correct.pk}" hidden checked')
+
+    def test_sweeper_grades_expired_sessions(self):
+        session = start_session(self.student, self.test)
+        self.expire(session)
+
+        self.assertEqual(sweep_expired(), 1)
+        session.refresh_from_db()
+        self.assertTrue(session.autosubmitted)
+        self.assertEqual(session.student_try.score, 0)
+        self.assertEqual(sweep_expired(), 0)
+
+
+class TestDeliveryTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.test = Test.objects.create(name='Quiz', shuffle=True)
+        for number in range(5):
+            question = Question.objects.create(test=self.test, type='CH', text=f'Question {number}')
+            for option in range(4):
+                Answer.objects.create(question=question, text=f'Option {option}', correct=option == 0)
+        Question.objects.create(test=self.test, type='TX', text='Explain')
+
+    def test_payload_is_built_once_without_correct_flags(self):
+        with self.assertNumQueries(2):
+            payload = get_payload(self.test)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_payload(self.test), payload)
+
+        self.assertEqual(len(payload["questions"]), 6)
+        self.assertNotIn("correct", str(payload))
+        self.assertIsNone(payload["questions"][-1]["answer_id"])
+
+    def test_question_change_rebuilds_payload(self):
+        get_payload(self.test)
+        Question.objects.filter(test=self.test).first().answers.first().delete()
+        self.assertEqual(sum(len(question["answers"]) for question in get_payload(self.test)["questions"]), 19)
+
+    def test_shuffle_is_deterministic_per_student(self):
+        payload = get_payload(self.test)
+        first = personalize(payload, 1)
+        self.assertEqual(first, personalize(payload, 1))
+        self.assertNotEqual(
+            [question["id"] for question in first["questions"]],
+            [question["id"] for question in personalize(payload, 2)["questions"]])
+        self.assertEqual(
+            sorted(question["id"] for question in first["questions"]),
+            [question["id"] for question in payload["questions"]])
+
+
+class QuestionBankTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='student', password='password')
+        self.test = Test.objects.create(name='Bank')
+        self.topics = [Topic.objects.create(name=f'Topic {number}') for number in range(2)]
+        for topic in self.topics:
+            TestTopicRule.objects.create(test=self.test, topic=topic, count=3)
+            for number in range(20):
+                question = Question.objects.create(test=self.test, topic=topic, type='CH', text=f'{topic} {number}')
+                Answer.objects.create(question=question, text='Yes', correct=True)
+        self.fixed = Question.objects.create(test=self.test, type='TX', text='Always')
+        Answer.objects.create(question=self.fixed, text='')
+
+    def test_draw_uses_cached_pools(self):
+        question_ids = draw_questions(self.test)
+        self.assertEqual(len(question_ids), 7)
+        self.assertIn(self.fixed.pk, question_ids)
+        for topic in self.topics:
+            self.assertEqual(Question.objects.filter(pk__in=question_ids, topic=topic).count(), 3)
+
+        with self.assertNumQueries(1):
+            draw_questions(self.test)
+
+    def test_only_drawn_questions_are_graded(self):
+        session = start_session(self.student, self.test)
+        data = {str(answer.pk): 'on' for answer in Answer.objects.filter(question__test=self.test)}
+        session = submit(self.student, self.test, data, session_pk=session.pk)
+
+        student_try = session.student_try
+        self.assertEqual(student_try.question_ids, session.question_ids)
+        self.assertEqual(student_try.students_answers.count(), 1)
+        self.assertAlmostEqual(student_try.score, 600 / 7)
+
+        student_try.checking({str(student_try.students_answers.get().pk): 10})
+        self.assertAlmostEqual(student_try.score, 100)
+
+    def test_empty_pools(self):
+        # Вопросы темы без правила выпадают всегда, правило для темы без вопросов не дает пустой выборки
+        extra = Topic.objects.create(name='Extra')
+        question = Question.objects.create(test=self.test, topic=extra, type='CH', text='Extra')
+        cache.clear()
+        self.assertIn(question.pk, draw_questions(self.test))
+
+        empty = Test.objects.create(name='Empty')
+        Question.objects.create(test=empty, type='CH', text='Без темы')
+        rule = TestTopicRule(test=empty, topic=self.topics[0], count=3)
+        with self.assertRaises(ValidationError):
+            rule.full_clean()
+        rule.save()
+        Question.objects.filter(test=empty).delete()
+        self.assertIsNone(draw_questions(empty))
+        self.assertEqual(empty.get_question_score([]), 100)
+        self.assertEqual(submit(self.student, empty, {}).student_try.score, 0)
+
+
+class AdminChangelistTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='root', password='password')
+        self.client.login(username='root', password='password')
+        self.test = Test.objects.create(name='Quiz')
+        self.question = Question.objects.create(test=self.test, type='TX', text='Explain')
+
+    def add_tries(self, count):
+        for number in range(count):
+            student = User.objects.create_user(username=f'student{Try.objects.count()}', password='password')
+            student_try = Try.objects.create(user=student, test=self.test, score=number)
+            StudentAnswer.objects.create(user=student, question=self.question, answer='text', student_try=student_try)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_changelists_do_not_grow_with_rows(self):
+        for url in ('/admin/study/try/', '/admin/study/studentanswer/'):
+            self.add_tries(2)
+            few = self.count_queries(url)
+            self.add_tries(5)
+            self.assertEqual(self.count_queries(url), few)
+
+    def test_prefix_search(self):
+        Question.objects.create(test=Test.objects.create(name='Exam'), type='TX', text='explore')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/admin/study/question/', {'q': 'EXPL qu'})
+        self.assertEqual([question.text for question in response.context['cl'].result_list], ['Explain'])
+        self.assertTrue(any('UPPER("study_question"."text") >=' in query['sql'] for query in context.captured_queries))
+
+    def test_related_prefix_search_uses_subqueries(self):
+        self.add_tries(2)
+        Try.objects.create(user=self.admin, test=Test.objects.create(name='Student exam'), score=1)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/admin/study/try/', {'q': 'STUDENT1'})
+        self.assertEqual([student_try.user.username for student_try in response.context['cl'].result_list], ['student1'])
+        self.assertTrue(any('"study_try"."user_id" IN (SELECT U0."id" FROM "auth_user" U0' in query['sql']
+                            for query in context.captured_queries))
+        self.assertFalse(any('UPPER("auth_user"."username")' in query['sql'] for query in context.captured_queries))
+
+    def test_paginator_count_is_capped(self):
+        self.add_tries(3)
+        paginator = EstimatedCountPaginator(Try.objects.order_by('pk'), 1)
+        paginator.COUNT_LIMIT = 2
+        self.assertEqual(paginator.count, 2)
+
+
+class AutocompleteTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='password')
+        Profile.objects.filter(user=self.admin).update(type=1)
+        self.teacher = User.objects.create_user(username='teacher', password='password')
+        Profile.objects.filter(user=self.teacher).update(type=2)
+        subject = Subject.objects.create(name='Math')
+        for number in range(30):
+            group = Group.objects.create(number=f'{100 + number}')
+            TeacherGroupSubject.objects.create(teacher=self.teacher, subject=subject, group=group)
+        self.lesson = Lesson.objects.create(
+            type='LC', subject=TeacherGroupSubject.objects.first(), name='Lesson')
+
+    def test_prefix_search_with_limit(self):
+        self.client.login(username='admin', password='password')
+        url = reverse('api-autocomplete', kwargs={'lookup': 'groups'})
+
+        response = self.client.get(url, {'q': '11'})
+        self.assertEqual([item['text'] for item in response.data['results']], [f'{110 + n}' for n in range(10)])
+
+        response = self.client.get(url, {'limit': 5})
+        self.assertEqual(len(response.data['results']), 5)
+
+        response = self.client.get(reverse('api-autocomplete', kwargs={'lookup': 'unknown'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_prefix_search_uses_index(self):
+        Subject.objects.create(name='mathematics')
+        lookup = LOOKUPS['subjects']
+        self.assertEqual([item['text'] for item in lookup.search(self.admin, 'MATH')], ['Math', 'mathematics'])
+        queryset = Subject.objects.filter(prefix_condition('name', 'ma'))
+        if connection.vendor == 'sqlite':
+            self.assertIn('subject_name_upper_idx', queryset.explain())
+
+    def test_teacher_sees_only_own_subjects(self):
+        other = User.objects.create_user(username='other', password='password')
+        TeacherGroupSubject.objects.create(
+            teacher=other, subject=Subject.objects.create(name='Mathematics'), group=Group.objects.first())
+        self.client.login(username='teacher', password='password')
+
+        response = self.client.get(reverse('api-autocomplete', kwargs={'lookup': 'teacher-subjects'}), {'limit': 50})
+        self.assertEqual(len(response.data['results']), 30)
+
+    def test_lesson_form_renders_only_selected_subject(self):
+        self.client.login(username='admin', password='password')
+        url = reverse('lesson', kwargs={'pk': self.lesson.pk})
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertContains(response, str(self.lesson.subject))
+        self.assertNotContains(response, str(TeacherGroupSubject.objects.last()))
+
+        TeacherGroupSubject.objects.create(
+            teacher=self.teacher, subject=Subject.objects.first(), group=Group.objects.create(number='999'))
+        with self.assertNumQueries(len(context.captured_queries)):
+            self.client.get(url)
+
+
+class SyntheticInstitutionTests(APITestCase):
+
+    def test_generate_and_clear(self):
+        counts = generate_institution(
+            groups=2, teachers=3, students=10, subjects=4, subjects_per_group=2,
+            lessons_per_subject=5, questions_per_test=3, tries_ratio=1)
+
+        self.assertEqual(User.objects.filter(profile__type=3).count(), 10)
+        self.assertEqual(Group.objects.get(number='synthetic-1').students.count(), 5)
+        self.assertEqual(Lesson.objects.count(), counts["lessons"])
+        self.assertEqual(counts["tries"], 10 * counts["tests"] // 2)
+
+        virtual_users = prepare_users("synthetic", students=2, teachers=1)
+        self.assertEqual([user.role for user in virtual_users], ["student", "student", "teacher"])
+        self.assertTrue(any(name == "student-lesson" for name, _, _ in virtual_users[0].urls))
+
+        clear_institution()
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Test.objects.exists())
+
+    def test_report_percentiles(self):
+        rows = report({"index": EndpointStats(latencies=[n / 1000 for n in range(1, 101)], errors=1)}, duration=10)
+        self.assertEqual(rows[0]["requests"], 100)
+        self.assertEqual(rows[0]["rps"], 10)
+        self.assertEqual(rows[0]["p50_ms"], 51)
+        self.assertEqual(rows[0]["p99_ms"], 100)
+
+
+class BenchmarkTests(APITestCase):
+
+    def test_measure_counts_queries_and_rolls_back(self):
+        # У групп нет сигналов поискового индекса: создание - ровно один запрос
+        result = measure(lambda: Group.objects.create(number='Temporary'), repeat=2)
+        self.assertEqual(result["queries"], 1)
+        self.assertFalse(Group.objects.exists())
+
+    def test_web_process_starts_without_pandas(self):
+        # pandas и openpyxl нужны только загрузке и выгрузке Excel и импортируются study.excel по требованию
+        result = startup_profile(repeat=1, top=0)
+        self.assertEqual(result["status"], 200)
+        self.assertNotIn("pandas", result["loaded"])
+        self.assertNotIn("openpyxl", result["loaded"])
+        self.assertNotIn("numpy", result["loaded"])
+
+    def test_compare_reports_regressions(self):
+        baseline = {"calculate_score@1": {"median_ms": 10, "queries": 8}}
+        self.assertEqual(compare({"calculate_score@1": {"median_ms": 12, "queries": 8}}, baseline), [])
+        self.assertEqual(len(compare({"calculate_score@1": {"median_ms": 20, "queries": 9}}, baseline)), 2)
+        self.assertEqual(compare({"new_case@1": {"median_ms": 20, "queries": 9}}, baseline), [])
+
+
+class ScoringKernelTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='student', password='password')
+        self.test = Test.objects.create(name='Kernel')
+        rng = random.Random(0)
+        for number in range(6):
+            question = Question.objects.create(test=self.test, type='CH', text=f'Question {number}')
+            for variant in range(rng.randint(2, 5)):
+                Answer.objects.create(question=question, text=f'{variant}', correct=rng.random() < 0.4)
+        self.text_question = Question.objects.create(test=self.test, type='TX', text='Text')
+        self.text_answer = Answer.objects.create(question=self.text_question, text='')
+
+    def reference_score(self, selected):
+        question_score = 100 / self.test.questions.count()
+        score = 0
+        for question in self.test.questions.filter(type='CH'):
+            answers = list(question.answers.all())
+            matches = sum(1 for answer in answers if answer.correct == (answer.pk in selected))
+            ans_score = question_score * (matches / len(answers)) - question_score * ((len(answers) - matches) / len(answers))
+            if ans_score > 0:
+                score += ans_score
+        return score
+
+    def test_kernel_matches_reference_scoring(self):
+        rng = random.Random(1)
+        answer_ids = list(Answer.objects.filter(question__test=self.test, question__type='CH').values_list('pk', flat=True))
+        submissions = [{pk for pk in answer_ids if rng.random() < 0.5} for _ in range(30)]
+
+        key = get_answer_key(self.test)
+        scores = key.score_batch(key.selection_matrix(submissions), 100 / key.question_count)
+        for selected, score in zip(submissions, scores):
+            self.assertAlmostEqual(score, self.reference_score(selected))
+
+    def test_calculate_score_uses_cached_key(self):
+        correct = Answer.objects.filter(question__test=self.test, question__type='CH', correct=True)
+        data = {str(answer.pk): 'on' for answer in correct}
+        data[str(self.text_answer.pk)] = 'Ответ'
+        self.test.calculate_score(data, self.student)
+
+        with self.assertNumQueries(1):
+            score, need_check = self.test.calculate_score(data, self.student)
+        self.assertAlmostEqual(score, 600 / 7)
+        self.assertTrue(need_check)
+        self.assertEqual(StudentAnswer.objects.filter(answer='Ответ').count(), 2)
+
+        correct.first().delete()
+        score, _ = self.test.calculate_score(data, self.student)
+        self.assertAlmostEqual(score, self.reference_score({int(pk) for pk in data}))
+
+
+class RegradeTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', password='password')
+        Profile.objects.filter(user=self.teacher).update(type=2)
+        self.test = Test.objects.create(name='Regrade')
+        question = Question.objects.create(test=self.test, type='CH', text='2 + 2')
+        self.right = Answer.objects.create(question=question, text='4', correct=True)
+        self.other = Answer.objects.create(question=question, text='2 * 2')
+        text_question = Question.objects.create(test=self.test, type='TX', text='Why?')
+        Answer.objects.create(question=text_question, text='')
+        self.students = [User.objects.create_user(username=f'student{number}') for number in range(5)]
+        for student in self.students:
+            submit(student, self.test, {str(self.right.pk): 'on'})
+
+    def test_try_keeps_selections(self):
+        student_try = Try.objects.get(user=self.students[0])
+        self.assertEqual(student_try.selections, [self.right.pk])
+        self.assertAlmostEqual(student_try.choice_score, 50)
+
+    def test_regrade_after_key_change(self):
+        checked = Try.objects.get(user=self.students[0])
+        checked.checking({str(checked.students_answers.get().pk): 10})
+        Try.objects.create(user=self.students[1], test=self.test, score=42)  # попытка без сохраненных отметок
+        self.other.correct = True
+        self.other.save()
+
+        self.client.login(username='teacher', password='password')
+        url = reverse('api-test-regrade', kwargs={'pk': self.test.pk})
+        report = self.client.post(url, {'dry_run': True}, format='json').data["report"]
+        self.assertEqual(report["changed"], 5)
+        self.assertEqual(report["skipped"], 1)
+        self.assertAlmostEqual(report["min_delta"], -50)
+        self.assertAlmostEqual(Try.objects.get(pk=checked.pk).score, 100)
+
+        report = self.client.post(url, format='json').data["report"]
+        self.assertEqual(report["decreased"], 5)
+        self.assertAlmostEqual(Try.objects.get(pk=checked.pk).score, 50)
+        self.assertEqual(Try.objects.filter(score=0).count(), 4)
+        self.assertEqual(Try.objects.get(score=42).choice_score, None)
+
+    def test_command_regrades_in_chunks(self):
+        self.right.correct = False
+        self.right.save()
+        with CaptureQueriesContext(connection) as queries:
+            report = regrade_test(self.test, chunk_size=2)
+        self.assertEqual(report.changed, 5)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "study_try"')]), 3)
+
+        out = io.StringIO()
+        call_command('regrade_tries', self.test.pk, stdout=out)
+        self.assertIn('изменено 0', out.getvalue())
+
+        self.client.login(username='teacher', password='password')
+        response = self.client.post(reverse('test-regrade', kwargs={'pk': self.test.pk}))
+        self.assertRedirects(response, reverse('test', kwargs={'pk': self.test.pk}), fetch_redirect_response=False)
+
+
+class ItemAnalysisTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', password='password')
+        Profile.objects.filter(user=self.teacher).update(type=2)
+        self.test = Test.objects.create(name='Items')
+        self.questions = []
+        for number in range(3):
+            question = Question.objects.create(test=self.test, type='CH', text=f'Question {number}')
+            Answer.objects.create(question=question, text='Right', correct=True)
+            Answer.objects.create(question=question, text='Wrong')
+            self.questions.append(question)
+        rng = random.Random(2)
+        for number in range(12):
+            student = User.objects.create_user(username=f'student{number}')
+            data = {str(answer.pk): 'on' for answer in Answer.objects.filter(question__test=self.test)
+                    if rng.random() < 0.5}
+            submit(student, self.test, data)
+
+    def expected(self, question):
+        results = list(QuestionResult.objects.filter(question=question).select_related('student_try'))
+        item = np.array([result.score for result in results])
+        rest = np.array([result.student_try.choice_score for result in results]) - item * 100 / 3
+        discrimination = np.corrcoef(item, rest)[0, 1] if item.std() and rest.std() else None
+        return item.mean() * 100, discrimination
+
+    def test_stats_are_accumulated_on_submit(self):
+        self.assertEqual(QuestionResult.objects.count(), 36)
+        all_selections = list(Try.objects.values_list('selections', flat=True))
+        with self.assertNumQueries(2):
+            analysis = get_item_analysis(self.test)
+        for question, row in zip(self.questions, analysis):
+            mean_score, discrimination = self.expected(question)
+            self.assertEqual(row["attempts"], 12)
+            self.assertAlmostEqual(row["mean_score"], mean_score, places=1)
+            if discrimination is None:
+                self.assertIsNone(row["discrimination"])
+            else:
+                self.assertAlmostEqual(row["discrimination"], discrimination, places=2)
+            for answer in row["answers"]:
+                self.assertEqual(answer["selected"], sum(answer["id"] in selections for selections in all_selections))
+
+    def test_rebuild_and_api(self):
+        before = get_item_analysis(self.test)
+        QuestionStats.objects.update(attempts=0)
+        rebuild_item_stats(self.test)
+        self.assertEqual(get_item_analysis(self.test), before)
+        self.assertEqual(QuestionResult.objects.count(), 36)
+
+        self.client.login(username='teacher', password='password')
+        response = self.client.get(reverse('api-test-item-analysis', kwargs={'pk': self.test.pk}))
+        self.assertEqual(response.data["questions"], before)
+
+
+class GroupRosterTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user(username='admin', password='password')
+        Profile.objects.filter(user=admin).update(type=1)
+        self.source = Group.objects.create(number='101')
+        self.target = Group.objects.create(number='201')
+        self.students = [
+            User.objects.create_user(username=f'student{number}@example.com', email=f'student{number}@example.com')
+            for number in range(6)
+        ]
+        Profile.objects.filter(user__in=self.students).update(type=3)
+        self.source.students.add(*self.students[:4])
+        self.client.login(username='admin', password='password')
+
+    def test_move_whole_group_in_one_update(self):
+        url = reverse('api-group-students-move', kwargs={'pk': self.source.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'target': self.target.pk}, format='json')
+        self.assertEqual(response.data["moved"], 4)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(self.target.students.count(), 4)
+        self.assertFalse(self.source.students.exists())
+
+    def test_add_and_remove(self):
+        url = reverse('api-group-students-add', kwargs={'pk': self.target.pk})
+        ids = [self.students[0].pk, self.students[5].pk, 999]
+        response = self.client.post(url, {'students': ids}, format='json')
+        self.assertEqual((response.data["added"], response.data["moved"]), (1, 1))
+        self.assertEqual(response.data["unknown"], [999])
+        self.assertEqual(self.students[0].group_set.get(), self.target)
+
+        url = reverse('api-group-students-remove', kwargs={'pk': self.source.pk})
+        response = self.client.post(url, {'students': [self.students[0].pk, self.students[1].pk]}, format='json')
+        self.assertEqual((response.data["removed"], response.data["unchanged"]), (1, 1))
+        self.assertEqual(self.source.students.count(), 2)
+
+    def test_import_csv(self):
+        content = 'email;last_name\nstudent4@example.com;Four\nstudent0@example.com;Zero\nnobody@example.com;-\n'
+        upload = SimpleUploadedFile('roster.csv', content.encode(), content_type='text/csv')
+        response = self.client.post(reverse('group-roster', kwargs={'pk': self.target.pk}),
+                                    {'action': 'import', 'file': upload})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(set(self.target.students.all()), {self.students[0], self.students[4]})
+
+        upload = SimpleUploadedFile('roster.csv', b'student1@example.com\nnobody@example.com\n')
+        response = self.client.post(reverse('api-group-students-import', kwargs={'pk': self.target.pk}),
+                                    {'file': upload})
+        self.assertEqual(response.data["moved"], 1)
+        self.assertEqual(response.data["unknown"], ['nobody@example.com'])
+
+        # Русский Excel сохраняет CSV в Windows-1251
+        upload = SimpleUploadedFile('roster.csv', 'Фамилия;email\nДва;student2@example.com\n'.encode('cp1251'))
+        response = self.client.post(reverse('api-group-students-import', kwargs={'pk': self.target.pk}),
+                                    {'file': upload})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(self.students[2], self.target.students.all())
+
+        upload = SimpleUploadedFile('roster.csv', b'\x98\xff\xfe')
+        response = self.client.post(reverse('api-group-students-import', kwargs={'pk': self.target.pk}),
+                                    {'file': upload})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SearchTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', password='password')
+        Profile.objects.filter(user=self.admin).update(type=1)
+        student = User.objects.create_user(username='student', password='password')
+        Profile.objects.filter(user=student).update(type=3)
+        self.student = User.objects.get(pk=student.pk)
+        teacher = User.objects.create_user(username='teacher')
+        group = Group.objects.create(number='101')
+        group.students.add(student)
+        other_group = Group.objects.create(number='102')
+        subject = Subject.objects.create(name='Теория вероятностей')
+        self.item = TeacherGroupSubject.objects.create(teacher=teacher, subject=subject, group=group)
+        other_item = TeacherGroupSubject.objects.create(teacher=teacher, subject=subject, group=other_group)
+        self.test = Test.objects.create(name='Контрольная по лекциям')
+        self.lesson = Lesson.objects.create(subject=self.item, name='Случайные величины', type='LC',
+                                            text='Лекция о дискретных распределениях', test=self.test)
+        Lesson.objects.create(subject=other_item, name='Случайные процессы', type='LC')
+        Question.objects.create(test=self.test, type='CH', text='Что такое дисперсия?')
+
+    def titles(self, user, query):
+        return sorted(result.title for result in search(user, query))
+
+    def test_stemmer(self):
+        self.assertEqual({stem('лекция'), stem('лекции'), stem('лекциями')}, {'лекц'})
+        self.assertEqual(tokenize('Лекции по SQL 2024'), ['лекц', 'по', 'sql', '2024'])
+
+    def test_word_forms_and_ranking(self):
+        results = search(self.admin, 'случайная величина')
+        self.assertEqual([result.title for result in results], ['Случайные величины'])
+        self.assertEqual(results[0].url, reverse('lesson', kwargs={'pk': self.lesson.pk}))
+        # Совпадение в названии выше совпадения в тексте
+        Lesson.objects.create(subject=self.item, name='Распределения', type='LC', text='лекция')
+        self.assertEqual(search(self.admin, 'лекциях')[0].title, 'Контрольная по лекциям')
+        self.assertEqual(self.titles(self.admin, 'дисперсии'), ['Что такое дисперсия?'])
+
+    def test_student_scope(self):
+        self.assertEqual(self.titles(self.student, 'случайные'), ['Случайные величины'])
+        self.assertEqual(self.titles(self.student, 'дисперсия'), [])
+        results = search(self.student, 'вероятность')
+        self.assertEqual([result.url for result in results], [reverse('student-subject', kwargs={'pk': self.item.pk})])
+        self.assertEqual(search(self.student, 'контрольная')[0].url,
+                         reverse('student-lesson', kwargs={'pk': self.lesson.pk}))
+
+    def test_index_follows_changes(self):
+        self.lesson.name = 'Закон больших чисел'
+        self.lesson.save()
+        self.assertEqual(self.titles(self.admin, 'чисел'), ['Закон больших чисел'])
+        self.assertEqual(self.titles(self.admin, 'величины'), [])
+        self.lesson.delete()
+        self.assertEqual(self.titles(self.admin, 'чисел'), [])
+        # Тест без занятия студенту больше не виден
+        self.assertEqual(self.titles(self.student, 'контрольная'), [])
+
+    def test_rebuild_command_and_api(self):
+        SearchEntry.objects.all().delete()
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Занятие: 2', out.getvalue())
+        self.client.login(username='student', password='password')
+        response = self.client.get(reverse('api-search'), {'q': 'случайные'})
+        self.assertEqual([result['id'] for result in response.data['results']], [self.lesson.pk])
+
+
+class ValuesSerializerTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user(username='admin', password='password')
+        Profile.objects.filter(user=admin).update(type=1)
+        self.test = Test.objects.create(name='Тест')
+        Lesson.objects.create(name='С дедлайном', type='LC', test=self.test, deadline=timezone.now())
+        Lesson.objects.create(name='Без дедлайна', type='PR')
+        Try.objects.create(user=admin, test=self.test, score=55.5, selections=[1, 2], choice_score=50)
+        self.client.login(username='admin', password='password')
+
+    def test_same_output_as_model_serializer(self):
+        response = self.client.get(reverse('api-lessons'), {'ordering': 'name'})
+        lessons = Lesson.objects.filter(pk__in=[row['id'] for row in response.data['results']])
+        expected = {row['id']: dict(row) for row in LessonSerializer(lessons, many=True).data}
+        self.assertEqual({row['id']: row for row in response.data['results']}, expected)
+
+        response = self.client.get(reverse('api-test-try-list', kwargs={'pk': self.test.pk}))
+        self.assertEqual(response.data, [dict(row) for row in TrySerializer(Try.objects.all(), many=True).data])
+
+    def test_values_path_skips_model_instances(self):
+        rows = LessonValuesSerializer(LessonValuesSerializer.project(Lesson.objects.order_by('pk'))).data
+        self.assertIsInstance(rows[0], dict)
+        self.assertIsInstance(rows[0]['deadline'], str)
+        self.assertIsNone(rows[1]['deadline'])
+
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {'when': timezone.now(), 1: [np.float64(0.5)], 'text': 'Тест'}
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+        for value in (float('nan'), [np.float32('inf')], np.array([1.0, float('nan')])):
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({'score': value})
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'score': value})
+
+
+class ExcelTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', password='password')
+        Profile.objects.filter(user=self.admin).update(type=1)
+        group = Group.objects.create(number='101')
+        subject = Subject.objects.create(name='Физика')
+        self.item = TeacherGroupSubject.objects.create(teacher=self.admin, subject=subject, group=group)
+        self.client.login(username='admin', password='password')
+
+    def test_upload_lessons(self):
+        columns = ['name', 'type', 'subject', 'teacher', 'group', 'text']
+        rows = [
+            columns,
+            ['Пропускается', 'LC', 'Физика', 'admin', 101, None],
+            ['Кинематика', 'LC', 'Физика', 'admin', 101, None],
+            ['Без типа', None, 'Физика', 'admin', 101, 'Текст'],
+        ]
+        buffer = io.BytesIO()
+        write_table(buffer, rows, index=False, header=False)
+        self.client.post(reverse('lessons-upload'), {'excel': SimpleUploadedFile('lessons.xlsx', buffer.getvalue())})
+        lesson = Lesson.objects.get()
+        self.assertEqual((lesson.name, lesson.text, lesson.subject), ('Кинематика', None, self.item))
+
+    def test_download_tries(self):
+        test = Test.objects.create(name='Итоговый')
+        Try.objects.create(user=self.admin, test=test, score=75)
+        response = self.client.get(reverse('test-download-tries', kwargs={'test_id': test.pk}))
+        sheet = load_workbook(io.BytesIO(response.content)).active
+        self.assertEqual(sheet.title, 'Результаты теста Итоговый')
+        self.assertEqual(list(sheet.values), [(None, 'студент', 'балл'), (0, 'admin', 75)])
+
+
+class TestCloningTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', password='password')
+        Profile.objects.filter(user=self.teacher).update(type=2)
+        other = User.objects.create_user(username='other')
+        Profile.objects.filter(user=other).update(type=2)
+        subject = Subject.objects.create(name='Алгебра')
+        self.lessons = []
+        for number, teacher in (('101', self.teacher), ('102', self.teacher), ('103', other)):
+            course = TeacherGroupSubject.objects.create(
+                teacher=teacher, subject=subject, group=Group.objects.create(number=number))
+            self.lessons.append(Lesson.objects.create(type='LC', name='Матрицы', subject=course))
+
+        self.test = Test.objects.create(name='Матрицы', max_attempts=2, shuffle=True)
+        self.lessons[0].test = self.test
+        self.lessons[0].save()
+        topic = Topic.objects.create(name='Определители')
+        TestTopicRule.objects.create(test=self.test, topic=topic, count=3)
+        questions = Question.objects.bulk_create([
+            Question(test=self.test, type='CH', text=f'Вопрос {number}', topic=topic) for number in range(100)
+        ])
+        Answer.objects.bulk_create([
+            Answer(question=question, text=text, correct=(number + shift) % 2 == 0)
+            for number, question in enumerate(questions) for shift, text in enumerate(['да', 'нет'])
+        ])
+
+    def test_deep_copy_in_constant_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            clones = clone_test(self.test, copies=2)
+        self.assertLess(len(queries), 20)
+        self.assertEqual([clone.name for clone in clones], ['Матрицы (копия 1)', 'Матрицы (копия 2)'])
+
+        for clone in clones:
+            clone = Test.objects.get(pk=clone.pk)
+            self.assertEqual((clone.max_attempts, clone.shuffle), (2, True))
+            self.assertEqual(clone.questions.count(), 100)
+            self.assertEqual(Answer.objects.filter(question__test=clone).count(), 200)
+            self.assertEqual(list(clone.topic_rules.values_list('topic__name', 'count')), [('Определители', 3)])
+            correct = Answer.objects.filter(question__test=clone, correct=True).order_by('question_id')
+            self.assertEqual([answer.text for answer in correct][:2], ['да', 'нет'])
+        self.assertEqual(Question.objects.filter(test=self.test).count(), 100)
+        self.assertTrue(SearchEntry.objects.filter(kind='test', object_id=clones[0].pk).exists())
+
+    def test_clone_to_lessons_via_api(self):
+        self.client.login(username='teacher', password='password')
+        url = reverse('api-test-clone', kwargs={'pk': self.test.pk})
+        response = self.client.post(url, {'lessons': [self.lessons[1].pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        created = response.data['tests'][0]
+        self.assertEqual((created['name'], created['lesson']), ('Матрицы (группа 102)', self.lessons[1].pk))
+        self.assertEqual(Lesson.objects.get(pk=self.lessons[1].pk).test.questions.count(), 100)
+
+        # Чужое занятие и занятие, у которого уже есть тест
+        response = self.client.post(url, {'lessons': [self.lessons[2].pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'lessons': [self.lessons[1].pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_clone_form(self):
+        self.client.login(username='teacher', password='password')
+        response = self.client.get(reverse('test', kwargs={'pk': self.test.pk}))
+        self.assertEqual(list(response.context['clone_form'].fields['lessons'].queryset), [self.lessons[1]])
+
+        response = self.client.post(reverse('test-clone', kwargs={'pk': self.test.pk}), {'copies': 1})
+        clone = Test.objects.get(name='Матрицы (копия)')
+        self.assertRedirects(response, reverse('test', kwargs={'pk': clone.pk}), fetch_redirect_response=False)
+
+    def test_admin_form_for_test_without_lesson(self):
+        admin = User.objects.create_user(username='admin', password='password')
+        Profile.objects.filter(user=admin).update(type=1)
+        free = Test.objects.create(name='Ранг')
+        self.client.login(username='admin', password='password')
+        response = self.client.get(reverse('test', kwargs={'pk': free.pk}))
+        self.assertEqual(set(response.context['clone_form'].fields['lessons'].queryset), set(self.lessons[1:]))
+
+        self.client.post(reverse('test-clone', kwargs={'pk': free.pk}), {'lessons': [self.lessons[2].pk]})
+        self.assertEqual(Lesson.objects.get(pk=self.lessons[2].pk).test.name, 'Ранг (группа 103)')
+
+
+class CourseCloneTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', password='password')
+        Profile.objects.filter(user=self.teacher).update(type=2)
+        subject = Subject.objects.create(name='Алгебра')
+        self.source, self.target, self.target2 = [
+            TeacherGroupSubject.objects.create(teacher=self.teacher, subject=subject, group=Group.objects.create(number=number))
+            for number in ('101', '102', '103')
+        ]
+        self.deadline = timezone.now()
+        self.test = Test.objects.create(name='Матрицы')
+        question = Question.objects.create(test=self.test, type='CH', text='2 + 2')
+        Answer.objects.create(question=question, text='4', correct=True)
+        self.lesson = Lesson.objects.create(type='LC', name='Матрицы', subject=self.source, deadline=self.deadline,
+                                            test=self.test)
+        Lesson.objects.create(type='PR', name='Определители', subject=self.source)
+        LessonFile.objects.create(lesson=self.lesson, file='lessons/files/matrix.pdf')
+
+    def test_job_clones_lessons(self):
+        self.client.login(username='teacher', password='password')
+        response = self.client.post(reverse('api-course-clone', kwargs={'pk': self.source.pk}),
+                                    {'targets': [self.target.pk, self.target2.pk], 'offset_days': 7}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+
+        self.assertEqual(run_pending(), 1)
+        job = self.client.get(reverse('api-job', kwargs={'pk': response.data['id']})).data
+        self.assertEqual((job['status'], job['done'], job['total']), ('done', 3, 3))
+        self.assertEqual(job['result'], {'lessons': 4, 'tests': 2})
+
+        copy = Lesson.objects.get(subject=self.target, name='Матрицы')
+        self.assertEqual(copy.deadline, self.deadline + timedelta(days=7))
+        self.assertEqual(copy.files.get().file.name, 'lessons/files/matrix.pdf')
+        self.assertNotEqual(copy.test_id, self.test.pk)
+        self.assertEqual(copy.test.name, 'Матрицы (группа 102)')
+        self.assertTrue(Answer.objects.filter(question__test=copy.test, correct=True).exists())
+        self.assertIsNone(Lesson.objects.get(subject=self.target2, name='Определители').deadline)
+        self.assertEqual(Lesson.objects.get(pk=self.lesson.pk).test_id, self.test.pk)
+
+    def test_interrupted_job_resumes(self):
+        # Процесс перезапустили после копирования занятий в первую группу
+        job = enqueue(Job.Kind.COURSE_CLONE, self.teacher, source=self.source.pk,
+                      targets=[self.target.pk, self.target2.pk], offset_days=0)
+        first = clone_course(self.source, [self.target], progress=lambda *args: None)
+        stale = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.RUNNING, attempts=1, heartbeat_at=stale, done=1,
+            checkpoint={'copies': {str(self.target.pk): list(
+                Lesson.objects.filter(subject=self.target).order_by('pk').values_list('pk', flat=True))}, 'tests': []})
+        Lesson.objects.filter(subject=self.target, name='Матрицы').update(test=None)
+        Test.objects.filter(name__endswith='(группа 102)').delete()
+        self.assertEqual(first['lessons'], 2)
+
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.done), (Job.Status.DONE, 2, 3))
+        self.assertEqual(Lesson.objects.filter(subject=self.target).count(), 2)
+        self.assertEqual(Lesson.objects.filter(subject=self.target2).count(), 2)
+        self.assertEqual(Test.objects.filter(name__startswith='Матрицы (группа').count(), 2)
+
+        Job.objects.filter(pk=job.pk).update(status=Job.Status.RUNNING, attempts=3, heartbeat_at=stale)
+        with self.assertLogs('study.jobs', 'WARNING'):
+            self.assertEqual(run_pending(), 0)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.Status.FAILED)
+
+    def test_foreign_target_rejected(self):
+        other = User.objects.create_user(username='other')
+        Profile.objects.filter(user=other).update(type=2)
+        self.target.teacher = other
+        self.target.save()
+        self.client.login(username='teacher', password='password')
+        response = self.client.post(reverse('course-clone', kwargs={'pk': self.source.pk}),
+                                    {'targets': [self.target.pk], 'offset_days': 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)  # форма с ошибкой
+        self.assertFalse(Job.objects.exists())
+
+        response = self.client.post(reverse('course-clone', kwargs={'pk': self.source.pk}),
+                                    {'targets': [self.target2.pk], 'offset_days': 0})
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job', kwargs={'pk': job.pk}), fetch_redirect_response=False)
+
+
+class TestAuthoringTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', password='password')
+        Profile.objects.filter(user=self.teacher).update(type=2)
+        self.client.login(username='teacher', password='password')
+        self.document = {
+            'format': 'ladutsko-test', 'version': 1,
+            'test': {'name': 'Матрицы', 'max_attempts': 2, 'shuffle': True},
+            'rules': [{'topic': 'Определители', 'count': 2}],
+            'questions': [
+                {'type': 'CH', 'text': f'Вопрос {number}', 'topic': 'Определители', 'answers': [
+                    {'text': 'да', 'correct': True}, {'text': 'нет = ~ {}', 'correct': False},
+                ]} for number in range(300)
+            ] + [{'type': 'TX', 'text': 'Почему?'}, {'type': 'TX', 'text': 'Столица?', 'answers': [{'text': 'Минск'}]}],
+        }
+
+    def test_import_and_export_round_trip(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('api-tests-import'), self.document, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['questions'], 302)
+        self.assertLess(len(queries), 40)
+
+        test = Test.objects.get(pk=response.data['id'])
+        self.assertEqual(Answer.objects.filter(question__test=test).count(), 602)
+        self.assertEqual(list(test.topic_rules.values_list('topic__name', 'count')), [('Определители', 2)])
+        self.assertEqual(Question.objects.get(test=test, text='Почему?').answers.get().text, 'Ответ')
+        self.assertTrue(SearchEntry.objects.filter(kind='question', parent_id=test.pk).exists())
+
+        exported = self.client.get(reverse('api-test-export', kwargs={'pk': test.pk})).data
+        self.assertEqual(exported['questions'][0], self.document['questions'][0])
+        self.assertEqual(exported['rules'], self.document['rules'])
+
+        gift = self.client.get(reverse('api-test-export', kwargs={'pk': test.pk}), {'type': 'gift'}).content
+        upload = SimpleUploadedFile('copy.gift', gift)
+        response = self.client.post(reverse('api-tests-import'), {'file': upload, 'name': 'Копия'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        copy = export_test(Test.objects.get(pk=response.data['id']))
+        self.assertEqual(copy['test']['name'], 'Копия')
+        self.assertEqual(copy['questions'], exported['questions'])
+
+    def test_validation_reports_all_errors(self):
+        self.document['questions'][3]['type'] = 'XX'
+        self.document['questions'][5]['answers'][0]['text'] = ''
+        self.document['test']['max_attempts'] = 0
+        self.document['rules'].append({'topic': 'Ранг', 'count': 1})
+        response = self.client.post(reverse('api-tests-import'), self.document, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['errors']), 4)
+        self.assertIn('rules[1].topic: в документе нет вопросов темы Ранг', response.data['errors'])
+        self.assertIn('questions[5].answers[0].text: обязательное поле', response.data['errors'])
+        self.assertFalse(Test.objects.exists())
+
+    def test_gift_questions_appended_to_test(self):
+        test = Test.objects.create(name='Алгебра')
+        data = parse_gift(
+            "// комментарий\n$CATEGORY: Матрицы\n\n"
+            "::Q1:: 2 + 2 = ? {=4 ~3 ~5#неверно}\n\n"
+            "Выберите четные {~%50%2 ~%50%4 ~%-100%3}\n\n"
+            "Опишите метод Гаусса {}\n\n"
+            "Столица Беларуси? {=Минск}\n"
+        )
+        self.assertEqual([question['type'] for question in data['questions']], ['CH', 'CH', 'TX', 'TX'])
+        self.assertEqual(data['questions'][0]['answers'][2], {'text': '5', 'correct': False})
+        self.assertEqual([answer['correct'] for answer in data['questions'][1]['answers']], [True, True, False])
+
+        response = self.client.post(reverse('api-test-questions-bulk', kwargs={'pk': test.pk}),
+                                    {'questions': data['questions']}, format='json')
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual(test.questions.filter(topic__name='Матрицы').count(), 4)
+        self.assertEqual(test.questions.get(text='2 + 2 = ?').answers.get(correct=True).text, '4')
+
+        with self.assertRaises(AuthoringError):
+            parse_gift("Земля круглая {T}")
+
+
+class StudentWorksArchiveTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=media.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.teacher = User.objects.create_user(username='teacher', password='password')
+        Profile.objects.filter(user=self.teacher).update(type=2)
+        course = TeacherGroupSubject.objects.create(
+            teacher=self.teacher, subject=Subject.objects.create(name='Алгебра'), group=Group.objects.create(number='101'))
+        self.lesson = Lesson.objects.create(type='IW', name='Матрицы', subject=course)
+        self.course = course
+        self.students = [
+            User.objects.create_user(username=f'student{number}', first_name='Иван', last_name='Петров')
+            for number in range(3)
+        ]
+        for number, student in enumerate(self.students):
+            StudentIndividualWork.objects.create(
+                user=student, lesson=self.lesson, file=SimpleUploadedFile(f'work{number}.pdf', b'%PDF' * (number + 1)))
+
+    def test_lesson_archive(self):
+        missing = StudentIndividualWork.objects.get(user=self.students[2])
+        missing.file.storage.delete(missing.file.name)
+
+        self.client.login(username='teacher', password='password')
+        response = self.client.get(reverse('lesson-works-download', kwargs={'pk': self.lesson.pk}))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with self.assertLogs('study.archives', level='WARNING'):
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), [
+            'Матрицы/Петров Иван (student0).pdf', 'Матрицы/Петров Иван (student1).pdf', 'не_найдены.txt',
+        ])
+        self.assertEqual(archive.read('Матрицы/Петров Иван (student1).pdf'), b'%PDF%PDF')
+        self.assertEqual(archive.read('не_найдены.txt').decode(), 'Матрицы/Петров Иван (student2).pdf')
+
+        response = self.client.get(reverse('api-course-works-download', kwargs={'pk': self.course.pk}))
+        with self.assertLogs('study.archives', level='WARNING'):
+            content = b''.join(response.streaming_content)
+        self.assertEqual(len(zipfile.ZipFile(io.BytesIO(content)).namelist()), 3)
+
+    def test_stream_is_chunked(self):
+        work = StudentIndividualWork.objects.create(
+            user=self.students[0], lesson=self.lesson, file=SimpleUploadedFile('big.bin', b'x' * (CHUNK_SIZE * 20)))
+        chunks = list(stream_zip([('big.bin', work.file)]))
+        self.assertGreater(len(chunks), 20)
+        self.assertLess(max(len(chunk) for chunk in chunks), CHUNK_SIZE * 2)
+        self.assertEqual(zipfile.ZipFile(io.BytesIO(b''.join(chunks))).read('big.bin'), b'x' * (CHUNK_SIZE * 20))
+
+
+class BackgroundDeletionTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = User.objects.create_user(username='admin', password='password')
+        Profile.objects.filter(user=self.admin).update(type=1)
+        teacher = User.objects.create_user(username='teacher')
+        self.group = Group.objects.create(number='101')
+        other_group = Group.objects.create(number='102')
+        subject = Subject.objects.create(name='Алгебра')
+        course = TeacherGroupSubject.objects.create(teacher=teacher, subject=subject, group=self.group)
+        other_course = TeacherGroupSubject.objects.create(teacher=teacher, subject=subject, group=other_group)
+
+        self.test = Test.objects.create(name='Матрицы')
+        question = Question.objects.create(test=self.test, type='CH', text='2 + 2')
+        answer = Answer.objects.create(question=question, text='4', correct=True)
+        self.lessons = [Lesson.objects.create(type='LC', name=f'Лекция {number}', subject=course) for number in range(5)]
+        self.lessons[0].test = self.test
+        self.lessons[0].save()
+        shared = LessonFile.objects.create(lesson=self.lessons[0], file=SimpleUploadedFile('shared.pdf', b'%PDF'))
+        self.own = LessonFile.objects.create(lesson=self.lessons[1], file=SimpleUploadedFile('own.pdf', b'%PDF'))
+        # Копия занятия в другой группе ссылается на тот же файл
+        copy = Lesson.objects.create(type='LC', name='Лекция 0', subject=other_course)
+        LessonFile.objects.create(lesson=copy, file=shared.file.name)
+        self.shared = shared
+
+        student = User.objects.create_user(username='student')
+        self.group.students.add(student)
+        for _ in range(3):
+            submit(student, self.test, {str(answer.pk): 'on'})
+
+    def test_group_removed_in_chunks(self):
+        self.client.login(username='admin', password='password')
+        self.client.get(reverse('group-delete', kwargs={'pk': self.group.pk}))
+        self.assertFalse(Group.objects.filter(pk=self.group.pk).exists())
+        self.assertTrue(Group.all_objects.filter(pk=self.group.pk).exists())
+        self.assertEqual(Job.objects.get().params, {'model': 'group', 'pk': self.group.pk})
+
+        with CaptureQueriesContext(connection) as queries:
+            deleted = purge(Group, self.group.pk, chunk_size=2)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('DELETE FROM "study_lesson"')]), 3)
+        self.assertGreaterEqual(deleted, 8)
+        self.assertFalse(Group.all_objects.filter(pk=self.group.pk).exists())
+        self.assertEqual(Lesson.all_objects.filter(subject__group_id=self.group.pk).count(), 0)
+        self.assertEqual(Lesson.objects.count(), 1)
+        self.assertTrue(Test.objects.filter(pk=self.test.pk).exists())  # тест занятия остается, как при каскаде
+
+        storage = self.shared.file.storage
+        self.assertFalse(storage.exists(self.own.file.name))
+        self.assertTrue(storage.exists(self.shared.file.name))
+
+    def test_test_deleted_by_job(self):
+        self.client.login(username='admin', password='password')
+        response = self.client.delete(reverse('api-test-delete', kwargs={'pk': self.test.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertIsNone(Lesson.objects.get(pk=self.lessons[0].pk).test_id)
+        self.assertFalse(Test.objects.filter(pk=self.test.pk).exists())
+        self.assertEqual(Try.objects.filter(test_id=self.test.pk).count(), 3)
+
+        self.assertEqual(run_pending(), 1)
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.Status.DONE)
+        self.assertFalse(Test.all_objects.filter(pk=self.test.pk).exists())
+        self.assertFalse(Try.objects.filter(test_id=self.test.pk).exists())
+        self.assertFalse(Answer.objects.exists())
+
+
+class ArchivalTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', password='password')
+        Profile.objects.filter(user=self.admin).update(type=1)
+        teacher = User.objects.create_user(username='teacher')
+        group = Group.objects.create(number='101')
+        subject = Subject.objects.create(name='Алгебра')
+        self.course = TeacherGroupSubject.objects.create(teacher=teacher, subject=subject, group=group)
+
+        self.test = Test.objects.create(name='Матрицы')
+        question = Question.objects.create(test=self.test, type='CH', text='2 + 2')
+        right = Answer.objects.create(question=question, text='4', correct=True)
+        wrong = Answer.objects.create(question=question, text='5')
+        self.lesson = Lesson.objects.create(type='LC', name='Лекция', subject=self.course, test=self.test)
+
+        self.student = User.objects.create_user(username='student', password='password')
+        Profile.objects.filter(user=self.student).update(type=3)
+        group.students.add(self.student)
+        submit(self.student, self.test, {str(wrong.pk): 'on'})
+        submit(self.student, self.test, {str(right.pk): 'on'})
+        submit(self.student, self.test, {str(wrong.pk): 'on'})
+        self.best = self.lesson.get_test_user_best_try(self.student)
+
+    def close(self):
+        self.client.login(username='admin', password='password')
+        response = self.client.post(reverse('api-course-close', kwargs={'pk': self.course.pk}), {'closed': True},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.course.refresh_from_db()
+
+    def test_reopen_with_form_data(self):
+        self.close()
+        url = reverse('api-course-close', kwargs={'pk': self.course.pk})
+        for value in ('false', '0'):
+            TeacherGroupSubject.objects.filter(pk=self.course.pk).update(closed_at=timezone.now())
+            response = self.client.post(url, {'closed': value})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIsNone(TeacherGroupSubject.objects.get(pk=self.course.pk).closed_at)
+
+        self.assertEqual(self.client.post(url, {'closed': 'maybe'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_archive_requires_closed_course(self):
+        with self.assertRaises(ArchiveError):
+            archive_course(self.course)
+        self.client.login(username='admin', password='password')
+        response = self.client.post(reverse('api-course-archive', kwargs={'pk': self.course.pk}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_archive_keeps_rollup(self):
+        self.close()
+        response = self.client.post(reverse('api-course-archive', kwargs={'pk': self.course.pk}))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(Job.objects.get().result, {'tries': 3})
+
+        self.assertFalse(Try.objects.exists())
+        self.assertFalse(StudentAnswer.objects.exists())
+        rollup = GradeRollup.objects.get()
+        self.assertEqual((rollup.attempts, rollup.best_score, rollup.test_name), (3, self.best, 'Матрицы'))
+        self.assertEqual(Lesson.objects.get(pk=self.lesson.pk).get_test_user_best_try(self.student), self.best)
+
+        tries = archived_tries(self.course, self.student)
+        self.assertEqual(len(tries), 3)
+        self.assertEqual([len(row['results']) for row in tries], [1, 1, 1])
+        self.assertFalse(QuestionResult.objects.exists())
+
+    def test_average_score_reads_rollups_once(self):
+        for number in range(3):
+            Lesson.objects.create(type='LC', name=f'Лекция {number}', subject=self.course,
+                                  test=Test.objects.create(name=f'Тест {number}'))
+        course = TeacherGroupSubject.objects.get(pk=self.course.pk)
+        with CaptureQueriesContext(connection) as queries:
+            course.get_user_average_score(self.student)
+        rollup_queries = [query for query in queries if 'study_graderollup' in query['sql']]
+        self.assertEqual(len(rollup_queries), 1)
+
+    def test_archive_keeps_attempt_limit(self):
+        Test.objects.filter(pk=self.test.pk).update(max_attempts=3)
+        self.close()
+        with self.assertRaisesMessage(ExamError, 'Дисциплина закрыта'):
+            start_session(self.student, Test.objects.get(pk=self.test.pk))
+        archive_course(self.course)
+
+        TeacherGroupSubject.objects.filter(pk=self.course.pk).update(closed_at=None)
+        self.assertEqual(Lesson.objects.get(pk=self.lesson.pk).get_test_user_best_try(self.student), self.best)
+        with self.assertRaisesMessage(ExamError, 'Попытки закончились'):
+            start_session(self.student, Test.objects.get(pk=self.test.pk))
+
+    def test_transcript_reads_archive(self):
+        self.close()
+        archive_course(self.course, batch_size=2)
+        self.assertEqual(ArchiveBatch.objects.count(), 2)
+
+        self.client.login(username='student', password='password')
+        response = self.client.get(reverse('api-transcript'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        row, = response.data['transcript']
+        self.assertEqual((row['test_id'], row['attempts'], row['best_score'], row['archived']),
+                         (self.test.pk, 3, self.best, True))
+        self.assertEqual(self.client.get(reverse('api-student-transcript', kwargs={'pk': self.student.pk})).status_code,
+                         status.HTTP_403_FORBIDDEN)
+
+        self.client.login(username='admin', password='password')
+        response = self.client.get(reverse('api-student-transcript', kwargs={'pk': self.student.pk}))
+        self.assertEqual(response.data['transcript'][0]['attempts'], 3)
+
+    def test_restore_returns_tries(self):
+        self.close()
+        pks = set(Try.objects.values_list('pk', flat=True))
+        results = QuestionResult.objects.count()
+        archive_course(self.course, batch_size=2)
+        self.assertEqual(restore_course(self.course), 3)
+        self.assertEqual(set(Try.objects.values_list('pk', flat=True)), pks)
+        self.assertEqual(QuestionResult.objects.count(), results)
+        self.assertFalse(ArchiveBatch.objects.exists())
+        self.assertFalse(GradeRollup.objects.exists())
+
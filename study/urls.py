@@ -21,6 +21,7 @@ urlpatterns = [
     path("groups/", views.GroupsListView.as_view(), name="groups"),
     path("group/<int:pk>/", views.GroupEditView.as_view(), name="group"),
     path("group/<int:pk>/students/", views.GroupStudentsListView.as_view(), name="group-students"),
+    path("group/<int:pk>/roster/", views.GroupRosterView.as_view(), name="group-roster"),
     path("group/delete/<int:pk>/", views.delete_group, name="group-delete"),
     path("group/add/", views.GroupCreateView.as_view(), name="group-add"),
     path("group/<int:pk>/add-subject", views.TeacherGroupSubjectCreateView.as_view(), name="group-add-subject"),
@@ -43,6 +44,8 @@ urlpatterns = [
     path("lesson/remove-video/<int:pk>/", views.delete_lesson_video, name="lesson-remove-video"),
     path("lesson/remove-file/<int:pk>/", views.delete_lesson_file, name="lesson-remove-file"),
     path("lesson/check-work/<int:pk>/", views.CheckStudentWork.as_view(), name="lesson-check-work"),
+    path("lesson/<int:pk>/works/download/", views.download_lesson_works, name="lesson-works-download"),
+    path("course/<int:pk>/works/download/", views.download_course_works, name="course-works-download"),
 
     path("tests/", views.TestsListView.as_view(), name="tests"),
     path("test/<int:pk>/", views.TestEditView.as_view(), name="test"),
@@ -52,6 +55,10 @@ urlpatterns = [
     path("test/<int:test_pk>/question/<int:question_pk>/", views.TestQuestionEditView.as_view(), name="test-question"),
     path("test/<int:test_pk>/question/<int:question_pk>/delete", views.delete_question, name="test-question-delete"),
     path("test/<int:test_id>/download-tries/", views.download_test_tries, name="test-download-tries"),
+    path("test/<int:pk>/regrade/", views.regrade_test_tries, name="test-regrade"),
+    path("test/<int:pk>/clone/", views.clone_test_view, name="test-clone"),
+    path("test/<int:pk>/export/", views.export_test_view, name="test-export"),
+    path("tests/import/", views.TestImportView.as_view(), name="tests-import"),
 
     path("test/try/<int:pk>/check/", views.CheckTestView.as_view(), name="test-try-check"),
 
@@ -70,6 +77,8 @@ urlpatterns = [
     path("teacher/my-tests/", views.MyTestsListView.as_view(), name="my-tests"),
     path("teacher/my-subject/<int:pk>/add-to-group/", views.MySubjectAddToGroupView.as_view(), name="my-subject-add-to-group"),
     path("teacher/my-subject/<int:pk>/remove-from-group/", views.remove_my_subject_from_group, name="my-subject-remove-from-group"),
+    path("course/<int:pk>/clone/", views.CourseCloneView.as_view(), name="course-clone"),
+    path("job/<int:pk>/", views.JobView.as_view(), name="job"),
 
 
     path("subject/<int:subject_id>/remove-from-group/", views.remove_subject_from_group, name="remove-subject-from-group"),
@@ -79,6 +88,9 @@ urlpatterns = [
     path("student/lesson/<int:pk>/", views.StudentLessonView.as_view(), name="student-lesson"),
     path("student/lesson/<int:pk>/individual-work/", views.StudentIndividualWorkView.as_view(), name="student-individual-work"),
     path("student/test/<int:pk>/", views.StudentTestView.as_view(), name="student-test"),
+    path("student/deadlines/", views.StudentDeadlinesView.as_view(), name="student-deadlines"),
+    path("student/deadlines.ics", views.StudentDeadlinesCalendarView.as_view(), name="student-deadlines-ical"),
 
+    path("search/", views.SearchView.as_view(), name="search"),
     path("about/", views.about, name="about"),
 ]
@@ -1,4 +1,3 @@
-import pandas as pd
 from datetime import datetime as dt
 from django.conf import settings
 from django.contrib import messages
@@ -16,15 +15,29 @@ from django.views.generic import ListView
 
 from accounts.forms import UserEditForm, UserCreateForm, ProfileEditForm
 from accounts.models import Application
+from .archives import course_works, lesson_works, zip_response
+from .authoring import EXPORTERS, AuthoringError, export_test, import_test, read_document
+from .cloning import CloneError, clone_test, get_target_courses, get_target_lessons
+from .cache import FRAGMENT_TIMEOUT, get_version, version_to_datetime, conditional_response, set_conditional_headers
+from .deletion import delete_later
+from .deadlines import get_deadline_rows, split_deadlines, to_ical
+from .delivery import get_student_payload
+from .excel import read_rows, write_table
+from .exams import ExamError, start_session, submit
+from .items import get_item_analysis
+from .jobs import enqueue
+from .regrade import has_regradable_tries, regrade_test
+from .roster import RosterError, import_roster, move_students, remove_students, set_student_group
+from .search import search
 from .decorators.is_admin import admin_only
 from .decorators.is_not_student import not_student
 from .decorators.is_teacher import teacher_only
 from .forms import (
     StudentForm, GroupForm, SubjectForm, LessonForm, QuestionForm, AnswerForm,
     ExcelForm, TeacherGroupSubjectForm,
-    GroupForTeacherSubjectForm, TestForm, StudentWorkForm)
+    GroupForTeacherSubjectForm, TestForm, StudentWorkForm, RosterForm, TestCloneForm, CourseCloneForm, TestImportForm)
 from .models import Group, TeacherGroupSubject, Subject, Lesson, LessonPhoto, Test, Question, Answer, Try, LessonVideo, \
-    StudentAnswer, LessonFile, StudentIndividualWork
+    StudentAnswer, LessonFile, StudentIndividualWork, Job
 
 
 class IndexView(LoginRequiredMixin, View):
@@ -60,7 +73,10 @@ class IndexView(LoginRequiredMixin, View):
                 request,
                 "study/index.html",
                 {
-                    "menu": {subject.name_for_student: reverse_lazy("student-subject", kwargs={"pk": subject.pk}) for subject in user.group_set.first().subjects.all()}
+                    "menu": {
+                        **{subject.name_for_student: reverse_lazy("student-subject", kwargs={"pk": subject.pk}) for subject in user.group_set.first().subjects.all()},
+                        "Сроки сдачи": reverse_lazy("student-deadlines"),
+                    }
                 }
             )
 
@@ -159,7 +175,7 @@ def delete_teacher(request, pk):
 
     teacher = get_object_or_404(User, pk=pk)
     username = teacher.username
-    teacher.delete()
+    delete_later(teacher, request.user)
     messages.success(request, f"Преподаватель {username} удален!")
 
     return redirect(reverse("teachers"))
@@ -188,18 +204,8 @@ class StudentEditView(LoginRequiredMixin, View):
             user.username = user.email
             user.save()
 
-            group = profile_form.cleaned_data.get("group")
-            user_group = user.group_set.first()
             profile_form.save()
-
-            if group:
-                if not(user in group.students.all()):
-                    if user_group:
-                        user_group.students.remove(user)
-                    group.students.add(user)
-            else:
-                if user_group:
-                    user_group.students.remove(user)
+            set_student_group(user, profile_form.cleaned_data.get("group"))
 
             messages.success(request, "Пользователь успешно изменен!")
 
@@ -208,16 +214,13 @@ class StudentEditView(LoginRequiredMixin, View):
     def get(self, request, pk, *args, **kwargs):
         student = get_object_or_404(User, pk=pk)
         user_form = UserEditForm(instance=student)
-        profile_form = StudentForm(instance=student.profile)
-
         student_group = student.group_set.first()
-        groups = Group.objects.all()
+        profile_form = StudentForm(instance=student.profile, initial={"group": getattr(student_group, "pk", None)})
 
         return render(request, "study/student-edit.html", {
             "user_form": user_form,
             "profile_form": profile_form,
             "student_group": student_group,
-            "groups": groups,
             "student": student,
         })
 
@@ -243,7 +246,7 @@ class StudentCreateView(LoginRequiredMixin, View):
 
             group = profile_form.cleaned_data.get("group")
             if group:
-                group.students.add(new_user)
+                set_student_group(new_user, group)
 
             try:
                 send_mail(
@@ -263,11 +266,9 @@ class StudentCreateView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         user_form = UserCreateForm()
         profile_form = StudentForm()
-        groups = Group.objects.all()
         return render(request, "study/student-add.html", {
             "user_form": user_form,
             "profile_form": profile_form,
-            "groups": groups,
         })
 
 
@@ -276,7 +277,7 @@ def delete_student(request, pk):
 
     student = get_object_or_404(User, pk=pk)
     username = student.username
-    student.delete()
+    delete_later(student, request.user)
     messages.success(request, f"Студент {username} удален!")
 
     return redirect(reverse("students"))
@@ -298,19 +299,18 @@ class ApplicationView(LoginRequiredMixin, View):
             "last_name": application.last_name,
             "email": application.email
         })
+        group = Group.objects.filter(number=application.group_number).first()
         profile_form = StudentForm(initial={
             "middle_name": application.middle_name,
-            "group": application.group_number
+            "group": group.pk if group else None,
         })
-        groups = Group.objects.all()
 
-        if not(Group.objects.filter(number=application.group_number).first()):
+        if not group:
             messages.error(request, "Пользователь указал несуществующую группу!")
 
         return render(request, "study/application.html", {
             "user_form": user_form,
             "profile_form": profile_form,
-            "groups": groups,
             "application": application
         })
 
@@ -362,14 +362,47 @@ class GroupStudentsListView(LoginRequiredMixin, ListView):
         return super(GroupStudentsListView, self).dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        return self.group.students.all()
+        return self.group.students.select_related("profile")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["group"] = self.group
+        context["roster_form"] = RosterForm()
         return context
 
 
+@method_decorator(admin_only, name="dispatch")
+class GroupRosterView(LoginRequiredMixin, View):
+    def post(self, request, pk, *args, **kwargs):
+        group = get_object_or_404(Group, pk=pk)
+        form = RosterForm(request.POST, request.FILES)
+        action = request.POST.get("action")
+        students = request.POST.getlist("students")
+        if not form.is_valid():
+            messages.error(request, "Неверно введены данные!")
+            return redirect(reverse("group-students", kwargs={"pk": pk}))
+
+        try:
+            if action == "import" and form.cleaned_data["file"]:
+                result = import_roster(group, form.cleaned_data["file"])
+            elif action == "move" and form.cleaned_data["target"]:
+                result = move_students(group, form.cleaned_data["target"], students or None)
+            elif action == "remove":
+                result = remove_students(group, students)
+            else:
+                messages.error(request, "Неверно введены данные!")
+                return redirect(reverse("group-students", kwargs={"pk": pk}))
+        except RosterError as err:
+            messages.error(request, str(err))
+            return redirect(reverse("group-students", kwargs={"pk": pk}))
+
+        messages.success(
+            request, f"Добавлено: {result.added}, переведено: {result.moved}, исключено: {result.removed}")
+        if result.unknown:
+            messages.warning(request, f"Не найдены студенты: {', '.join(map(str, result.unknown))}")
+        return redirect(reverse("group-students", kwargs={"pk": pk}))
+
+
 @method_decorator(admin_only, name="dispatch")
 class GroupsListView(LoginRequiredMixin, ListView):
     model = Group
@@ -393,9 +426,6 @@ class GroupEditView(LoginRequiredMixin, View):
         form = GroupForm(instance=group)
         subjects_form = TeacherGroupSubjectForm()
 
-        teachers = User.objects.filter(profile__type=2)
-        subjects = Subject.objects.all()
-
         return render(
             request,
             "study/group/edit.html",
@@ -403,8 +433,6 @@ class GroupEditView(LoginRequiredMixin, View):
                 "form": form,
                 "subjects_form": subjects_form,
                 "group": group,
-                "teachers": teachers,
-                "subjects": subjects,
             }
         )
 
@@ -431,7 +459,7 @@ def delete_group(request, pk):
 
     group = get_object_or_404(Group, pk=pk)
     number = group.number
-    group.delete()
+    delete_later(group, request.user)
     messages.success(request, f"Группа {number} удалена!")
 
     return redirect(reverse("groups"))
@@ -512,19 +540,24 @@ class LessonsListView(LoginRequiredMixin, ListView):
     model = Lesson
     context_object_name = "objects"
     template_name = "study/lesson/list.html"
+    paginate_by = 50
 
     def get_queryset(self):
-        qs = super().get_queryset()
         subject_pk = self.request.GET.get("subject_pk")
         if subject_pk:
-            subject = get_object_or_404(TeacherGroupSubject, pk=subject_pk)
-            qs = qs.filter(subject=subject)
-        return qs
+            get_object_or_404(TeacherGroupSubject, pk=subject_pk)
+        return (
+            Lesson.objects.for_listing()
+            .filter_by_params(self.request.GET)
+            .ordered_by_param(self.request.GET.get("ordering"))
+        )
 
-    def get_ordering(self):
-        ordering = self.request.GET.get('ordering', '')
-        # validate ordering here
-        return ordering
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["types"] = Lesson.Type.choices
+        context["groups"] = Group.objects.order_by("number")
+        context["params"] = self.request.GET
+        return context
 
 
 @method_decorator(admin_only, name="dispatch")
@@ -562,8 +595,6 @@ class LessonEditView(LoginRequiredMixin, View):
     def get(self, request, pk, *args, **kwargs):
         lesson = get_object_or_404(Lesson, pk=pk)
         form = LessonForm(instance=lesson)
-        subjects = TeacherGroupSubject.objects.all()
-        tests = Test.objects.filter(lesson__isnull=True)
         types = Lesson.type.field.choices
         photos = lesson.photos.all()
         videos = lesson.videos.all()
@@ -572,8 +603,6 @@ class LessonEditView(LoginRequiredMixin, View):
         return render(request, "study/lesson/edit.html", {
             "form": form,
             "lesson": lesson,
-            "subjects": subjects,
-            "tests": tests,
             "types": types,
             "photos": photos,
             "videos": videos,
@@ -618,14 +647,10 @@ class LessonCreateView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
 
         form = LessonForm()
-        subjects = TeacherGroupSubject.objects.all()
-        tests = Test.objects.filter(lesson__isnull=True)
         types = Lesson.type.field.choices
 
         return render(request, "study/lesson/add.html", {
             "form": form,
-            "subjects": subjects,
-            "tests": tests,
             "types": types
         })
 
@@ -667,7 +692,7 @@ def delete_lesson(request, pk):
 
     lesson = get_object_or_404(Lesson, pk=pk)
     name = lesson.name
-    lesson.delete()
+    delete_later(lesson, request.user)
     messages.success(request, f"Занятие {name} удалено!")
 
     return redirect(reverse("lessons"))
@@ -697,6 +722,18 @@ class CheckStudentWork(LoginRequiredMixin, View):
         })
 
 
+@not_student
+def download_lesson_works(request, pk):
+    lesson = get_object_or_404(Lesson, pk=pk)
+    return zip_response(lesson_works(lesson), f"Работы - {lesson.name}")
+
+
+@not_student
+def download_course_works(request, pk):
+    course = get_object_or_404(TeacherGroupSubject.objects.select_related("subject", "group"), pk=pk)
+    return zip_response(course_works(course), f"Работы - {course.subject.name}, группа {course.group.number}")
+
+
 @method_decorator(not_student, name="dispatch")
 class TestsListView(LoginRequiredMixin, ListView):
     model = Test
@@ -721,9 +758,43 @@ class TestEditView(LoginRequiredMixin, View):
         return render(request, "study/test/edit.html", {
             "form": form,
             "test": test,
+            "item_analysis": get_item_analysis(test),
+            "clone_form": TestCloneForm(test=test, user=request.user),
         })
 
 
+@not_student
+def regrade_test_tries(request, pk):
+    if request.method != "POST":
+        return redirect(reverse("test", kwargs={"pk": pk}))
+    report = regrade_test(get_object_or_404(Test, pk=pk)).as_dict()
+    messages.success(
+        request,
+        f"Баллы пересчитаны: изменено попыток {report['changed']} из {report['tries']}"
+        f" (повышено {report['increased']}, понижено {report['decreased']})",
+    )
+    return redirect(reverse("test", kwargs={"pk": pk}))
+
+
+@not_student
+def clone_test_view(request, pk):
+    if request.method != "POST":
+        return redirect(reverse("test", kwargs={"pk": pk}))
+    test = get_object_or_404(Test, pk=pk)
+    form = TestCloneForm(data=request.POST, test=test, user=request.user)
+    if not form.is_valid():
+        messages.error(request, "Неверные данные для копирования теста")
+        return redirect(reverse("test", kwargs={"pk": pk}))
+    try:
+        lessons = get_target_lessons(request.user, [lesson.pk for lesson in form.cleaned_data["lessons"]])
+        clones = clone_test(test, copies=form.cleaned_data["copies"] or 1, lessons=lessons)
+    except CloneError as e:
+        messages.error(request, str(e))
+        return redirect(reverse("test", kwargs={"pk": pk}))
+    messages.success(request, f"Создано копий теста: {len(clones)}")
+    return redirect(reverse("test", kwargs={"pk": clones[0].pk}) if len(clones) == 1 else reverse("test", kwargs={"pk": pk}))
+
+
 @method_decorator(not_student, name="dispatch")
 class TestCreateView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
@@ -766,7 +837,7 @@ def delete_test(request, pk):
 
     test = get_object_or_404(Test, pk=pk)
     name = test.name
-    test.delete()
+    delete_later(test, request.user)
     messages.success(request, f"Тест {name} удален!")
     if request.user.profile.type == 1:
         return redirect(reverse("tests"))
@@ -850,6 +921,8 @@ def add_answer_variant(request, pk):
             new_answer.question = question
             new_answer.save()
             messages.success(request, "Добавлен вариант ответа")
+            if has_regradable_tries(question.test_id):
+                messages.warning(request, "Ключ ответов изменен: пересчитайте баллы попыток на странице теста")
 
         return redirect(reverse("test-question", kwargs={"question_pk": pk, "test_pk": question.test.pk}))
     else:
@@ -885,6 +958,8 @@ def delete_answer(request, pk):
     name = answer.text
     answer.delete()
     messages.success(request, f"Ответ {name} удален!")
+    if has_regradable_tries(answer.question.test_id):
+        messages.warning(request, "Ключ ответов изменен: пересчитайте баллы попыток на странице теста")
 
     return HttpResponse("Answer delete successfully!")
 
@@ -921,7 +996,7 @@ def exclude_student(request, pk):
     student = get_object_or_404(User, pk=pk)
     group = student.group_set.first()
     group_pk = group.pk
-    group.students.remove(student)
+    set_student_group(student, None)
     messages.success(request, "Студент был исключен")
     return redirect(reverse("group-students", kwargs={"pk": group_pk}))
 
@@ -1004,9 +1079,8 @@ class MySubjectEditView(LoginRequiredMixin, View):
         subject = get_object_or_404(Subject, pk=kwargs["pk"])
         form = SubjectForm(instance=subject)
         group_form = GroupForTeacherSubjectForm()
-        groups = Group.objects.all()
         return render(request, "study/teacher/edit-subject.html", {
-            "form": form, "group_form": group_form, "subject": subject, "groups": groups,
+            "form": form, "group_form": group_form, "subject": subject,
         })
 
 
@@ -1037,17 +1111,56 @@ def remove_my_subject_from_group(request, pk):
     return redirect(reverse("my-subject", kwargs={"pk": subject_pk}))
 
 
+@method_decorator(not_student, name="dispatch")
+class CourseCloneView(LoginRequiredMixin, View):
+    def post(self, request, pk, *args, **kwargs):
+        source = get_object_or_404(TeacherGroupSubject, pk=pk)
+        form = CourseCloneForm(data=request.POST, source=source, user=request.user)
+        if not form.is_valid():
+            return render(request, "study/teacher/clone-course.html", {"form": form, "source": source})
+        try:
+            targets = get_target_courses(request.user, source, [course.pk for course in form.cleaned_data["targets"]])
+        except CloneError as e:
+            messages.error(request, str(e))
+            return redirect(reverse("course-clone", kwargs={"pk": pk}))
+        job = enqueue(Job.Kind.COURSE_CLONE, request.user, source=source.pk,
+                      targets=[target.pk for target in targets], offset_days=form.cleaned_data["offset_days"])
+        return redirect(reverse("job", kwargs={"pk": job.pk}))
+
+    def get(self, request, pk, *args, **kwargs):
+        source = get_object_or_404(TeacherGroupSubject.objects.select_related("subject", "group"), pk=pk)
+        form = CourseCloneForm(source=source, user=request.user)
+        return render(request, "study/teacher/clone-course.html", {"form": form, "source": source})
+
+
+class JobView(LoginRequiredMixin, View):
+
+    def get(self, request, pk, *args, **kwargs):
+        jobs = Job.objects.all() if request.user.profile.type == 1 else Job.objects.filter(created_by=request.user)
+        return render(request, "study/job.html", {"job": get_object_or_404(jobs, pk=pk)})
+
+
 @method_decorator(teacher_only, name="dispatch")
 class MyLessonsListView(LoginRequiredMixin, ListView):
     model = Lesson
     context_object_name = "objects"
     template_name = "study/teacher/my_lessons.html"
+    paginate_by = 50
 
     def get_queryset(self):
-        lessons = []
-        for subject in TeacherGroupSubject.objects.filter(teacher=self.request.user):
-            lessons += list(subject.lessons.all())
-        return lessons
+        return (
+            Lesson.objects.for_teacher(self.request.user)
+            .for_listing()
+            .filter_by_params(self.request.GET)
+            .ordered_by_param(self.request.GET.get("ordering"))
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["types"] = Lesson.Type.choices
+        context["groups"] = Group.objects.filter(subjects__teacher=self.request.user).distinct().order_by("number")
+        context["params"] = self.request.GET
+        return context
 
 
 @method_decorator(teacher_only, name="dispatch")
@@ -1077,13 +1190,9 @@ class MyLessonCreateView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         user = request.user
         form = LessonForm()
-        tests = Test.objects.filter(lesson__isnull=True)
-        subjects = TeacherGroupSubject.objects.filter(teacher=user)
         types = Lesson.type.field.choices
         return render(request, "study/teacher/create-lesson.html", {
             "form": form,
-            "tests": tests,
-            "subjects": subjects,
             "types": types
         })
 
@@ -1117,8 +1226,6 @@ class MyLessonEditView(LoginRequiredMixin, View):
         lesson = get_object_or_404(Lesson, pk=kwargs["pk"])
         user = request.user
         form = LessonForm(instance=lesson)
-        tests = Test.objects.filter(lesson__isnull=True)
-        subjects = TeacherGroupSubject.objects.filter(teacher=user)
         types = Lesson.type.field.choices
         photos = lesson.photos.all()
         videos = lesson.videos.all()
@@ -1126,8 +1233,6 @@ class MyLessonEditView(LoginRequiredMixin, View):
         return render(request, "study/teacher/edit-lesson.html", {
             "lesson": lesson,
             "form": form,
-            "tests": tests,
-            "subjects": subjects,
             "types": types,
             "photos": photos,
             "videos": videos,
@@ -1156,14 +1261,20 @@ class StudentSubjectView(LoginRequiredMixin, View):
         if user.group_set.first() != subject.group:
             return HttpResponse("No permission")
 
-        lessons = {l_type[1]: [] for l_type in Lesson.type.field.choices}
-        for lesson in subject.lessons.all():
-            lessons[lesson.get_type_display()].append(lesson)
+        # Список занятий рендерится из кэша, пока преподаватель его не изменит
+        version = get_version("subject", subject.pk)
+        last_modified = version_to_datetime(version)
+        etag = f"subject-{subject.pk}-{version}-{user.pk}"
+        response = conditional_response(request, etag, last_modified)
+        if response is not None:
+            return response
 
-        return render(request, "study/student/subject.html", {
+        response = render(request, "study/student/subject.html", {
             "subject": subject,
-            "lessons": lessons,
+            "version": version,
+            "fragment_timeout": FRAGMENT_TIMEOUT,
         })
+        return set_conditional_headers(response, etag, last_modified)
 
 
 class StudentLessonView(LoginRequiredMixin, View):
@@ -1191,14 +1302,57 @@ class StudentLessonView(LoginRequiredMixin, View):
             else:
                 work_score = None
 
-        return render(request, "study/student/lesson.html", {
+        # Материалы занятия кэшируются, а результаты студента всегда считаются заново
+        version = get_version("lesson", lesson.pk)
+        etag = f"lesson-{lesson.pk}-{version}-{user.pk}-{my_best_try}-{work_score}-{lesson.is_late()}"
+        response = conditional_response(request, etag)
+        if response is not None:
+            return response
+
+        response = render(request, "study/student/lesson.html", {
             "lesson": lesson,
             "best_try": my_best_try,
             "work_score": work_score,
-            "work_form": work_form
+            "work_form": work_form,
+            "version": version,
+            "fragment_timeout": FRAGMENT_TIMEOUT,
+        })
+        return set_conditional_headers(response, etag)
+
+
+class StudentDeadlinesView(LoginRequiredMixin, View):
+
+    def get(self, request, *args, **kwargs):
+        user = self.request.user
+        group = user.group_set.first()
+
+        if not group:
+            return HttpResponse("No permission")
+
+        upcoming, overdue = split_deadlines(get_deadline_rows(user, group))
+
+        return render(request, "study/student/deadlines.html", {
+            "upcoming": upcoming,
+            "overdue": overdue,
         })
 
 
+class StudentDeadlinesCalendarView(LoginRequiredMixin, View):
+
+    def get(self, request, *args, **kwargs):
+        user = self.request.user
+        group = user.group_set.first()
+
+        if not group:
+            return HttpResponse("No permission")
+
+        upcoming, overdue = split_deadlines(get_deadline_rows(user, group))
+
+        response = HttpResponse(to_ical(upcoming + overdue, host=request.get_host()), content_type="text/calendar; charset=utf-8")
+        response["Content-Disposition"] = 'attachment; filename="deadlines.ics"'
+        return response
+
+
 class StudentIndividualWorkView(LoginRequiredMixin, View):
 
     def post(self, request, *args, **kwargs):
@@ -1233,16 +1387,20 @@ class StudentTestView(LoginRequiredMixin, View):
         if not user.group_set.first():
             return HttpResponse("No permission")
 
-        score, need_check = test.calculate_score(request.POST, user)
-        student_try = Try.objects.create(user=user, test=test, score=score, need_check=need_check)
-        for student_answer in StudentAnswer.objects.filter(user=user, question__test=test, student_try__isnull=True):
-            student_answer.student_try = student_try
-            student_answer.save()
+        try:
+            session = submit(user, test, request.POST, session_pk=request.POST.get("session"))
+        except ExamError as err:
+            messages.error(request, str(err))
+            return redirect(reverse("student-lesson", kwargs={"pk": test.lesson.pk}))
 
-        if need_check:
+        student_try = session.student_try
+        if session.autosubmitted:
+            messages.error(request, "Время на прохождение теста истекло, засчитаны сохраненные ответы")
+
+        if student_try.need_check:
             messages.success(request, f"Ваш тест отправлен на проверку")
         else:
-            messages.success(request, f"Ваш балл составил {score}")
+            messages.success(request, f"Ваш балл составил {student_try.score}")
 
         return redirect(reverse("student-lesson", kwargs={"pk": test.lesson.pk}))
 
@@ -1257,8 +1415,17 @@ class StudentTestView(LoginRequiredMixin, View):
             messages.error(request, "Возможности сдать тест больше нет!")
             return redirect(reverse("student-lesson", kwargs={"pk": test.lesson.pk}))
 
+        try:
+            session = start_session(user, test)
+        except ExamError as err:
+            messages.error(request, str(err))
+            return redirect(reverse("student-lesson", kwargs={"pk": test.lesson.pk}))
+
         return render(request, "study/student/test.html", {
             "test": test,
+            "payload": get_student_payload(test, user, session.question_ids),
+            "session": session,
+            "draft": session.draft,
         })
 
 
@@ -1268,35 +1435,54 @@ def download_test_tries(request, test_id):
     queryset = Try.objects.filter(test=test)
     data = [{"студент": instance.user.username, "балл": instance.score} for instance in queryset]
 
-    df = pd.DataFrame(data)
-
     response = HttpResponse(content_type='application/xlsx')
     response['Content-Disposition'] = f'attachment; filename="{test.name}_{str(dt.now())}.xlsx"'
 
-    with pd.ExcelWriter(response) as writer:
-        df.to_excel(writer, sheet_name=f'Результаты теста {test.name}')
+    write_table(response, data, sheet_name=f'Результаты теста {test.name}')
 
     return response
 
 
+@not_student
+def export_test_view(request, pk):
+    test = get_object_or_404(Test, pk=pk)
+    content_type, extension, render_document = EXPORTERS.get(request.GET.get("type"), EXPORTERS["json"])
+    response = HttpResponse(render_document(export_test(test)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{test.name}.{extension}"'
+    return response
+
+
+@method_decorator(not_student, name="dispatch")
+class TestImportView(LoginRequiredMixin, View):
+
+    def post(self, request, *args, **kwargs):
+        form = TestImportForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(request, "study/test/import.html", {"form": form})
+        try:
+            test, count = import_test(read_document(request.FILES["file"], name=form.cleaned_data["name"]))
+        except AuthoringError as e:
+            return render(request, "study/test/import.html", {"form": form, "errors": e.errors})
+        messages.success(request, f"Тест загружен, вопросов: {count}")
+        return redirect(reverse("test", kwargs={"pk": test.pk}))
+
+    def get(self, request, *args, **kwargs):
+        return render(request, "study/test/import.html", {"form": TestImportForm()})
+
+
 class UploadSubjectsView(LoginRequiredMixin, View):
 
     def post(self, request, *args, **kwargs):
         form = ExcelForm(request.POST, request.FILES)
         if form.is_valid():
-            df = pd.read_excel(request.FILES['excel'], names=["name", "teacher", "group"])
-            first_iter = True
-            for index, row in df.iterrows():
-                if first_iter:
-                    first_iter = False
-                    continue
+            for row in read_rows(request.FILES['excel'], ["name", "teacher", "group"]):
                 name = row["name"]
                 teacher = User.objects.filter(username=row["teacher"]).first()
                 group = Group.objects.filter(number=row["group"]).first()
-                if not(pd.isna(name)) and teacher and group:
+                if name is not None and teacher and group:
                     subject = Subject.objects.get_or_create(name=name)
                     TeacherGroupSubject.objects.get_or_create(teacher=teacher, subject=subject[0], group=group)
-                elif not(pd.isna(name)):
+                elif name is not None:
                     Subject.objects.get_or_create(name=name)
             messages.success(request, "Дисциплины успешно загружены")
 
@@ -1314,20 +1500,14 @@ class UploadLessonsView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         form = ExcelForm(request.POST, request.FILES)
         if form.is_valid():
-            df = pd.read_excel(request.FILES['excel'], names=["name", "type", "subject", "teacher", "group", "text"])
-            first_iter = True
-            for index, row in df.iterrows():
-                if first_iter:
-                    first_iter = False
-                    continue
-
+            for row in read_rows(request.FILES['excel'], ["name", "type", "subject", "teacher", "group", "text"]):
                 subject = Subject.objects.filter(name=row["subject"]).first()
                 teacher = User.objects.filter(username=row["teacher"]).first()
                 group = Group.objects.filter(number=row["group"]).first()
                 subject = TeacherGroupSubject.objects.filter(teacher=teacher, subject=subject, group=group).first()
-                name = None if pd.isna(row["name"]) else row["name"]
-                text = None if pd.isna(row["text"]) else row["text"]
-                l_type = None if pd.isna(row["type"]) else row["type"]
+                name = row["name"]
+                text = row["text"]
+                l_type = row["type"]
 
                 if name and l_type and subject:
                     Lesson.objects.get_or_create(name=name, text=text, subject=subject, type=l_type)
@@ -1343,5 +1523,15 @@ class UploadLessonsView(LoginRequiredMixin, View):
         return render(request, "study/lesson/upload.html", {"form": form})
 
 
+class SearchView(LoginRequiredMixin, View):
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get("q", "").strip()
+        return render(request, "study/search.html", {
+            "query": query,
+            "results": search(request.user, query) if query else [],
+        })
+
+
 def about(request):
     return render(request, "study/about.html")
@@ -0,0 +1,34 @@
+from django import forms
+from django.urls import reverse
+
+
+class AutocompleteSelect(forms.Select):
+    """
+    Выпадающий список, который выводит только выбранное значение,
+    остальные варианты подгружаются поиском через API по мере ввода.
+    """
+    template_name = "study/widgets/autocomplete_select.html"
+
+    def __init__(self, lookup, attrs=None):
+        super().__init__({"hidden": True, **(attrs or {})})
+        self.lookup = lookup
+
+    def get_lookup(self):
+        from .autocomplete import LOOKUPS
+        return LOOKUPS[self.lookup]
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["url"] = reverse("api-autocomplete", kwargs={"lookup": self.lookup})
+        selected = [
+            option["label"] for group in context["widget"]["optgroups"] for option in group[1] if option["selected"]
+        ]
+        context["widget"]["selected_label"] = selected[0] if selected else "---"
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        choices = [("", "---"), *self.get_lookup().choices_for(value)]
+        return [
+            (None, [self.create_option(name, option_value, label, str(option_value) in value, index)], index)
+            for index, (option_value, label) in enumerate(choices)
+        ]